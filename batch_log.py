@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+batch_log.py
+- 全スクリプト共通のログ出力（各スクリプトの log() を置き換える）
+- ファイルは JSON Lines: LOG_DIR/<job>_<YYYYmmdd_HHMMSS>.jsonl（1 行 1 レコード）
+    {"ts": "2025-06-01T08:00:01.234", "level": "INFO", "run": "20250601-080000-1234",
+     "job": "batter_scraping", "msg": "...", "team": "giants"}
+  コンソール（cron のリダイレクト先）には従来どおり "[時刻] メッセージ" を出す
+- ファイルは開いたままバッファして書く（1 行ごとに open / flush しない）。
+  FLUSH_INTERVAL 秒ごと・WARNING 以上・終了時に flush
+- ラン ID は環境変数 BATCH_RUN_ID で共有（run_batch.py が最初に決め、同じプロセス・子プロセスのジョブが引き継ぐ）
+- バックグラウンド書き込み（BATCH_LOG_BACKGROUND=1 または set_background(True)）:
+  log() はキューに積むだけで戻り、書き込みは専用スレッド（logging.handlers.QueueListener）が行う
+- 使い方:
+    log = batch_log.get_logger("batter_scraping")
+    log("取得開始")
+    log("取得失敗", team="giants", url=url)      # 追加の項目は JSON のキーになる
+    log.warning("データなし", team="giants")
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+import batch_paths
+
+# ====== 設定 ======
+LOG_DIR = batch_paths.LOG_DIR
+RUN_ID_ENV = "BATCH_RUN_ID"
+FLUSH_INTERVAL = 2.0              # 秒
+BUFFER_BYTES = 64 * 1024          # ファイルごとの書き込みバッファ
+CONSOLE = True                    # コンソールにも出す
+BACKGROUND = os.environ.get("BATCH_LOG_BACKGROUND", "0") == "1"
+# ====== 設定ここまで ======
+
+STAMP = datetime.now().strftime("%Y%m%d_%H%M%S")     # このプロセスのログファイル名に使う
+
+_lock = threading.Lock()
+_loggers = {}          # job -> JobLogger
+_router = None
+_console = None
+_queue = None
+_listener = None
+
+
+def run_id() -> str:
+    """このバッチ実行の ID。未設定なら作って環境変数に入れる（子プロセスも同じ ID になる）。"""
+    rid = os.environ.get(RUN_ID_ENV)
+    if not rid:
+        rid = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        os.environ[RUN_ID_ENV] = rid
+    return rid
+
+
+def log_path(job: str) -> str:
+    return os.path.join(LOG_DIR, f"{job}_{STAMP}.jsonl")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "run": getattr(record, "run", None) or run_id(),
+            "job": getattr(record, "job", record.name),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class JobFileHandler(logging.Handler):
+    """ジョブごとのファイルへ振り分けて書く。ファイルは開いたまま、flush は間引く。"""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self._files = {}
+        self._last_flush = time.monotonic()
+
+    def _file(self, job: str):
+        f = self._files.get(job)
+        if f is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            f = open(log_path(job), "a", encoding="utf-8", buffering=BUFFER_BYTES)
+            self._files[job] = f
+        return f
+
+    def emit(self, record):
+        try:
+            self._file(getattr(record, "job", record.name)).write(self.format(record) + "\n")
+            now = time.monotonic()
+            if record.levelno >= logging.WARNING or now - self._last_flush >= FLUSH_INTERVAL:
+                self._flush_files()
+                self._last_flush = now
+        except Exception:
+            self.handleError(record)
+
+    def _flush_files(self):
+        for f in self._files.values():
+            f.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush_files()
+
+    def close(self):
+        with self.lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+        super().close()
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """従来の print と同じ "[時刻] メッセージ"。端末でなければ 1 行ごとに flush しない。"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+        self.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+        self._tty = sys.stdout.isatty()
+
+    @property
+    def stream(self):
+        return sys.stdout          # 差し替えられた stdout（テストの捕捉など）にも追従する
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if self._tty or record.levelno >= logging.WARNING:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def _handlers() -> list:
+    global _router, _console
+    if _router is None:
+        _router = JobFileHandler()
+        _console = ConsoleHandler() if CONSOLE else None
+    return [h for h in (_router, _console) if h is not None]
+
+
+def _attach(logger: logging.Logger):
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+    if _queue is not None:
+        logger.addHandler(logging.handlers.QueueHandler(_queue))
+    else:
+        for h in _handlers():
+            logger.addHandler(h)
+
+
+def set_background(on: bool = True):
+    """書き込みを専用スレッドへ移す（False で呼び出し元スレッドでの書き込みに戻す）。"""
+    global _queue, _listener
+    with _lock:
+        if on and _queue is None:
+            _queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(_queue, *_handlers())
+            _listener.start()
+        elif not on and _queue is not None:
+            _listener.stop()          # 積まれている分を書き切ってから止まる
+            _queue = _listener = None
+        else:
+            return
+        for job_logger in _loggers.values():
+            _attach(job_logger.logger)
+
+
+class JobLogger:
+    """log(msg, **項目) で書ける、ジョブ名つきのロガー。"""
+
+    def __init__(self, job: str):
+        self.job = job
+        self.logger = logging.getLogger(f"batch.{job}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False      # root（basicConfig 等）に二重に出さない
+        _attach(self.logger)
+
+    def __call__(self, msg, level: int = logging.INFO, **fields):
+        self.logger.log(level, msg, extra={"job": self.job, "run": run_id(), "fields": fields})
+
+    def info(self, msg, **fields):
+        self(msg, logging.INFO, **fields)
+
+    def warning(self, msg, **fields):
+        self(msg, logging.WARNING, **fields)
+
+    def error(self, msg, **fields):
+        self(msg, logging.ERROR, **fields)
+
+
+def get_logger(job: str) -> JobLogger:
+    with _lock:
+        job_logger = _loggers.get(job)
+        if job_logger is None:
+            job_logger = _loggers[job] = JobLogger(job)
+        return job_logger
+
+
+def flush():
+    """書きかけのログをファイルへ出す（バックグラウンド時はキューに積まれた分は含まない）。"""
+    for h in _handlers():
+        h.flush()
+
+
+def shutdown():
+    set_background(False)
+    flush()
+
+
+atexit.register(shutdown)
+if BACKGROUND:
+    set_background(True)
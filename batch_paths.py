@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+batch_paths.py
+- 出力（data/）・学習済みの状態やキャッシュ（cache/）・ログ（logs/）・取得ページのアーカイブ（archive/）・
+  ランのメトリクス（metrics/）の置き場所
+- 既定は本番の /home/ec2-user/batch 配下。環境変数で差し替えられる（ベンチマーク・検証で本番の出力や状態を上書きしないように）:
+    BATCH_DATA_DIR=/tmp/bench/data  BATCH_CACHE_DIR=/tmp/bench/cache  BATCH_LOG_DIR=/tmp/bench/logs
+    BATCH_ARCHIVE_DIR=/tmp/bench/archive  BATCH_METRICS_DIR=/tmp/bench/metrics
+- 使い方:
+    output_dir = os.path.join(batch_paths.DATA_DIR, "batter")
+"""
+
+import os
+
+# ====== 設定 ======
+DATA_DIR = os.environ.get("BATCH_DATA_DIR", "/home/ec2-user/batch/data")
+CACHE_DIR = os.environ.get("BATCH_CACHE_DIR", "/home/ec2-user/batch/cache")
+LOG_DIR = os.environ.get("BATCH_LOG_DIR", "/home/ec2-user/batch/logs")
+ARCHIVE_DIR = os.environ.get("BATCH_ARCHIVE_DIR", "/home/ec2-user/batch/archive")
+METRICS_DIR = os.environ.get("BATCH_METRICS_DIR", "/home/ec2-user/batch/metrics")
+# ====== 設定ここまで ======
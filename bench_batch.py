@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_batch.py
+- 記録済みフィクスチャ（fixture_server.py record）をローカルのスタンドインで配信し、
+  全取得ジョブを 1 つずつ別プロセスで実行して計測するエンドツーエンドのベンチマーク
+- ジョブごとに 壁時計時間 / リクエスト数（404 含む）/ ピーク RSS / 出力ファイル数 を表示
+  （出力ファイル数は csv_writer が書いた数 + 内容が同じで書かなかった数。Parquet も含む）
+- HTTP キャッシュは無効化して実行（毎回フル取得の条件で比較できるように）
+- 出力・状態（data/ cache/ logs/ archive/ metrics/）は一時ディレクトリに置く（BATCH_DATA_DIR 等。本番の出力や学習済みの状態に触らない）。
+  日程は --full で全月取得（月別キャッシュや今日の日付でリクエスト数が変わらないように）
+- 使い方:
+    python3 bench_batch.py --fixtures /home/ec2-user/batch/fixtures/2025-06-01
+    python3 bench_batch.py --fixtures ... --latency-ms 150 --only batter_scraping --json out.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from fixture_server import FixtureServer  # noqa: E402
+from run_batch import PRODUCERS  # noqa: E402
+
+# ===== 設定 =====
+JOB_ARGS = {
+    "scrape_nf3_schedule_all_teams": ["--full"],
+}
+# ===== 設定ここまで =====
+
+# 子プロセスの入口: スクリプトを __main__ として実行し、終了時に csv_writer の集計を JSON で書き出す
+# （python -c CHILD <集計の出力先> <スクリプト> [引数...]）
+CHILD = """
+import atexit, json, runpy, sys
+import csv_writer
+out = sys.argv[1]
+sys.argv = sys.argv[2:]
+atexit.register(lambda: json.dump(csv_writer.stats(), open(out, "w")))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def read_writer_stats(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def run_job(module_name: str, env: dict, args: list = ()) -> dict:
+    """1 ジョブを子プロセスで実行し、時間・ピーク RSS・出力ファイル数を返す。"""
+    script = os.path.join(BASE_DIR, f"{module_name}.py")
+    with tempfile.TemporaryFile() as err, tempfile.TemporaryDirectory() as tmp:
+        stats_path = os.path.join(tmp, "writer.json")
+        start = time.monotonic()
+        proc = subprocess.Popen([sys.executable, "-c", CHILD, stats_path, script, *args], env=env, cwd=BASE_DIR,
+                                stdout=subprocess.DEVNULL, stderr=err)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall = time.monotonic() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        err.seek(0)
+        stderr = err.read().decode("utf-8", "replace").strip()
+        writer = read_writer_stats(stats_path)
+    return {
+        "wall_sec": round(wall, 3),
+        "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1),   # Linux の ru_maxrss は KB
+        "exit_code": proc.returncode,
+        "output_files": writer.get("written", 0) + writer.get("unchanged", 0),
+        "stderr_tail": stderr.splitlines()[-1] if stderr else "",
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="フィクスチャを使った全ジョブのベンチマーク")
+    parser.add_argument("--fixtures", required=True, help="fixture_server.py record の出力先")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="スタンドインの応答遅延")
+    parser.add_argument("--only", help="計測するジョブ名（カンマ区切り）")
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    jobs = [j.strip() for j in args.only.split(",")] if args.only else list(PRODUCERS)
+    unknown = [j for j in jobs if j not in PRODUCERS]
+    if unknown:
+        raise SystemExit(f"未知のジョブ: {', '.join(unknown)}")
+
+    server = FixtureServer(args.fixtures, port=0, latency_ms=args.latency_ms).start()
+    work = tempfile.TemporaryDirectory(prefix="bench_batch_")
+    env = dict(os.environ,
+               BATCH_FETCH_OVERRIDE=server.base_url,
+               BATCH_HTTP_CACHE="off",
+               BATCH_DATA_DIR=os.path.join(work.name, "data"),
+               BATCH_CACHE_DIR=os.path.join(work.name, "cache"),
+               BATCH_LOG_DIR=os.path.join(work.name, "logs"),
+               BATCH_ARCHIVE_DIR=os.path.join(work.name, "archive"),
+               BATCH_METRICS_DIR=os.path.join(work.name, "metrics"))
+
+    results = {}
+    try:
+        for job in jobs:
+            server.reset_counts()
+            r = run_job(PRODUCERS[job][0], env, JOB_ARGS.get(job, []))
+            r["requests"] = server.requests
+            r["not_found"] = server.misses
+            results[job] = r
+    finally:
+        server.stop()
+        work.cleanup()
+
+    header = f"{'job':<34}{'wall(s)':>9}{'req':>6}{'404':>5}{'RSS(MB)':>9}{'files':>7}{'exit':>6}"
+    print(header)
+    print("-" * len(header))
+    for job, r in results.items():
+        print(f"{job:<34}{r['wall_sec']:>9.2f}{r['requests']:>6}{r['not_found']:>5}"
+              f"{r['peak_rss_mb']:>9.1f}{r['output_files']:>7}{r['exit_code']:>6}")
+    total_wall = sum(r["wall_sec"] for r in results.values())
+    total_req = sum(r["requests"] for r in results.values())
+    print("-" * len(header))
+    print(f"{'TOTAL':<34}{total_wall:>9.2f}{total_req:>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"fixtures": args.fixtures, "latency_ms": args.latency_ms, "jobs": results},
+                      f, ensure_ascii=False, indent=1)
+    return 0 if all(r["exit_code"] == 0 for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
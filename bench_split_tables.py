@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_split_tables.py
+- 対戦成績表の分割（save_one_team の中身）を従来のループ版と split_tables 版で比較するベンチマーク
+- 合成データ（既定: 選手 100 人 × 対象 20 + 通算、各 13 指標）で時間を計測し、
+  対象ごとの CSV 出力がバイト単位で一致することも確認する
+- 使い方:
+    python3 bench_split_tables.py
+    python3 bench_split_tables.py --players 300 --targets 40 --repeat 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import pandas as pd  # noqa: E402
+
+from split_tables import split_by_target  # noqa: E402
+
+# ===== 設定 =====
+STATS = ["打率", "打席", "打数", "安打", "本塁", "打点", "三振", "四球", "死球", "犠打", "犠飛", "盗塁", "併殺"]
+ID_NAMES = ("背番", "名前", "席")
+TOTAL_LABEL = "通算"
+CSV_ENCODING = "utf-8-sig"
+# ===== 設定ここまで =====
+
+
+def synthetic_table(players: int, targets: int, seed: int = 0) -> pd.DataFrame:
+    """read_*_table が返すのと同じ形（3 段ヘッダ、数値列と "-" 混じりの文字列列）の表。"""
+    rnd = random.Random(seed)
+    columns = [(n, n, "合計") for n in ID_NAMES]
+    data = {
+        0: [str(rnd.randint(0, 99)) for _ in range(players)],
+        1: [f"選手{i}" for i in range(players)],
+        2: [rnd.choice(["右", "左", "両"]) for _ in range(players)],
+    }
+    for t in [TOTAL_LABEL] + [f"対象{j}" for j in range(targets)]:
+        for stat in STATS:
+            i = len(columns)
+            columns.append((t, stat, "合計"))
+            if stat == "打率":
+                data[i] = [rnd.choice(["-", f".{rnd.randint(0, 500):03d}"]) for _ in range(players)]
+            elif rnd.random() < 0.5:
+                data[i] = [rnd.randint(0, 60) for _ in range(players)]
+            else:
+                data[i] = [rnd.choice(["-", str(rnd.randint(0, 60))]) for _ in range(players)]
+    df = pd.DataFrame(data)
+    df.columns = pd.MultiIndex.from_tuples(columns)
+    return df
+
+
+def extract_id_cols(df: pd.DataFrame):
+    id_cols = [c for c in df.columns if c[0] == c[1] and c[2] == "合計" and c[0] in ID_NAMES]
+    return id_cols or [df.columns[i] for i in range(min(3, len(df.columns)))]
+
+
+def split_loop(df: pd.DataFrame):
+    """従来の save_one_team と同じ処理（対象ごとに列を探して copy → 列ごとに数値化）。"""
+    id_cols = extract_id_cols(df)
+    level0_vals = list(dict.fromkeys([col[0] for col in df.columns]))
+    id_level0 = set([c[0] for c in id_cols])
+    targets = [v for v in level0_vals if v not in id_level0]
+    out = []
+    for tgt in targets:
+        tgt_cols = [col for col in df.columns if col[0] == tgt]
+        if not tgt_cols:
+            continue
+        sub = df[id_cols + tgt_cols].copy()
+        new_cols = []
+        for a, b, c in sub.columns:
+            if (a, b, c) in id_cols:
+                new_cols.append(a)
+            else:
+                new_cols.append(b)
+        sub.columns = new_cols
+        for col in sub.columns:
+            if col in ID_NAMES:
+                continue
+            sub[col] = pd.to_numeric(sub[col], errors="coerce")
+        out.append((tgt, sub))
+    return out
+
+
+def split_vectorized(df: pd.DataFrame):
+    return list(split_by_target(df, extract_id_cols(df), ID_NAMES))
+
+
+def to_bytes(parts) -> dict:
+    return {tgt: sub.to_csv(index=False).encode(CSV_ENCODING) for tgt, sub in parts}
+
+
+def median_ms(func, df, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="対戦成績表の分割処理のベンチマーク")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--targets", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    df = synthetic_table(args.players, args.targets)
+    identical = to_bytes(split_loop(df)) == to_bytes(split_vectorized(df))
+    loop_ms = median_ms(split_loop, df, args.repeat)
+    vec_ms = median_ms(split_vectorized, df, args.repeat)
+
+    print(f"表: {args.players}行 × {len(df.columns)}列（対象 {args.targets} + 通算）")
+    print(f"従来ループ   : {loop_ms:8.1f} ms")
+    print(f"split_tables : {vec_ms:8.1f} ms  ({loop_ms / vec_ms:.1f}x)")
+    print(f"CSV 出力一致 : {'OK' if identical else 'NG'}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
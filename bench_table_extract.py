@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_table_extract.py
+- 記録済みページで pd.read_html と table_extract の 解析時間 / メモリ を比較するベンチマーク
+- 各スクリプトと同じ指定（表番号・列・encoding・header）で両方を実行し、結果が一致するかも確認
+- 時間は繰り返し実行の中央値、メモリは 1 回の解析で増えたピーク RSS（fork した子プロセスで計測）
+- 使い方:
+    python3 bench_table_extract.py --fixtures /home/ec2-user/batch/fixtures/2025-06-01
+    python3 bench_table_extract.py --day 2025-06-01 --repeat 5 --json out.json
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import statistics
+import sys
+import time
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import pandas as pd  # noqa: E402
+
+from table_extract import read_tables  # noqa: E402
+
+# ===== 設定 =====
+# (種別, URL パターン, 表番号, 列, read_html の引数) … 各スクリプトの読み方と同じ
+PAGE_SPECS = [
+    ("stats",     r"baseball-data\.com/stats/(hitter|pitcher)-", [0], None, {}),
+    ("standings", r"baseball-data\.com/team/standings\.html", [0, 1], ["チーム", "試 合"], {}),
+    ("schedule",  r"nf3\.sakura\.ne\.jp/php/stat_disp/", [0], None, {"encoding": "cp932"}),
+    ("splits",    r"nf3\.sakura\.ne\.jp/.+_all_data_vs[TS]\.htm", [0], None,
+     {"flavor": "lxml", "encoding": "cp932", "header": [0, 1, 2]}),
+]
+DEFAULT_REPEAT = 3
+# ===== 設定ここまで =====
+
+
+def load_pages(fixtures: str = None, day: str = None) -> dict:
+    """URL → 本文。フィクスチャ（manifest.json）かアーカイブの日付から読む。"""
+    pages = {}
+    if fixtures:
+        with open(os.path.join(fixtures, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for url, page in manifest["pages"].items():
+            with open(os.path.join(fixtures, page["file"]), "rb") as f:
+                pages[url] = f.read()
+    else:
+        import html_archive
+        for url in html_archive.load_index(day):
+            pages[url] = html_archive.get(url, day)[1]
+    return pages
+
+
+def by_read_html(content: bytes, indices, columns, kwargs) -> list:
+    tables = pd.read_html(BytesIO(content), **kwargs)
+    return [tables[i][columns] if columns else tables[i] for i in indices]
+
+
+def by_extract(content: bytes, indices, columns, kwargs) -> list:
+    return read_tables(content, indices, encoding=kwargs.get("encoding"),
+                       header=kwargs.get("header"), columns=columns)
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * (os.sysconf("SC_PAGE_SIZE") // 1024)
+
+
+def peak_rss_delta_mb(func, *args) -> float:
+    """func(*args) 1 回分で増えたピーク RSS（MB）。子プロセスで実行して親に影響させない。"""
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        before = _rss_kb()
+        try:
+            func(*args)
+            delta = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        except Exception:
+            delta = -1
+        os.write(w, str(delta).encode())
+        os._exit(0)
+    os.close(w)
+    with os.fdopen(r) as f:
+        delta = int(f.read() or -1)
+    os.waitpid(pid, 0)
+    return round(delta / 1024, 1) if delta >= 0 else float("nan")
+
+
+def median_ms(func, args, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def same(a: list, b: list) -> bool:
+    return len(a) == len(b) and all(
+        x.equals(y) and list(x.columns) == list(y.columns) and list(x.dtypes) == list(y.dtypes)
+        for x, y in zip(a, b)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pd.read_html と table_extract の比較")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--fixtures", help="fixture_server.py record の出力先")
+    src.add_argument("--day", help="アーカイブの日付（YYYY-MM-DD）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--json", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.fixtures, args.day)
+    rows = []
+    for url, content in sorted(pages.items()):
+        spec = next((s for s in PAGE_SPECS if re.search(s[1], url)), None)
+        if spec is None:
+            continue
+        kind, _, indices, columns, kwargs = spec
+        call = (content, indices, columns, kwargs)
+        try:
+            ok = same(by_read_html(*call), by_extract(*call))
+        except Exception as e:
+            print(f"解析失敗: {url} {e!r}")
+            continue
+        rows.append({
+            "url": url,
+            "kind": kind,
+            "bytes": len(content),
+            "read_html_ms": round(median_ms(by_read_html, call, args.repeat), 2),
+            "extract_ms": round(median_ms(by_extract, call, args.repeat), 2),
+            "read_html_rss_mb": peak_rss_delta_mb(by_read_html, *call),
+            "extract_rss_mb": peak_rss_delta_mb(by_extract, *call),
+            "identical": ok,
+        })
+
+    if not rows:
+        print("対象ページがありません")
+        return 1
+
+    header = (f"{'kind':<11}{'pages':>6}{'KB/page':>9}{'read_html(ms)':>15}{'extract(ms)':>13}"
+              f"{'speedup':>9}{'RSS html(MB)':>14}{'RSS ext(MB)':>13}{'diff':>6}")
+    print(header)
+    print("-" * len(header))
+    for kind in [s[0] for s in PAGE_SPECS] + ["TOTAL"]:
+        group = [r for r in rows if kind in ("TOTAL", r["kind"])]
+        if not group:
+            continue
+        html_ms = sum(r["read_html_ms"] for r in group)
+        ext_ms = sum(r["extract_ms"] for r in group)
+        if kind == "TOTAL":
+            print("-" * len(header))
+        print(f"{kind:<11}{len(group):>6}{statistics.mean(r['bytes'] for r in group) / 1024:>9.1f}"
+              f"{html_ms:>15.1f}{ext_ms:>13.1f}{html_ms / ext_ms if ext_ms else 0:>8.1f}x"
+              f"{max(r['read_html_rss_mb'] for r in group):>14.1f}"
+              f"{max(r['extract_rss_mb'] for r in group):>13.1f}"
+              f"{sum(not r['identical'] for r in group):>6}")
+
+    for r in rows:
+        if not r["identical"]:
+            print(f"結果不一致: {r['url']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"source": args.fixtures or args.day, "repeat": args.repeat, "pages": rows},
+                      f, ensure_ascii=False, indent=1)
+    return 0 if all(r["identical"] for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
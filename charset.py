@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+charset.py
+- 取得済みの本文（bytes）の文字コードを判定して decode する共通処理（再取得はしない）
+- 判定順: BOM → HTTP ヘッダ（Content-Type の charset）→ <meta charset> / <meta http-equiv>
+          → ホスト/パス単位で覚えた文字コード → 本文全体の推定（chardet、最後の手段）
+- ヘッダ・meta・推定で決まった文字コードはホスト/パスのパターンごとに保存して次回に使う
+- ページごとの判定方法と所要時間を集計し、summary() でログに出せる
+- 使い方:
+    text = charset.decode(res)                    # res は http_client.FetchResult
+    df = read_table(res.content, encoding=charset.detect(res).encoding)
+"""
+
+import codecs
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import batch_paths
+import run_metrics
+
+# ====== 設定 ======
+STORE_PATH = os.path.join(batch_paths.CACHE_DIR, "encodings.json")
+META_SCAN_BYTES = 4096      # <meta> を探す先頭バイト数
+# ====== 設定ここまで ======
+
+# Shift_JIS 表記のページは実際には cp932（機種依存文字を含む）なのでまとめて cp932 として扱う
+_ALIASES = {
+    "shift_jis": "cp932", "shift-jis": "cp932", "sjis": "cp932", "x-sjis": "cp932",
+    "windows-31j": "cp932", "ms_kanji": "cp932", "cp932": "cp932",
+    "utf8": "utf-8", "utf-8": "utf-8",
+}
+_RE_META = re.compile(rb"""<meta[^>]+?charset\s*=\s*["']?\s*([A-Za-z0-9_.:\-]+)""", re.I)
+_RE_DIGITS = re.compile(r"\d+")
+
+Detection = namedtuple("Detection", "encoding source ms")
+
+_lock = threading.Lock()
+_learned = None           # パターン -> 文字コード
+_stats = {"pages": 0, "ms": 0.0, "slowest_ms": 0.0, "slowest_url": None, "sources": {}}
+
+
+def normalize(name):
+    """文字コード名を Python の codec 名に揃える。未知の名前なら None。"""
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = _ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
+
+
+def pattern(url: str) -> str:
+    """覚えておく単位：ホスト + パス（数字は # に置換、クエリは無視）。"""
+    parts = urlsplit(url)
+    return f"{parts.hostname or ''}{_RE_DIGITS.sub('#', parts.path)}"
+
+
+def _load():
+    global _learned
+    if _learned is None:
+        try:
+            with open(STORE_PATH, "r", encoding="utf-8") as f:
+                _learned = json.load(f)
+        except (OSError, ValueError):
+            _learned = {}
+    return _learned
+
+
+def _remember(key: str, encoding: str):
+    with _lock:
+        store = _load()
+        if store.get(key) == encoding:
+            return
+        store[key] = encoding
+        snapshot = dict(store)
+    try:
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        tmp = f"{STORE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, STORE_PATH)
+    except OSError:
+        pass   # 保存できなくても判定自体は続ける
+
+
+def _from_bom(content: bytes):
+    if content.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    return None
+
+
+def _from_header(headers):
+    content_type = (headers or {}).get("Content-Type") or ""
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset":
+            return normalize(value)
+    return None
+
+
+def _from_meta(content: bytes):
+    m = _RE_META.search(content[:META_SCAN_BYTES])
+    return normalize(m.group(1).decode("ascii", "ignore")) if m else None
+
+
+def _decodes(content: bytes, encoding: str) -> bool:
+    try:
+        content.decode(encoding)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def _guess(content: bytes):
+    from requests.compat import chardet
+    return normalize(chardet.detect(content)["encoding"])
+
+
+def detect(res) -> Detection:
+    """FetchResult（url, headers, content を持つもの）の文字コードを判定する。"""
+    start = time.perf_counter()
+    url, content = res.url, res.content
+    key = pattern(url)
+
+    source, encoding = "bom", _from_bom(content)
+    if encoding is None:
+        source, encoding = "header", _from_header(res.headers)
+    if encoding is None:
+        source, encoding = "meta", _from_meta(content)
+    if encoding is None:
+        with _lock:
+            cached = _load().get(key)
+        if cached and _decodes(content, cached):
+            source, encoding = "cache", cached
+    if encoding is None:
+        source, encoding = "detect", _guess(content)
+    if encoding is None:
+        source, encoding = "default", "utf-8"
+    if source in ("header", "meta", "detect"):
+        _remember(key, encoding)
+
+    ms = (time.perf_counter() - start) * 1000
+    run_metrics.add("decode", ms / 1000, bytes=len(content))
+    with _lock:
+        _stats["pages"] += 1
+        _stats["ms"] += ms
+        _stats["sources"][source] = _stats["sources"].get(source, 0) + 1
+        if ms > _stats["slowest_ms"]:
+            _stats["slowest_ms"], _stats["slowest_url"] = ms, url
+    return Detection(encoding, source, ms)
+
+
+def decode(res, errors: str = "replace") -> str:
+    """判定した文字コードで本文を文字列にする。"""
+    return res.content.decode(detect(res).encoding, errors=errors)
+
+
+def stats() -> dict:
+    with _lock:
+        result = dict(_stats)
+        result["sources"] = dict(_stats["sources"])
+    return result
+
+
+def summary() -> str:
+    s = stats()
+    if not s["pages"]:
+        return "文字コード判定: 0ページ"
+    by_source = " / ".join(f"{k} {v}" for k, v in sorted(s["sources"].items()))
+    return (f"文字コード判定: {s['pages']}ページ（{by_source}） "
+            f"合計 {s['ms']:.1f}ms 最大 {s['slowest_ms']:.1f}ms {s['slowest_url']}")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+csv_writer.py
+- 出力 CSV の共通書き出し：内容が前回と同じならファイルに触らない（mtime も変わらない）
+- 変わったときは同じディレクトリの一時ファイルに書いてから os.replace で置き換える
+  （書きかけのファイルをアップロードや後段の処理が拾わない）
+- 比較はサイズ → sha256 の順（サイズが違えばハッシュは取らない）
+- 書いた数・変更なしの数を summary() でログに出せる（所要時間は run_metrics の write 段階）
+- 使い方:
+    changed = csv_writer.write_csv(df, path)                  # 既定は utf-8-sig / index=False
+    changed = csv_writer.write_bytes(path, data)              # 既にバイト列になっている出力
+"""
+
+import hashlib
+import os
+import threading
+
+import run_metrics
+
+# ====== 設定 ======
+CSV_ENCODING = "utf-8-sig"
+# ====== 設定ここまで ======
+
+_lock = threading.Lock()
+_stats = {"written": 0, "unchanged": 0, "bytes": 0}
+
+
+def _same_content(path: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+    except OSError:
+        return False
+    return h.digest() == hashlib.sha256(data).digest()
+
+
+def write_bytes(path: str, data: bytes) -> bool:
+    """data を path に書く。内容が同じなら何もしない。書いたら True。"""
+    with run_metrics.stage("write") as m:
+        changed = _write_bytes(path, data)
+        m["files" if changed else "unchanged"] = 1
+        m["bytes"] = len(data)          # 変更なしでも出力の量として数える
+    return changed
+
+
+def _write_bytes(path: str, data: bytes) -> bool:
+    if _same_content(path, data):
+        with _lock:
+            _stats["unchanged"] += 1
+        return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    with _lock:
+        _stats["written"] += 1
+        _stats["bytes"] += len(data)
+    return True
+
+
+def write_csv(df, path: str, encoding: str = CSV_ENCODING, index: bool = False, **kwargs) -> bool:
+    """df.to_csv(path, ...) と同じ内容を書く。内容が同じなら何もしない。書いたら True。"""
+    return write_bytes(path, df.to_csv(index=index, **kwargs).encode(encoding))
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def summary() -> str:
+    s = stats()
+    return f"ファイル出力: 更新 {s['written']}件（{s['bytes']}B） / 変更なし {s['unchanged']}件"
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+fetch_engine.py
+- 複数ページの取得をスレッドプールで並列実行する共通エンジン
+- ホスト単位の「礼儀正しさ」設定（同時接続数の上限・リクエスト最小間隔）を守る
+- 既定値は HOST_LIMITS / DEFAULT_LIMIT で調整（configure_host で実行時変更も可）
+- map_concurrent のワーカーは呼び出し元の contextvars を引き継ぐ（run_metrics のジョブ名など）
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# ====== 設定 ======
+# ホスト別の上限：max_in_flight = 同時に投げるリクエスト数, min_interval = リクエスト開始間隔（秒）
+HOST_LIMITS = {
+    "nf3.sakura.ne.jp": {"max_in_flight": 3, "min_interval": 0.5},
+}
+
+# HOST_LIMITS に無いホストの既定値（従来どおり間隔は空けず、同時接続数だけ制限）
+DEFAULT_LIMIT = {"max_in_flight": 2, "min_interval": 0.0}
+
+# map_concurrent のワーカー数既定値
+DEFAULT_WORKERS = 4
+# ====== 設定ここまで ======
+
+
+class HostThrottle:
+    """1ホスト分の同時接続数と開始間隔を管理する。"""
+
+    def __init__(self, max_in_flight: int, min_interval: float):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.min_interval = max(0.0, float(min_interval))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _wait_turn(self):
+        # 次に開始してよい時刻を予約し、その時刻まで待つ
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self._wait_turn()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def configure_host(host: str, max_in_flight: int = None, min_interval: float = None):
+    """ホスト別の上限を変更する（既存のスロットルは作り直す）。"""
+    with _throttles_lock:
+        limit = dict(HOST_LIMITS.get(host, DEFAULT_LIMIT))
+        if max_in_flight is not None:
+            limit["max_in_flight"] = max_in_flight
+        if min_interval is not None:
+            limit["min_interval"] = min_interval
+        HOST_LIMITS[host] = limit
+        _throttles.pop(host, None)
+
+
+def host_slot(url: str) -> HostThrottle:
+    """URL のホストに対応するスロットル（with で使用）を返す。"""
+    host = urlsplit(url).hostname or ""
+    with _throttles_lock:
+        throttle = _throttles.get(host)
+        if throttle is None:
+            limit = HOST_LIMITS.get(host, DEFAULT_LIMIT)
+            throttle = HostThrottle(limit["max_in_flight"], limit["min_interval"])
+            _throttles[host] = throttle
+    return throttle
+
+
+def map_concurrent(func, items, max_workers: int = DEFAULT_WORKERS):
+    """
+    items の各要素に func を並列適用し、入力順で (item, result, error) を順次返す。
+    例外は握りつぶさず error に入れて返すので、呼び出し側でログ・継続判断する。
+    """
+    items = list(items)
+    if not items:
+        return
+
+    def run(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, item) for item in items]
+        for item, fut in zip(items, futures):
+            result, err = fut.result()
+            yield item, result, err
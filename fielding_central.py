@@ -1,26 +1,22 @@
 import pandas as pd
-import requests
-from datetime import datetime
 import os
 from io import StringIO
 import re  # ← 追加（正規表現用）
 
+import batch_log
+import batch_paths
+import charset
+import csv_writer
+import run_metrics
+from http_client import apply_replay_arg, fetch, stats_summary
+
 # === 保存先設定 ===
-save_dir = "/home/ec2-user/batch/data/team_defense"
+save_dir = os.path.join(batch_paths.DATA_DIR, "team_defense")
 os.makedirs(save_dir, exist_ok=True)
 save_path = os.path.join(save_dir, "team_fielding_stats_central_2025.csv")
 
 # === ログ設定 ===
-log_dir = "/home/ec2-user/batch/logs"
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, f"log_fielding_central_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-# === ログ出力関数 ===
-def log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
-    print(f"[{timestamp}] {message}")
+log = batch_log.get_logger("fielding_central")
 
 # === 重複列名のクレンジング関数 ===
 def clean_column_name(name):
@@ -29,35 +25,50 @@ def clean_column_name(name):
     return match.group(1) if match else name
 
 # === 実行処理 ===
-try:
-    log("セ・リーグ チーム守備成績の取得開始")
+def main():
+    try:
+        log("セ・リーグ チーム守備成績の取得開始")
 
-    url = "https://npb.jp/bis/2025/stats/tmf_c.html"
-    headers = {"User-Agent": "Mozilla/5.0"}
+        url = "https://npb.jp/bis/2025/stats/tmf_c.html"
+        headers = {"User-Agent": "Mozilla/5.0"}
 
-    response = requests.get(url, headers=headers)
-    response.encoding = response.apparent_encoding
+        response = fetch(url, headers=headers, commit=False)
+        if response.not_modified and os.path.exists(save_path):
+            log("更新なし（304）：保存をスキップ")
+            run_metrics.skipped()
+            return
+        text = charset.decode(response)
 
-    tables = pd.read_html(StringIO(response.text))
-    df = tables[0]  # 最初のテーブルが守備成績
+        with run_metrics.stage("parse", bytes=len(response.content)) as m:
+            tables = pd.read_html(StringIO(text))
+            m["rows"] = sum(len(t) for t in tables)
+        df = tables[0]  # 最初のテーブルが守備成績
 
-    # MultiIndexをフラットにし、空白除去＋重複カラム名の縮小
-    df.columns = [''.join(col).strip().replace(" ", "") for col in df.columns]
-    df.columns = [clean_column_name(col) for col in df.columns]
+        # MultiIndexをフラットにし、空白除去＋重複カラム名の縮小
+        df.columns = [''.join(col).strip().replace(" ", "") for col in df.columns]
+        df.columns = [clean_column_name(col) for col in df.columns]
 
-    log(f"カラム一覧: {df.columns.tolist()}")
+        log(f"カラム一覧: {df.columns.tolist()}")
 
-    # チーム名の空白を除去
-    df["チーム"] = df["チーム"].str.replace(r"\s+", "", regex=True)
+        # チーム名の空白を除去
+        df["チーム"] = df["チーム"].str.replace(r"\s+", "", regex=True)
 
-    # リーグ名追加
-    df["リーグ"] = "セ・リーグ"
+        # リーグ名追加
+        df["リーグ"] = "セ・リーグ"
 
-    # CSV出力
-    df.to_csv(save_path, index=False, encoding="utf-8-sig")
-    log(f"保存完了: {save_path}")
-    log("処理正常終了")
+        # CSV出力
+        if csv_writer.write_csv(df, save_path):
+            log(f"保存完了: {save_path}")
+        else:
+            log(f"内容変更なし: {save_path}")
+        response.commit()   # 書き出しまで済んだ回だけ、次回 304 で飛ばせるようにする
+        log(stats_summary())
+        log(charset.summary())
+        log("処理正常終了")
 
-except Exception as e:
-    log(f"エラー発生: {e}")
+    except Exception as e:
+        log.error(f"エラー発生: {e}")
 
+if __name__ == "__main__":
+    apply_replay_arg()
+    main()
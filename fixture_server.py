@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fixture_server.py
+- 実サイトのページを「フィクスチャ」として記録し、ローカル HTTP スタンドインで配信する
+- 記録:  python3 fixture_server.py record --out /home/ec2-user/batch/fixtures/2025-06-01
+         （--day 省略時は全取得ジョブを実サイトに対して 1 回実行し、当日のアーカイブを書き出す）
+         python3 fixture_server.py record --day 2025-06-01 --out ...   # 既存アーカイブから書き出し
+- 配信:  python3 fixture_server.py serve --fixtures ... --port 8765 --latency-ms 150
+         各スクリプトは BATCH_FETCH_OVERRIDE=http://127.0.0.1:8765 でここに向く
+         リクエストパスは "/{host}{path}?{query}"（http_client.wire_url と対応）
+
+フィクスチャの形式:
+  DIR/manifest.json   {"day": ..., "pages": {url: {"file": "xxxx.html", "content_type": ...}}}
+  DIR/xxxx.html       本文（sha256 をファイル名に使用）
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===== 設定 =====
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PORT = 8765
+# ===== 設定ここまで =====
+
+
+def export_day(day: str, out_dir: str) -> int:
+    """アーカイブのその日の全ページをフィクスチャとして書き出す。戻り値はページ数。"""
+    import html_archive
+
+    index = html_archive.load_index(day)
+    os.makedirs(out_dir, exist_ok=True)
+    pages = {}
+    for url in index:
+        entry, body = html_archive.get(url, day)
+        fname = entry["sha256"] + ".html"
+        path = os.path.join(out_dir, fname)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(body)
+        pages[url] = {"file": fname, "content_type": entry.get("content_type")}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"day": day, "pages": pages}, f, ensure_ascii=False, indent=1)
+    return len(pages)
+
+
+def record(day: str, out_dir: str) -> int:
+    if day is None:
+        import run_batch
+        import scrape_nf3_schedule_all_teams
+        from datetime import date
+
+        day = date.today().isoformat()
+        tasks = run_batch.select_tasks(run_batch.build_tasks(), list(run_batch.PRODUCERS))
+        # 日程は過去月も含めて全月分を記録する
+        tasks["scrape_nf3_schedule_all_teams"]["run"] = lambda: scrape_nf3_schedule_all_teams.main(full=True)
+        run_batch.run_graph(tasks)
+    n = export_day(day, out_dir)
+    print(f"フィクスチャ記録: {day} {n}ページ -> {out_dir}")
+    return n
+
+
+class FixtureServer:
+    """フィクスチャを配信するスタンドイン。start() でバックグラウンド起動、リクエスト数を数える。"""
+
+    def __init__(self, fixtures_dir: str, port: int = 0, latency_ms: float = 0.0):
+        with open(os.path.join(fixtures_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # "/{host}{path}?{query}" -> ページ情報
+        self.routes = {}
+        for url, page in manifest["pages"].items():
+            _, _, rest = url.partition("://")
+            self.routes["/" + rest] = page
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency_ms / 1000.0
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = self.misses = 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                page = server.routes.get(self.path)
+                if page is None:
+                    with server._lock:
+                        server.misses += 1
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with open(os.path.join(server.fixtures_dir, page["file"]), "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+                if page.get("content_type"):
+                    self.send_header("Content-Type", page["content_type"])
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main(argv=None):
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    parser = argparse.ArgumentParser(description="フィクスチャの記録とローカル配信")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_rec = sub.add_parser("record", help="実ページを記録（またはアーカイブから書き出し）")
+    p_rec.add_argument("--day", help="書き出すアーカイブ日（省略時は今すぐ全ジョブを実行して記録）")
+    p_rec.add_argument("--out", required=True)
+
+    p_srv = sub.add_parser("serve", help="フィクスチャをローカル配信")
+    p_srv.add_argument("--fixtures", required=True)
+    p_srv.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_srv.add_argument("--latency-ms", type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "record":
+        record(args.day, args.out)
+        return 0
+
+    server = FixtureServer(args.fixtures, args.port, args.latency_ms).start()
+    print(f"配信中: {server.base_url}（{len(server.routes)}ページ, 遅延 {args.latency_ms}ms） Ctrl+C で終了")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,72 +1,81 @@
 import pandas as pd
-import requests
 import os
-from datetime import datetime
 
-# === ログ設定 ===
-log_dir = "/home/ec2-user/batch/logs"
-os.makedirs(log_dir, exist_ok=True)
-
-log_file = os.path.join(log_dir, f"games_scraping_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+import batch_log
+import batch_paths
+import csv_writer
+import run_metrics
+from http_client import apply_replay_arg, fetch, stats_summary
+from table_extract import read_tables
 
-def log(msg):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {msg}\n")
-    print(f"[{timestamp}] {msg}")
-
-log("=== チーム試合数取得処理 開始 ===")
+# === ログ設定 ===
+log = batch_log.get_logger("games_scraping")
 
 # URL
 url = "https://baseball-data.com/team/standings.html"
 
-try:
-    tables = pd.read_html(url)
-    log(f"{len(tables)} tables found")
-    log(f"セ・リーグ columns: {list(tables[0].columns)}")
-    log(f"パ・リーグ columns: {list(tables[1].columns)}")
-
-    central_df = tables[0][["チーム", "試 合"]].copy()
-    pacific_df = tables[1][["チーム", "試 合"]].copy()
-
-    # チーム名マッピング
-    team_mapping = {
-        "阪神": "tigers",
-        "広島": "carp",
-        "DeNA": "baystars",
-        "巨人": "giants",
-        "中日": "dragons",
-        "ヤクルト": "swallows",
-        "ソフトバンク": "hawks",
-        "ロッテ": "marines",
-        "西武": "lions",
-        "楽天": "eagles",
-        "オリックス": "buffaloes",
-        "日本ハム": "fighters"
-    }
-
-    def add_english_team_name(df):
-        df["team"] = df["チーム"].map(team_mapping)
-        df["games"] = df["試 合"].astype(int)
-        return df[["team", "games"]]
-
-    central_df = add_english_team_name(central_df)
-    pacific_df = add_english_team_name(pacific_df)
-
-    team_games_df = pd.concat([central_df, pacific_df], ignore_index=True)
-    log("取得したチーム試合数データ：")
-    log(f"\n{team_games_df.to_string(index=False)}")
-
-    # 保存処理
-    output_dir = "/home/ec2-user/batch/data/matches"
-    os.makedirs(output_dir, exist_ok=True)
-
-    output_path = os.path.join(output_dir, "team_games.csv")
-    team_games_df.to_csv(output_path, index=False, encoding="utf-8-sig")
-    log(f"チーム試合数データを {output_path} に保存しました。")
-
-except Exception as e:
-    log(f"エラー発生：{e}")
-
-log("=== チーム試合数取得処理 完了 ===")
-
+# 保存先
+output_dir = os.path.join(batch_paths.DATA_DIR, "matches")
+output_path = os.path.join(output_dir, "team_games.csv")
+
+def main():
+    log("=== チーム試合数取得処理 開始 ===")
+
+    try:
+        res = fetch(url, commit=False)
+        if res.not_modified and os.path.exists(output_path):
+            log("更新なし（304）：保存をスキップ")
+            run_metrics.skipped()
+            log("=== チーム試合数取得処理 完了 ===")
+            return
+
+        # 先頭 2 表（セ・パ）の必要な 2 列だけを取り出す
+        central_df, pacific_df = read_tables(res.content, [0, 1], columns=["チーム", "試 合"])
+        log(f"セ・リーグ columns: {list(central_df.columns)}")
+        log(f"パ・リーグ columns: {list(pacific_df.columns)}")
+
+        # チーム名マッピング
+        team_mapping = {
+            "阪神": "tigers",
+            "広島": "carp",
+            "DeNA": "baystars",
+            "巨人": "giants",
+            "中日": "dragons",
+            "ヤクルト": "swallows",
+            "ソフトバンク": "hawks",
+            "ロッテ": "marines",
+            "西武": "lions",
+            "楽天": "eagles",
+            "オリックス": "buffaloes",
+            "日本ハム": "fighters"
+        }
+
+        def add_english_team_name(df):
+            df["team"] = df["チーム"].map(team_mapping)
+            df["games"] = df["試 合"].astype(int)
+            return df[["team", "games"]]
+
+        with run_metrics.stage("transform"):
+            central_df = add_english_team_name(central_df)
+            pacific_df = add_english_team_name(pacific_df)
+            team_games_df = pd.concat([central_df, pacific_df], ignore_index=True)
+        log("取得したチーム試合数データ：")
+        log(f"\n{team_games_df.to_string(index=False)}")
+
+        # 保存処理
+        os.makedirs(output_dir, exist_ok=True)
+        if csv_writer.write_csv(team_games_df, output_path):
+            log(f"チーム試合数データを {output_path} に保存しました。")
+        else:
+            log(f"チーム試合数データに変更なし：{output_path}")
+        res.commit()   # 書き出しまで済んだ回だけ、次回 304 で飛ばせるようにする
+
+    except Exception as e:
+        log.error(f"エラー発生：{e}")
+
+    log(stats_summary())
+    log("=== チーム試合数取得処理 完了 ===")
+
+if __name__ == "__main__":
+    apply_replay_arg()
+    main()
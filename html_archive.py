@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+html_archive.py
+- 取得した生ページ（本文）を内容ハッシュ（sha256）で gzip 保存するアーカイブ
+  同じ内容のページは日をまたいでも 1 つだけ保存（重複排除）
+- 日付ごとのインデックス（URL → ハッシュ）で「その日に取得したページ」を引ける
+- http_client のリプレイモード（--replay YYYY-MM-DD）がここから本文を読む
+
+配置:
+  ARCHIVE_DIR/objects/ab/abcdef....gz   本文（gzip）
+  ARCHIVE_DIR/index/2025-06-01.jsonl    {"url", "sha256", "content_type", "at"} を1行ずつ追記
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime
+
+import batch_paths
+
+# ====== 設定 ======
+ARCHIVE_DIR = os.path.join(batch_paths.ARCHIVE_DIR, "html")
+COMPRESS_LEVEL = 6
+# ====== 設定ここまで ======
+
+_lock = threading.Lock()
+_index_cache = {}    # 日付文字列 -> {url: entry}（読み込み済みインデックス）
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(ARCHIVE_DIR, "objects", digest[:2], digest + ".gz")
+
+
+def _index_path(day: str) -> str:
+    return os.path.join(ARCHIVE_DIR, "index", f"{day}.jsonl")
+
+
+def _day_str(day=None) -> str:
+    if day is None:
+        return date.today().isoformat()
+    if isinstance(day, date):
+        return day.isoformat()
+    return str(day)
+
+
+def put(url: str, body: bytes, content_type: str = None, day=None) -> str:
+    """本文を保存し、その日のインデックスに URL を登録する。戻り値は sha256。"""
+    digest = hashlib.sha256(body).hexdigest()
+    day = _day_str(day)
+    obj = _object_path(digest)
+
+    if not os.path.exists(obj):
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = f"{obj}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+        os.replace(tmp, obj)
+
+    entry = {"url": url, "sha256": digest, "content_type": content_type,
+             "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    index = load_index(day)
+    with _lock:
+        if index.get(url, {}).get("sha256") == digest:
+            return digest
+        os.makedirs(os.path.dirname(_index_path(day)), exist_ok=True)
+        with open(_index_path(day), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        index[url] = entry
+    return digest
+
+
+def load_index(day) -> dict:
+    """その日のインデックス {url: entry}（同じ URL は最後の行が有効）。"""
+    day = _day_str(day)
+    with _lock:
+        if day in _index_cache:
+            return _index_cache[day]
+        index = {}
+        try:
+            with open(_index_path(day), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        e = json.loads(line)
+                        index[e["url"]] = e
+        except FileNotFoundError:
+            pass
+        _index_cache[day] = index
+        return index
+
+
+def get(url: str, day):
+    """その日に保存した本文を返す（entry, body）。無ければ LookupError。"""
+    entry = load_index(day).get(url)
+    if entry is None:
+        raise LookupError(f"アーカイブに無い URL です: {_day_str(day)} {url}")
+    with open(_object_path(entry["sha256"]), "rb") as f:
+        return entry, gzip.decompress(f.read())
+
+
+def days() -> list:
+    """インデックスがある日付の一覧（昇順）。"""
+    index_dir = os.path.join(ARCHIVE_DIR, "index")
+    if not os.path.isdir(index_dir):
+        return []
+    return sorted(n[:-len(".jsonl")] for n in os.listdir(index_dir) if n.endswith(".jsonl"))
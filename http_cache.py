@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+http_cache.py
+- 取得したレスポンス本文と検証子（ETag / Last-Modified）をディスクに保存する
+- 次回取得時は条件付きリクエスト（If-None-Match / If-Modified-Since）用ヘッダを作る
+- 304 で処理を飛ばす呼び出し側向けに、検証子だけ後から保存できる（store(validators=False) → commit()）
+  → 解析・書き出しが失敗した回の検証子は残らず、次回は 200 で取り直す
+- 古いエントリ・容量超過分は evict() で削除（古い順）
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import batch_paths
+
+# ====== 設定 ======
+CACHE_DIR = os.path.join(batch_paths.CACHE_DIR, "http")
+MAX_CACHE_MB = 200      # キャッシュ全体の上限MB（超えたら最終利用が古いものから削除）
+MAX_AGE_DAYS = 14       # この日数使われていないエントリは削除
+# ====== 設定ここまで ======
+
+_lock = threading.Lock()
+
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _paths(url: str):
+    key = _key(url)
+    return (os.path.join(CACHE_DIR, key + ".body"),
+            os.path.join(CACHE_DIR, key + ".json"))
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load(url: str):
+    """キャッシュ済みなら {"body": bytes, "meta": dict} を返す。無ければ None。"""
+    body_path, meta_path = _paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    return {"body": body, "meta": meta}
+
+
+def store(url: str, body: bytes, headers, validators: bool = True):
+    """
+    本文と検証子を保存する。検証子が無いページも本文は保存する（304は来ないが再利用可）。
+    validators=False なら検証子は保存しない（書き出し後に commit() で付ける）。
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    body_path, meta_path = _paths(url)
+    meta = {
+        "url": url,
+        "etag": headers.get("ETag") if validators else None,
+        "last_modified": headers.get("Last-Modified") if validators else None,
+        "content_type": headers.get("Content-Type"),
+        "stored_at": time.time(),
+        "size": len(body),
+    }
+    with _lock:
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def commit(url: str, headers):
+    """store(validators=False) で保存したエントリに検証子を付ける（エントリが無ければ何もしない）。"""
+    _, meta_path = _paths(url)
+    with _lock:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        meta["etag"] = headers.get("ETag")
+        meta["last_modified"] = headers.get("Last-Modified")
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def touch(url: str):
+    """304 で再検証できたエントリの最終利用時刻を更新する（evict の対象から外す）。"""
+    for path in _paths(url):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+
+def conditional_headers(entry) -> dict:
+    """キャッシュエントリから条件付きリクエスト用ヘッダを作る。"""
+    if not entry:
+        return {}
+    meta = entry["meta"]
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def evict(max_mb: float = MAX_CACHE_MB, max_age_days: float = MAX_AGE_DAYS):
+    """期限切れ → 容量超過の順にエントリを削除する。(削除件数, 解放バイト数) を返す。"""
+    if not os.path.isdir(CACHE_DIR):
+        return 0, 0
+
+    # エントリ単位（本文＋メタ）で最終利用時刻とサイズを集計
+    entries = {}
+    for name in os.listdir(CACHE_DIR):
+        key, ext = os.path.splitext(name)
+        if ext not in (".body", ".json"):
+            continue
+        try:
+            st = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        e = entries.setdefault(key, {"mtime": 0.0, "size": 0})
+        e["mtime"] = max(e["mtime"], st.st_mtime)
+        e["size"] += st.st_size
+
+    cutoff = time.time() - max_age_days * 86400
+    max_bytes = max_mb * 1024 * 1024
+    total = sum(e["size"] for e in entries.values())
+    removed = freed = 0
+
+    with _lock:
+        for key, e in sorted(entries.items(), key=lambda kv: kv[1]["mtime"]):
+            if e["mtime"] >= cutoff and total <= max_bytes:
+                break
+            for ext in (".body", ".json"):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, key + ext))
+                except FileNotFoundError:
+                    pass
+            total -= e["size"]
+            freed += e["size"]
+            removed += 1
+    return removed, freed
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+http_client.py
+- 全スクレイパー共通の取得関数 fetch()
+- プロセス内で 1 つの requests.Session を共有し、ホスト別にコネクションをプール（keep-alive）
+  → TCP/TLS ハンドシェイクと名前解決は接続ごとに 1 回だけ
+- Accept-Encoding で gzip/deflate（brotli が入っていれば br も）を要求
+- http_cache のキャッシュを使って条件付きリクエストを送り、304 なら保存済み本文を返す
+  （FetchResult.not_modified が True → 呼び出し側は解析・書き込みをスキップできる）
+  304 で処理を飛ばす呼び出し側は fetch(url, commit=False) で取得し、書き出しが済んでから res.commit()
+  → 検証子は書き出しに成功した回の分しか残らない（失敗した回の次は 304 にならず取り直す）
+- ホスト別の同時接続数・間隔は fetch_engine.host_slot で制御
+- 転送量（圧縮後/展開後）・接続の新規/再利用数を stats() / stats_summary() で確認できる
+- 取得ごとの所要時間・本文バイト数は run_metrics の fetch 段階に記録
+- 取得した本文は html_archive に日付別で保存。set_replay(日付) 以降はネットワークに出ず
+  アーカイブから本文を返す（各スクリプトの --replay YYYY-MM-DD）
+- 環境変数（ベンチマーク・検証用）:
+    BATCH_FETCH_OVERRIDE=http://127.0.0.1:8765  実サイトの代わりにローカルのスタンドイン
+                                               （fixture_server.py）へ "/{host}{path}" で送る
+    BATCH_HTTP_CACHE=off / BATCH_HTML_ARCHIVE=off  キャッシュ・アーカイブを使わない
+"""
+
+import argparse
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import html_archive
+import http_cache
+import run_metrics
+from fetch_engine import host_slot
+
+try:
+    import brotli  # noqa: F401  （urllib3 が br の展開に使用）
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+# ====== 設定 ======
+USER_AGENT = "Mozilla/5.0"
+CONNECT_TIMEOUT_SEC = 10
+READ_TIMEOUT_SEC = 30
+POOL_HOSTS = 8          # プールを保持するホスト数
+POOL_MAXSIZE = 4        # 1ホストあたり保持する接続数（fetch_engine の max_in_flight 以上に）
+UPSTREAM_OVERRIDE = os.environ.get("BATCH_FETCH_OVERRIDE", "").rstrip("/")
+HTTP_CACHE_ENABLED = os.environ.get("BATCH_HTTP_CACHE", "on") != "off"
+ARCHIVE_ENABLED = os.environ.get("BATCH_HTML_ARCHIVE", "on") != "off"
+# ====== 設定ここまで ======
+
+_evicted = False
+_evict_lock = threading.Lock()
+_replay_day = None        # リプレイ対象日（None なら通常取得）
+_session = None
+_session_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "not_modified": 0,
+    "wire_bytes": 0,      # 受信した本文のバイト数（圧縮されたまま）
+    "body_bytes": 0,      # 展開後の本文バイト数
+}
+_pools = {}               # id -> urllib3 の接続プール（新規接続数の集計用）
+
+
+class FetchResult:
+    """fetch() の戻り値。content は常に本文（304 の場合はキャッシュ済み本文）。"""
+
+    def __init__(self, url: str, status: int, headers, content: bytes, not_modified: bool):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.not_modified = not_modified
+        self._pending = None      # 保存を遅らせている検証子（fetch(commit=False) の 200 応答）
+
+    def commit(self):
+        """書き出しが済んだら呼ぶ。遅らせていた検証子を保存する（次回から 304 になる）。"""
+        if self._pending is not None:
+            http_cache.commit(self.url, self._pending)
+            self._pending = None
+
+
+def get_session() -> requests.Session:
+    """プロセス共有の Session（初回呼び出し時に作成）。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Encoding": _ACCEPT_ENCODING,
+            })
+            _session = session
+    return _session
+
+
+def set_replay(day):
+    """day（YYYY-MM-DD）以降の fetch() をアーカイブからの読み出しに切り替える。None で解除。"""
+    global _replay_day
+    _replay_day = day
+
+
+def replay_day():
+    return _replay_day
+
+
+def apply_replay_arg(argv=None):
+    """コマンドライン引数の --replay YYYY-MM-DD を解釈してリプレイモードにする（他の引数は無視）。"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--replay", metavar="YYYY-MM-DD")
+    args, _ = parser.parse_known_args(argv)
+    if args.replay:
+        set_replay(args.replay)
+    return args.replay
+
+
+def wire_url(url: str) -> str:
+    """実際に接続する URL（UPSTREAM_OVERRIDE 指定時はスタンドインへの URL）。"""
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{UPSTREAM_OVERRIDE}/{parts.netloc}{parts.path}{query}"
+
+
+def fetch(url: str, headers: dict = None, use_cache: bool = True, commit: bool = True) -> FetchResult:
+    """
+    URL を取得する。use_cache=True ならキャッシュの検証子で条件付きリクエストを送る。
+    commit=False なら 200 の検証子は res.commit() を呼ぶまで保存しない（304 で処理を飛ばす呼び出し側用）。
+    HTTP エラーは requests.HTTPError として送出。
+    リプレイモードではアーカイブから返す（無ければ LookupError）。
+    """
+    with run_metrics.stage("fetch") as m:
+        result = _fetch(url, headers, use_cache, commit)
+        m["bytes"] = len(result.content)
+        m["not_modified"] = int(result.not_modified)
+    return result
+
+
+def _evict_once():
+    """プロセスで最初のキャッシュ利用時に 1 回だけ古いエントリを削除する（他スレッドは終わるまで待つ）。"""
+    global _evicted
+    with _evict_lock:
+        if not _evicted:
+            http_cache.evict()
+            _evicted = True
+
+
+def _fetch(url: str, headers: dict, use_cache: bool, commit: bool) -> FetchResult:
+    use_cache = use_cache and HTTP_CACHE_ENABLED
+    if _replay_day is not None:
+        entry, body = html_archive.get(url, _replay_day)
+        return FetchResult(url, 200, {"Content-Type": entry.get("content_type")}, body,
+                           not_modified=False)
+
+    if use_cache:
+        _evict_once()
+
+    entry = http_cache.load(url) if use_cache else None
+    req_headers = dict(headers or {})
+    req_headers.update(http_cache.conditional_headers(entry))
+
+    session = get_session()
+    with host_slot(url):
+        res = session.get(wire_url(url), headers=req_headers,
+                          timeout=(CONNECT_TIMEOUT_SEC, READ_TIMEOUT_SEC))
+
+    _record(url, res)
+
+    if res.status_code == 304 and entry is not None:
+        http_cache.touch(url)
+        if ARCHIVE_ENABLED:
+            html_archive.put(url, entry["body"], entry["meta"].get("content_type"))
+        return FetchResult(url, 304, res.headers, entry["body"], not_modified=True)
+
+    res.raise_for_status()
+    if use_cache:
+        http_cache.store(url, res.content, res.headers, validators=commit)
+    if ARCHIVE_ENABLED:
+        html_archive.put(url, res.content, res.headers.get("Content-Type"))
+    result = FetchResult(url, res.status_code, res.headers, res.content, not_modified=False)
+    if use_cache and not commit:
+        result._pending = res.headers
+    return result
+
+
+def _record(url: str, res: requests.Response):
+    try:
+        wire = res.raw.tell()
+    except Exception:
+        wire = len(res.content)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["wire_bytes"] += wire
+        _stats["body_bytes"] += len(res.content)
+        if res.status_code == 304:
+            _stats["not_modified"] += 1
+        pool = getattr(res.raw, "_pool", None)
+        if pool is not None:
+            _pools[id(pool)] = pool
+
+
+def stats() -> dict:
+    """これまでの取得統計。connections_opened は新規接続数、reused はそれ以外のリクエスト数。"""
+    with _stats_lock:
+        result = dict(_stats)
+        opened = sum(pool.num_connections for pool in _pools.values())
+    result["connections_opened"] = opened
+    result["connections_reused"] = max(0, result["requests"] - opened)
+    return result
+
+
+def stats_summary() -> str:
+    s = stats()
+    return (f"HTTP統計: リクエスト {s['requests']}件（304: {s['not_modified']}件） "
+            f"転送 {s['wire_bytes'] / 1024:.1f}KB / 展開後 {s['body_bytes'] / 1024:.1f}KB "
+            f"接続 新規 {s['connections_opened']} / 再利用 {s['connections_reused']}")
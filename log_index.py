@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+log_index.py
+- logs/ 配下のログ（未圧縮・.gz、旧形式のテキストと batch_log の JSONL）から失敗・警告の行を抜き出し、
+  SQLite（INDEX_PATH）に 日付 / ジョブ / 球団 / URL / エラー種別 で引けるように索引する
+- 索引は差分更新:
+    未圧縮   前回読んだ位置から後ろだけ読む（サイズと mtime が同じなら開かない）
+    .gz      rotate_logs で圧縮された元ファイルを読み終えていれば、展開せずにパスだけ付け替える
+  ファイルの同一性は先頭 FP_BYTES バイトのハッシュで確かめる（切り詰め・作り直しは最初から読み直す）
+- 拾う行:
+    JSONL    level が WARNING 以上
+    テキスト "失敗: <URL> (...)" / "× 断念: <リーグ> / <球団>（全候補失敗）" / "エラー発生" / "取得失敗: team=..." /
+             logging 形式の [WARNING] [ERROR] など（TEXT_PATTERNS）
+  球団は player_ids.canonical_team で統一（BayStars / baystars は同じ球団）。エラー種別は ERROR_CLASSES で分類
+- 使い方:
+    python3 log_index.py update                                  # 索引を更新
+    python3 log_index.py query --team BayStars --days 30         # BayStars の直近 30 日の失敗
+    python3 log_index.py query --job scrape_hitters_vs_team_all --error http_404 --update
+    python3 log_index.py query --days 7 --count-by team          # 球団ごとの件数
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+from datetime import date, timedelta
+
+import batch_log
+import batch_paths
+import player_ids
+from rotate_logs import scan
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("log_index")
+
+# ===== 設定 =====
+LOG_DIR = batch_paths.LOG_DIR
+INDEX_PATH = os.path.join(batch_paths.DATA_DIR, "log_index.sqlite")
+FP_BYTES = 1024               # 同一ファイルの確認に使う先頭バイト数
+MSG_CHARS = 300               # 索引に残すメッセージの長さ
+
+# テキスト行 → (種別, パターン)。上から順に最初に合ったもの
+TEXT_PATTERNS = [
+    ("gave_up", re.compile(r"× 断念: (?P<league>\S+) / (?P<team>[^（\s]+)（全候補失敗）:? ?(?P<detail>.*)")),
+    ("fetch_failed", re.compile(r"取得失敗:? team=(?P<team>\S+)(?: mon=\S+)? reason=(?P<detail>.*)")),
+    ("fetch_failed", re.compile(r"失敗: (?P<url>https?://\S+) \((?P<detail>.*)\)$")),
+    ("error", re.compile(r"保存処理で失敗: team=(?P<team>\S+) reason=(?P<detail>.*)")),
+    ("error", re.compile(r"(?:\[(?P<team>[^\]]+)\] )?エラー発生[:：]\s*(?P<detail>.*)")),
+    ("failed", re.compile(r"\S*失敗[:：] ?(?P<detail>.*)")),      # その他の「〜失敗:」（件数の「失敗 0件」は除く）
+]
+ERROR_KINDS = {"gave_up", "error"}            # テキスト行で ERROR 扱いにする種別
+
+# エラーの詳細 → 種別。上から順に最初に合ったもの（http は "http_<コード>"）
+ERROR_CLASSES = [
+    ("http", re.compile(r"\b(\d{3}) (?:Client|Server) Error|status(?:_code)?[ =:]+(\d{3})")),
+    ("timeout", re.compile(r"[Tt]imed? ?out|Timeout")),
+    ("connection", re.compile(r"ConnectionError|Connection (?:refused|reset|aborted)|Max retries exceeded|"
+                              r"NameResolution|RemoteDisconnected")),
+    ("no_table", re.compile(r"No tables found|表が見つかりません|テーブルが見つかりません")),
+    ("empty", re.compile(r"データ行が0件|EmptyMonthError|データなし")),
+    ("missing_column", re.compile(r"必要列が見つからない|not in columns|KeyError")),
+    ("encoding", re.compile(r"UnicodeDecodeError|codec can't decode")),
+    ("all_candidates", re.compile(r"全候補失敗")),
+]
+# ===== 設定ここまで =====
+
+TEXT_LINE = re.compile(r"^\[(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (?P<msg>.*)$")
+LOGGING_LINE = re.compile(r"^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:,\d+)? \[(?P<level>[A-Z]+)\] (?P<msg>.*)$")
+URL = re.compile(r"https?://[^\s()（）]+")
+EXC_NAME = re.compile(r"\b([A-Z]\w*(?:Error|Exception))\b")
+ROTATED = re.compile(r"\.\d{8}_\d{6}(?:_\d+)?$")          # rotate_logs が付ける <名前>.<mtime>.gz
+JOB_STAMP = re.compile(r"_\d{8}_\d{6}$")
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    path = path or INDEX_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, job TEXT, gz INTEGER,
+        size INTEGER, mtime_ns INTEGER, fp TEXT, fp_len INTEGER, offset INTEGER)""")
+    con.execute("""CREATE TABLE IF NOT EXISTS events (
+        file_id INTEGER NOT NULL, pos INTEGER NOT NULL, day TEXT, ts TEXT, job TEXT, team TEXT,
+        url TEXT, kind TEXT, error TEXT, level TEXT, run TEXT, msg TEXT,
+        PRIMARY KEY (file_id, pos))""")
+    for cols in ("day", "team, day", "job, day", "error, day", "url"):
+        name = "ix_events_" + cols.replace(", ", "_")
+        con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON events ({cols})")
+    return con
+
+
+def job_of(rel: str) -> str:
+    """ファイル名 → ジョブ名（batter_scraping_20250601_080000.log / log_fielding_central_*.log / <スクリプト>.py）。"""
+    name = os.path.basename(rel)
+    if name.endswith(".gz"):
+        name = ROTATED.sub("", name[:-3])
+    for suffix in (".jsonl", ".log", ".py", ".json"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    name = JOB_STAMP.sub("", name)
+    return name[4:] if name.startswith("log_") else name
+
+
+def classify(detail: str) -> str:
+    for name, pattern in ERROR_CLASSES:
+        m = pattern.search(detail)
+        if m:
+            return f"http_{m.group(1) or m.group(2)}" if name == "http" else name
+    m = EXC_NAME.search(detail)
+    return m.group(1) if m else "other"
+
+
+def _team(value):
+    return player_ids.canonical_team(value) if value else None
+
+
+def match_text(msg: str) -> dict:
+    """メッセージを TEXT_PATTERNS に当てる。合わなければ None。"""
+    for kind, pattern in TEXT_PATTERNS:
+        m = pattern.search(msg)
+        if m:
+            groups = m.groupdict()
+            return {"kind": kind, "team": groups.get("team"), "url": groups.get("url"),
+                    "detail": groups.get("detail") or msg}
+    return None
+
+
+def parse_line(line: str, job: str) -> dict:
+    """1 行 → 索引する事象（dict）。対象外の行は None。"""
+    if line.startswith("{"):
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            return None
+        level = rec.get("level", "INFO")
+        if level in ("DEBUG", "INFO"):
+            return None
+        msg = str(rec.get("msg", ""))
+        hit = match_text(msg) or {}
+        ts = str(rec.get("ts", ""))[:19].replace("T", " ")
+        url = rec.get("url") or hit.get("url")
+        return {
+            "ts": ts, "job": rec.get("job") or job, "team": _team(rec.get("team") or hit.get("team")),
+            "url": url or _first_url(msg), "kind": hit.get("kind") or level.lower(),
+            "error": classify(hit.get("detail") or msg), "level": level, "run": rec.get("run"), "msg": msg,
+        }
+    m = LOGGING_LINE.match(line)
+    level = m.group("level") if m else None
+    m = m or TEXT_LINE.match(line)
+    if not m:
+        return None               # トレースバックの続きなど
+    msg = m.group("msg")
+    hit = match_text(msg)
+    if hit is None:
+        if level not in ("WARNING", "ERROR", "CRITICAL") and not msg.startswith("WARN "):
+            return None
+        hit = {"kind": (level or "warning").lower(), "team": None, "url": None, "detail": msg}
+    return {
+        "ts": m.group("ts"), "job": job, "team": _team(hit["team"]), "url": hit["url"] or _first_url(msg),
+        "kind": hit["kind"], "error": classify(hit["detail"]),
+        "level": level or ("ERROR" if hit["kind"] in ERROR_KINDS else "WARNING"), "run": None, "msg": msg,
+    }
+
+
+def _first_url(msg: str):
+    m = URL.search(msg)
+    return m.group(0).rstrip(".,:;") if m else None
+
+
+def _open(path: str, gz: bool):
+    return gzip.open(path, "rb") if gz else open(path, "rb")
+
+
+def _head(path: str, gz: bool) -> bytes:
+    with _open(path, gz) as f:
+        return f.read(FP_BYTES)
+
+
+def _fp(head: bytes) -> str:
+    return hashlib.sha1(head).hexdigest()
+
+
+def gz_isize(path: str) -> int:
+    """gzip の末尾に入っている展開後のサイズ（4GB 未満のログ前提）。"""
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def _same_content(row, head: bytes) -> bool:
+    return row is not None and row["fp_len"] <= len(head) and _fp(head[:row["fp_len"]]) == row["fp"]
+
+
+def _read_events(path: str, gz: bool, offset: int, file_id: int, job: str):
+    """offset（展開後のバイト位置）から読み、(事象の行, 読み終えた位置) を返す。未圧縮は書きかけの最終行を残す。"""
+    rows = []
+    with _open(path, gz) as f:
+        if gz:
+            remaining = offset
+            while remaining > 0:          # gzip は先頭から展開して捨てる
+                chunk = f.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        else:
+            f.seek(offset)
+        pos = offset
+        for raw in f:
+            if not raw.endswith(b"\n") and not gz:
+                break
+            event = parse_line(raw.decode("utf-8", errors="replace").rstrip("\r\n"), job)
+            if event is not None:
+                rows.append((file_id, pos, event["ts"][:10], event["ts"], event["job"], event["team"],
+                             event["url"], event["kind"], event["error"], event["level"], event["run"],
+                             event["msg"][:MSG_CHARS]))
+            pos += len(raw)
+    return rows, pos
+
+
+def index_file(con, f) -> int:
+    """1 ファイル分を差分で索引する。追加した事象の数を返す。"""
+    gz = f.path.endswith(".gz")
+    mtime_ns = int(f.mtime * 1e9)
+    row = con.execute("SELECT * FROM files WHERE path = ?", (f.rel,)).fetchone()
+    if row is not None and row["size"] == f.size and row["mtime_ns"] == mtime_ns:
+        return 0
+    head = _head(f.path, gz)
+    if row is None and gz:
+        # rotate_logs が圧縮した元ファイル（索引済み）なら、その続きから
+        origin = ROTATED.sub("", f.rel[:-3])
+        prev = con.execute("SELECT * FROM files WHERE path IN (?, ?) AND gz = 0",
+                           (origin, f.rel[:-3])).fetchone()
+        if _same_content(prev, head):
+            row = prev
+            if prev["offset"] >= gz_isize(f.path):
+                con.execute("UPDATE files SET path = ?, gz = 1, size = ?, mtime_ns = ? WHERE id = ?",
+                            (f.rel, f.size, mtime_ns, prev["id"]))
+                return 0
+    if row is not None and (not _same_content(row, head) or (not gz and f.size < row["offset"])):
+        con.execute("DELETE FROM events WHERE file_id = ?", (row["id"],))      # 作り直されたファイル
+        con.execute("DELETE FROM files WHERE id = ?", (row["id"],))
+        row = None
+    if row is None:
+        cur = con.execute("INSERT INTO files (path, job, gz, offset) VALUES (?, ?, ?, 0)",
+                          (f.rel, job_of(f.rel), int(gz)))
+        file_id, job, offset = cur.lastrowid, job_of(f.rel), 0
+    else:
+        file_id, job, offset = row["id"], row["job"], row["offset"]
+    events, offset = _read_events(f.path, gz, offset, file_id, job)
+    con.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+    con.execute("UPDATE files SET path = ?, gz = ?, size = ?, mtime_ns = ?, fp = ?, fp_len = ?, offset = ? "
+                "WHERE id = ?", (f.rel, int(gz), f.size, mtime_ns, _fp(head), len(head), offset, file_id))
+    return len(events)
+
+
+def update(root: str = None, path: str = None) -> dict:
+    """root 以下のログを差分で索引する。集計（dict）を返す。"""
+    root = root or LOG_DIR
+    start = time.monotonic()
+    files = scan(root)
+    # 未圧縮を先に読む（同じ回に圧縮済みになったものは .gz 側でパスを付け替えるだけになる）
+    files.sort(key=lambda f: (f.path.endswith(".gz"), f.path))
+    summary = {"files": len(files), "events": 0, "failed": []}
+    con = connect(path)
+    con.row_factory = sqlite3.Row
+    try:
+        for f in files:
+            try:
+                with con:
+                    summary["events"] += index_file(con, f)
+            except (OSError, EOFError, struct.error) as e:
+                log.warning(f"索引失敗: {f.rel} ({e!r})", path=f.rel)
+                summary["failed"].append(f.rel)
+        with con:
+            live = {f.rel for f in files}
+            gone = [(r[0],) for r in con.execute("SELECT id, path FROM files") if r[1] not in live]
+            con.executemany("DELETE FROM events WHERE file_id = ?", gone)     # rotate_logs が消したもの
+            con.executemany("DELETE FROM files WHERE id = ?", gone)
+        summary["removed"] = len(gone)
+    finally:
+        con.close()
+    summary["seconds"] = round(time.monotonic() - start, 2)
+    return summary
+
+
+def query(team: str = None, job: str = None, error: str = None, url: str = None, run: str = None,
+          days: int = None, since: str = None, level: str = None, limit: int = 200, count_by: str = None,
+          path: str = None) -> list:
+    """条件に合う事象（新しい順）。count_by（team / job / error / url / day / kind）なら件数の集計。"""
+    where, args = [], []
+    if days:
+        since = max(since or "", (date.today() - timedelta(days=days - 1)).isoformat())
+    for column, value in (("team", _team(team)), ("job", job), ("error", error), ("run", run), ("level", level)):
+        if value:
+            where.append(f"{column} = ?")
+            args.append(value)
+    if since:
+        where.append("day >= ?")
+        args.append(since)
+    if url:
+        where.append("url LIKE ?")
+        args.append(f"%{url}%")
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    con = connect(path)
+    try:
+        if count_by:
+            if count_by not in ("team", "job", "error", "url", "day", "kind"):
+                raise ValueError(f"集計できない項目: {count_by}")
+            return con.execute(f"SELECT {count_by}, COUNT(*) AS n FROM events {clause} "
+                               f"GROUP BY {count_by} ORDER BY n DESC LIMIT ?", (*args, limit)).fetchall()
+        return con.execute(f"SELECT ts, job, team, kind, error, url, msg FROM events {clause} "
+                           f"ORDER BY ts DESC LIMIT ?", (*args, limit)).fetchall()
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ログの失敗・警告を索引して検索する")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("update", help="索引を更新（新しいログ・追記分・圧縮されたログ）")
+    p = sub.add_parser("query", help="失敗・警告を検索")
+    p.add_argument("--team", help="球団（BayStars / baystars どちらでも）")
+    p.add_argument("--job")
+    p.add_argument("--error", help="エラー種別（http_404 / timeout / connection / no_table / ...）")
+    p.add_argument("--url", help="URL の一部")
+    p.add_argument("--run", help="ラン ID（JSONL のログのみ）")
+    p.add_argument("--level", choices=["WARNING", "ERROR"])
+    p.add_argument("--days", type=int, help="直近 N 日（今日を含む）")
+    p.add_argument("--since", help="この日以降（YYYY-MM-DD）")
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--count-by", choices=["team", "job", "error", "url", "day", "kind"])
+    p.add_argument("--update", action="store_true", help="検索の前に索引を更新")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "update" or args.update:
+        s = update()
+        log(f"索引更新: {s['files']}ファイル 追加 {s['events']}件 削除 {s['removed']}ファイル "
+            f"失敗 {len(s['failed'])}件 ({s['seconds']:.1f}秒)")
+        if args.cmd == "update":
+            return 1 if s["failed"] else 0
+
+    rows = query(args.team, args.job, args.error, args.url, args.run, args.days, args.since, args.level,
+                 args.limit, args.count_by)
+    for r in rows:
+        print("\t".join("" if v is None else str(v) for v in r))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+matchup_service.py
+- 対戦成績（team_splits 配下の 4 種）に答える読み取り専用の HTTP サービス（標準ライブラリのみ）
+- 起動時に全ファイルを読み込み、メモリ上の索引で答える（リクエストごとにファイルは読まない）
+    (種類, 選手)          → 行     … 「打者 X の対 Y」「投手 X の Z 球場」
+    (種類, target[, 球団]) → 行     … 上位 N 件
+  選手名は空白・全角半角を無視して照合（name_resolver.compact_name）
+- RELOAD_INTERVAL 秒ごとにファイルのサイズ/mtime を見て、変わったファイルだけ読み直す
+- 応答は上限付き LRU にキャッシュ（読み直しがあれば世代が変わって自然に無効化）
+- エンドポイントごとの応答時間の p50 / p90 / p99 を /stats で返す
+- 使い方:
+    python3 matchup_service.py --port 8765
+    curl 'http://127.0.0.1:8765/matchup?kind=hitters_vs_team&player=岡本和真&target=Tigers'
+    curl 'http://127.0.0.1:8765/top?kind=pitchers_vs_stadium&target=koshien&stat=防&n=5&order=asc&min=回:10'
+    curl 'http://127.0.0.1:8765/stats'
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from name_resolver import compact_name
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("matchup_service")
+
+# ===== 設定 =====
+SPLITS_ROOT = os.path.join(batch_paths.DATA_DIR, "team_splits")
+HOST = "127.0.0.1"
+PORT = 8765
+RELOAD_INTERVAL = 30          # 秒
+CACHE_SIZE = 4096             # 応答キャッシュの件数
+LATENCY_WINDOW = 10000        # 百分位の計算に使う直近の件数（エンドポイントごと）
+CSV_ENCODING = "utf-8-sig"
+
+# 種類 → team_splits 配下のディレクトリ
+KINDS = {
+    "hitters_vs_team": "hitters/vs_team",
+    "pitchers_vs_team": "pitchers/vs_team",
+    "hitters_vs_stadium": "hitters/vs_stadium",
+    "pitchers_vs_stadium": "pitchers/vs_stadium",
+}
+# ===== 設定ここまで =====
+
+
+def _num(v: str):
+    """CSV の値 → int / float / str（空・NaN は None）。"""
+    if v == "":
+        return None
+    try:
+        return int(v)
+    except ValueError:
+        pass
+    try:
+        f = float(v)
+    except ValueError:
+        return v
+    return None if math.isnan(f) else f
+
+
+class SplitIndex:
+    """全対戦成績の行とその索引。ファイル単位で入れ替える。"""
+
+    def __init__(self, root: str = None):
+        self.root = root or SPLITS_ROOT
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.files = {}         # パス -> (size, mtime_ns, [行])
+        self.by_player = {}     # (種類, 選手名キー) -> {id(行): 行}
+        self.by_target = {}     # (種類, target) -> {id(行): 行}
+        self.loaded_at = None
+
+    def scan(self) -> dict:
+        """今あるファイル: パス -> (種類, league, team, target, size, mtime_ns)。"""
+        found = {}
+        for kind, sub in KINDS.items():
+            base = os.path.join(self.root, sub)
+            if not os.path.isdir(base):
+                continue
+            for league in os.listdir(base):
+                league_dir = os.path.join(base, league)
+                if not os.path.isdir(league_dir):
+                    continue
+                for team in os.listdir(league_dir):
+                    team_dir = os.path.join(league_dir, team)
+                    if not os.path.isdir(team_dir):
+                        continue
+                    for name in os.listdir(team_dir):
+                        if not name.endswith(".csv"):
+                            continue
+                        path = os.path.join(team_dir, name)
+                        st = os.stat(path)
+                        found[path] = (kind, league, team, name[:-len(".csv")], st.st_size, st.st_mtime_ns)
+        return found
+
+    def _read(self, path: str, kind: str, league: str, team: str, target: str) -> list:
+        with open(path, "r", encoding=CSV_ENCODING, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            rows = []
+            for values in reader:
+                row = {"kind": kind, "league": league, "team": team, "target": target}
+                for col, v in zip(header, values):
+                    if col not in row:
+                        row[col] = _num(v) if col not in ("名前", "席", "腕") else v
+                rows.append(row)
+        return rows
+
+    def _add(self, rows: list):
+        for row in rows:
+            key = (row["kind"], compact_name(row.get("名前", "")))
+            self.by_player.setdefault(key, {})[id(row)] = row
+            self.by_target.setdefault((row["kind"], row["target"]), {})[id(row)] = row
+
+    def _remove(self, rows: list):
+        for row in rows:
+            for index, key in ((self.by_player, (row["kind"], compact_name(row.get("名前", "")))),
+                               (self.by_target, (row["kind"], row["target"]))):
+                bucket = index.get(key)
+                if bucket is not None:
+                    bucket.pop(id(row), None)
+                    if not bucket:
+                        del index[key]
+
+    def refresh(self) -> dict:
+        """変わったファイルだけを読み直す。{"loaded", "removed", "files", "rows"} を返す。"""
+        found = self.scan()
+        changed = {p: info for p, info in found.items()
+                   if self.files.get(p, (None, None))[:2] != info[4:]}
+        removed = [p for p in self.files if p not in found]
+        # 読み込みはロックの外で行い、入れ替えだけをロック内で行う
+        fresh = {}
+        for path, (kind, league, team, target, size, mtime) in changed.items():
+            try:
+                fresh[path] = (size, mtime, self._read(path, kind, league, team, target))
+            except (OSError, csv.Error) as e:
+                log.warning(f"読み込み失敗: {path} ({e!r})")
+        if fresh or removed:
+            with self.lock:
+                for path in removed + list(fresh):
+                    old = self.files.pop(path, None)
+                    if old:
+                        self._remove(old[2])
+                for path, entry in fresh.items():
+                    self.files[path] = entry
+                    self._add(entry[2])
+                self.generation += 1
+                self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        return {"loaded": len(fresh), "removed": len(removed), "files": len(self.files),
+                "rows": sum(len(e[2]) for e in self.files.values())}
+
+    def matchup(self, kind: str, player: str, target: str = None, team: str = None) -> list:
+        with self.lock:
+            rows = list(self.by_player.get((kind, compact_name(player)), {}).values())
+        return sorted((r for r in rows if (target is None or r["target"] == target)
+                       and (team is None or r["team"] == team)),
+                      key=lambda r: (r["team"], r["target"]))
+
+    def top(self, kind: str, target: str, stat: str, n: int = 10, team: str = None,
+            ascending: bool = False, min_stat: str = None, min_value: float = None) -> list:
+        with self.lock:
+            rows = list(self.by_target.get((kind, target), {}).values())
+
+        def ok(r):
+            if team is not None and r["team"] != team:
+                return False
+            if not isinstance(r.get(stat), (int, float)):
+                return False
+            if min_stat is not None:
+                v = r.get(min_stat)
+                return isinstance(v, (int, float)) and v >= min_value
+            return True
+
+        pick = heapq.nsmallest if ascending else heapq.nlargest
+        return pick(n, filter(ok, rows), key=lambda r: r[stat])
+
+
+class LRUCache:
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+
+class Latency:
+    """エンドポイントごとの直近の応答時間（ms）。"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, endpoint: str, ms: float):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(ms)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def percentiles(self) -> dict:
+        with self.lock:
+            snapshot = {k: sorted(v) for k, v in self.samples.items()}
+            counts = dict(self.counts)
+        out = {}
+        for endpoint, values in snapshot.items():
+            pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))]   # noqa: E731
+            out[endpoint] = {"count": counts[endpoint], "p50_ms": round(pick(50), 3),
+                             "p90_ms": round(pick(90), 3), "p99_ms": round(pick(99), 3),
+                             "max_ms": round(values[-1], 3)}
+        return out
+
+
+ENDPOINTS = ("/matchup", "/top", "/stats", "/health")
+INDEX = SplitIndex()
+CACHE = LRUCache()
+LATENCY = Latency()
+
+
+def _param(qs: dict, name: str, default=None):
+    values = qs.get(name)
+    return values[0] if values else default
+
+
+def answer(path: str, qs: dict):
+    """(HTTP ステータス, 応答 dict)。"""
+    kind = _param(qs, "kind")
+    if path in ("/matchup", "/top") and kind not in KINDS:
+        return 400, {"error": f"kind は {', '.join(KINDS)} のいずれか"}
+    if path == "/matchup":
+        player = _param(qs, "player")
+        if not player:
+            return 400, {"error": "player が必要です"}
+        rows = INDEX.matchup(kind, player, _param(qs, "target"), _param(qs, "team"))
+        return 200, {"rows": rows}
+    if path == "/top":
+        target, stat = _param(qs, "target"), _param(qs, "stat")
+        if not target or not stat:
+            return 400, {"error": "target と stat が必要です"}
+        min_stat = min_value = None
+        if _param(qs, "min"):
+            min_stat, _, v = _param(qs, "min").partition(":")
+            min_value = float(v or 0)
+        rows = INDEX.top(kind, target, stat, n=int(_param(qs, "n", 10)), team=_param(qs, "team"),
+                         ascending=_param(qs, "order", "desc") == "asc",
+                         min_stat=min_stat, min_value=min_value)
+        return 200, {"rows": rows}
+    if path == "/stats":
+        return 200, {"generation": INDEX.generation, "loaded_at": INDEX.loaded_at,
+                     "files": len(INDEX.files), "cache": {"size": len(CACHE.data), "hits": CACHE.hits,
+                                                         "misses": CACHE.misses},
+                     "latency": LATENCY.percentiles()}
+    if path == "/health":
+        return 200, {"ok": True}
+    return 404, {"error": "not found"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        start = time.perf_counter()
+        parts = urlsplit(self.path)
+        qs = parse_qs(parts.query)
+        cacheable = parts.path in ("/matchup", "/top")
+        key = (INDEX.generation, parts.path, parts.query)
+        body = CACHE.get(key) if cacheable else None
+        status = 200
+        if body is None:
+            try:
+                status, result = answer(parts.path, qs)
+            except (ValueError, KeyError) as e:
+                status, result = 400, {"error": repr(e)}
+            body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            if cacheable and status == 200:
+                CACHE.put(key, body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        endpoint = parts.path if parts.path in ENDPOINTS else "other"
+        LATENCY.add(endpoint, (time.perf_counter() - start) * 1000)
+
+    def log_message(self, format, *args):
+        pass   # アクセスログは出さない（/stats で集計を見る）
+
+
+def reload_loop(interval: int):
+    while True:
+        time.sleep(interval)
+        try:
+            r = INDEX.refresh()
+            if r["loaded"] or r["removed"]:
+                log(f"再読み込み: {r['loaded']}ファイル更新 / {r['removed']}ファイル削除（全 {r['files']}ファイル {r['rows']}行）")
+        except Exception as e:
+            log.warning(f"再読み込み失敗: {e!r}")
+        batch_log.flush()     # 常駐プロセスなので、書き込みの少ない時間帯もログを溜めたままにしない
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="対戦成績の読み取り専用クエリサービス")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--root", default=SPLITS_ROOT)
+    parser.add_argument("--reload-interval", type=int, default=RELOAD_INTERVAL)
+    args = parser.parse_args(argv)
+
+    INDEX.root = args.root
+    start = time.monotonic()
+    r = INDEX.refresh()
+    log(f"読み込み完了: {r['files']}ファイル {r['rows']}行 ({time.monotonic() - start:.1f}秒)")
+    threading.Thread(target=reload_loop, args=(args.reload_interval,), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    log(f"待ち受け: http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+name_resolver.py
+- 対戦相手名・球場名 → 英字スラッグの共通変換（分割スクリプトのファイル名に使う）
+- 辞書のキーは最初に 1 回だけ正規化し、複数パターン照合（Aho-Corasick）で
+  「名前に含まれる最も長いキー」を 1 回の走査で探す（辞書の並び順に依存しない）
+  例: 「みずほPayPayドーム」は "PayPay" ではなく "みずほPayPay" に一致
+- 変換結果は上限付き LRU でメモ化
+- 辞書に無い名前は ASCII 整形 → ハッシュの決まった手順でスラッグ化し、名前ごとに 1 回だけログに出す
+- 使い方:
+    STADIUM_RESOLVER = NameResolver(STADIUM_NAME_MAP, normalize=compact_name, label="stadium", log=log)
+    STADIUM_RESOLVER.resolve("ZOZOマリン")   # -> "zozo_marine"
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# ====== 設定 ======
+CACHE_SIZE = 1024
+# ====== 設定ここまで ======
+
+
+def strip_name(s) -> str:
+    """NFKC 正規化 + 前後の空白除去（チーム名用）。"""
+    return unicodedata.normalize("NFKC", str(s)).strip()
+
+
+def compact_name(s) -> str:
+    """NFKC 正規化 + 全角/半角スペース除去（球場名用）。"""
+    return unicodedata.normalize("NFKC", str(s)).replace(" ", "").replace("\u3000", "")
+
+
+def ascii_slug(s: str) -> str:
+    n = re.sub(r'[\\/:*?"<>|]+', '_', str(s))
+    n = re.sub(r'[^0-9A-Za-z_.-]+', '_', n)
+    n = n.strip("._")
+    return n or "unknown"
+
+
+def fallback_slug(s: str) -> str:
+    """
+    辞書に無い名前：英数字があれば ASCII 整形、無ければ md5 の先頭 8 桁。
+    （ascii_slug の結果で判定すると、英数字の無い名前が全部 "unknown" になって同じファイルに重なる）
+    """
+    if re.search(r'[A-Za-z0-9]', str(s)):
+        return ascii_slug(s)
+    return "u" + hashlib.md5(s.encode("utf-8")).hexdigest()[:8]
+
+
+class _Automaton:
+    """正規化済みキーの Aho-Corasick。各ノードに「そこで終わる最長のキー番号」を持たせる。"""
+
+    def __init__(self, keys: list):
+        self.keys = keys
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [-1]
+        for idx, key in enumerate(keys):
+            node = 0
+            for ch in key:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(-1)
+                node = nxt
+            self.best[node] = self._better(self.best[node], idx)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.best[nxt] = self._better(self.best[nxt], self.best[self.fail[nxt]])
+                queue.append(nxt)
+
+    def _better(self, a: int, b: int) -> int:
+        """長いキーを優先、同じ長さなら辞書で先のキー。"""
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        la, lb = len(self.keys[a]), len(self.keys[b])
+        if la != lb:
+            return a if la > lb else b
+        return min(a, b)
+
+    def longest(self, text: str) -> int:
+        """text に含まれる最長キーの番号（無ければ -1）。"""
+        node = 0
+        found = -1
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if self.best[node] >= 0:
+                found = self._better(found, self.best[node])
+        return found
+
+
+class NameResolver:
+    """日本語名 → 英字スラッグ。辞書キーの部分一致（最長一致）→ 無ければ fallback_slug。"""
+
+    def __init__(self, mapping: dict, normalize=strip_name, label: str = "name",
+                 log=None, cache_size: int = CACHE_SIZE):
+        self.normalize = normalize
+        self.label = label
+        self.log = log
+        keys, values = [], []
+        for jp, slug in mapping.items():
+            key = normalize(jp)
+            if key and key not in keys:
+                keys.append(key)
+                values.append(slug)
+        self._values = values
+        self._automaton = _Automaton(keys)
+        self._reported = set()
+        self._lock = threading.Lock()
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, name) -> str:
+        s = self.normalize(name)
+        idx = self._automaton.longest(s)
+        if idx >= 0:
+            return self._values[idx]
+        slug = fallback_slug(s)
+        self._report(name, slug)
+        return slug
+
+    def _report(self, name, slug: str):
+        with self._lock:
+            if name in self._reported:
+                return
+            self._reported.add(name)
+        if self.log:
+            note = "（短すぎるスラッグ）" if len(slug) <= 2 else ""
+            self.log(f"[WARN] {self.label} 辞書に無い名前: original='{name}', slug='{slug}'{note}")
+
+    def unknown(self) -> list:
+        """この実行で辞書に無かった名前の一覧。"""
+        with self._lock:
+            return sorted(str(n) for n in self._reported)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+parquet_output.py
+- CSV と並行して、型付き・圧縮済みの Parquet データセットを書き出す出力先
+- 配置（Hive 形式のパーティション）:
+    PARQUET_ROOT/season=2025/dataset=batter/league=Central/team=giants/part-0.parquet
+    PARQUET_ROOT/season=2025/dataset=hitters_vs_team/league=Central/team=Giants/part-0.parquet
+  （対戦成績は 1 球団 1 ファイルにまとめ、対戦相手/球場のスラッグを target 列に持つ）
+- データセットごとに列と型を明示（SCHEMAS / SPLIT_ID_COLS）。数値化できない値は null
+- pyarrow が無い環境、または BATCH_PARQUET=off のときは何もしない（CSV だけ出力）
+- 読み出し例:
+    df = parquet_output.read("batter", league="Central")
+"""
+
+import os
+from datetime import date
+
+import pandas as pd
+
+import batch_paths
+import csv_writer
+from split_tables import with_unique_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# ====== 設定 ======
+PARQUET_ROOT = os.path.join(batch_paths.DATA_DIR, "parquet")
+COMPRESSION = "zstd"
+ENABLED = pa is not None and os.environ.get("BATCH_PARQUET", "on") != "off"
+
+# baseball-data.com 側の球団キー → リーグ
+TEAM_LEAGUE = {
+    "fighters": "Pacific", "hawks": "Pacific", "buffaloes": "Pacific",
+    "marines": "Pacific", "lions": "Pacific", "eagles": "Pacific",
+    "giants": "Central", "tigers": "Central", "swallows": "Central",
+    "dragons": "Central", "carp": "Central", "baystars": "Central",
+}
+
+# データセット → [(列名, 型)]。型は "string" / "int64" / "float64"
+SCHEMAS = {
+    "batter": [
+        ("player_id", "int64"), ("背番号", "string"), ("選手名", "string"), ("打率", "float64"),
+        ("試合", "int64"), ("打席数", "int64"), ("打数", "int64"), ("安打", "int64"),
+        ("本塁打", "int64"), ("打点", "int64"), ("盗塁", "int64"), ("四球", "int64"),
+        ("死球", "int64"), ("三振", "int64"), ("犠打", "int64"), ("併殺打", "int64"),
+        ("出塁率", "float64"), ("長打率", "float64"), ("OPS", "float64"),
+        ("RC27", "float64"), ("XR27", "float64"),
+    ],
+    "pitcher": [
+        ("player_id", "int64"), ("背番号", "string"), ("選手名", "string"), ("防御率", "float64"),
+        ("試合", "int64"), ("勝利", "int64"), ("敗北", "int64"), ("セーブ", "int64"),
+        ("ホールド", "int64"), ("勝率", "float64"), ("打者", "int64"), ("投球回", "float64"),
+        ("被安打", "int64"), ("被本塁打", "int64"), ("与四球", "int64"), ("与死球", "int64"),
+        ("奪三振", "int64"), ("失点", "int64"), ("自責点", "int64"),
+        ("WHIP", "float64"), ("DIPS", "float64"),
+    ],
+}
+
+# 対戦成績（split）データセット → ID 列（文字列）。それ以外の指標列は float64、先頭に target 列と player_id（int64）
+SPLIT_ID_COLS = {
+    "hitters_vs_team": ["背番", "名前", "席"],
+    "pitchers_vs_team": ["背番", "名前", "腕"],
+    "hitters_vs_stadium": ["背番", "名前", "席"],
+    "pitchers_vs_stadium": ["背番", "名前", "腕"],
+}
+# ====== 設定ここまで ======
+
+_TYPES = {}
+if pa is not None:
+    _TYPES = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64()}
+
+
+def league_of(team: str):
+    return TEAM_LEAGUE.get(str(team).lower())
+
+
+def season() -> int:
+    """書き出すシーズン。リプレイ中はリプレイ日の年。"""
+    from http_client import replay_day
+    day = replay_day()
+    return int(str(day)[:4]) if day else date.today().year
+
+
+def _text(series: pd.Series) -> list:
+    """文字列列へ。数値で読まれた背番号などは整数表記に戻す。欠損は None。"""
+    out = []
+    for v in series.tolist():
+        if v is None or (isinstance(v, float) and v != v):
+            out.append(None)
+        elif isinstance(v, float) and v.is_integer():
+            out.append(str(int(v)))
+        else:
+            out.append(str(v))
+    return out
+
+
+def _column(series: pd.Series, kind: str):
+    if kind == "string":
+        return pa.array(_text(series), type=pa.string())
+    values = pd.to_numeric(series, errors="coerce")
+    if kind == "int64":
+        try:
+            return pa.array(values, type=pa.int64(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"列 {series.name} を int64 にできません: {e}")
+    return pa.array(values.astype("float64"), type=pa.float64(), from_pandas=True)
+
+
+def to_table(df: pd.DataFrame, fields: list):
+    """fields（[(列名, 型)]）どおりの pyarrow.Table。df に無い列は null で埋める。"""
+    arrays = []
+    for name, kind in fields:
+        if name in df.columns:
+            arrays.append(_column(df[name], kind))
+        else:
+            arrays.append(pa.nulls(len(df), type=_TYPES[kind]))
+    schema = pa.schema([(name, _TYPES[kind]) for name, kind in fields])
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def partition_dir(dataset: str, league: str = None, team: str = None, year: int = None) -> str:
+    parts = [PARQUET_ROOT, f"season={year or season()}", f"dataset={dataset}"]
+    if league:
+        parts.append(f"league={league}")
+    if team:
+        parts.append(f"team={team}")
+    return os.path.join(*parts)
+
+
+def _write(table, dataset: str, league: str, team: str) -> str:
+    path = os.path.join(partition_dir(dataset, league, team), "part-0.parquet")
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=COMPRESSION)
+    csv_writer.write_bytes(path, sink.getvalue().to_pybytes())   # 内容が同じなら置き換えない
+    return path
+
+
+def write(dataset: str, df: pd.DataFrame, league: str = None, team: str = None):
+    """SCHEMAS[dataset] の型で 1 パーティション分を書き出す（置き換え）。無効時は None。"""
+    if not ENABLED:
+        return None
+    return _write(to_table(df, SCHEMAS[dataset]), dataset, league, team)
+
+
+def write_splits(dataset: str, parts: list, league: str, team: str):
+    """
+    対戦成績 1 球団分（[(target スラッグ, 表)]）を 1 ファイルにまとめて書き出す。
+    列は target + player_id（int64）+ ID 列（文字列）+ 指標列（float64、最初に現れた順）。無効時は None。
+    重複する列名は ".1" などを付けて別の列にする（split_store の統合表と同じ列名）。
+    """
+    if not ENABLED or not parts:
+        return None
+    id_cols = SPLIT_ID_COLS[dataset]
+    parts = [(target, with_unique_columns(sub)) for target, sub in parts]
+    stat_cols = []
+    for _, sub in parts:
+        for col in sub.columns:
+            if col not in id_cols and col != "player_id" and col not in stat_cols:
+                stat_cols.append(col)
+    df = pd.concat([sub.assign(target=target) for target, sub in parts], ignore_index=True)
+    fields = [("target", "string"), ("player_id", "int64")]
+    fields += [(c, "string") for c in id_cols] + [(c, "float64") for c in stat_cols]
+    return _write(to_table(df, fields), dataset, league, team)
+
+
+def read(dataset: str, year: int = None, league: str = None, team: str = None) -> pd.DataFrame:
+    """データセットを読み出す（league / team で絞り込み、パーティション列も付ける）。"""
+    if pa is None:
+        raise RuntimeError("pyarrow が必要です")
+    import pyarrow.dataset as ds
+
+    root = os.path.join(PARQUET_ROOT, f"season={year or season()}", f"dataset={dataset}")
+    data = ds.dataset(root, format="parquet", partitioning="hive")
+    expr = None
+    for key, value in (("league", league), ("team", team)):
+        if value is not None:
+            cond = ds.field(key) == value
+            expr = cond if expr is None else expr & cond
+    return data.to_table(filter=expr).to_pandas()
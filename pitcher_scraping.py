@@ -1,20 +1,17 @@
 import pandas as pd
 import os
-from datetime import datetime
 
-# === ログ設定 ===
-log_dir = "/home/ec2-user/batch/logs"
-os.makedirs(log_dir, exist_ok=True)
-
-log_file = os.path.join(log_dir, f"pitcher_scraping_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-def log(msg):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {msg}\n")
-    print(f"[{timestamp}] {msg}")
+import batch_log
+import batch_paths
+import csv_writer
+import parquet_output
+import player_ids
+import run_metrics
+from http_client import apply_replay_arg, fetch, stats_summary
+from table_extract import read_table
 
-log("=== ピッチャーデータ取得処理 開始 ===")
+# === ログ設定 ===
+log = batch_log.get_logger("pitcher_scraping")
 
 # 球団とURLの辞書
 teams = {
@@ -33,7 +30,7 @@ teams = {
 }
 
 # 出力先ディレクトリ
-output_dir = "/home/ec2-user/batch/data/pitcher"
+output_dir = os.path.join(batch_paths.DATA_DIR, "pitcher")
 os.makedirs(output_dir, exist_ok=True)
 
 # ピッチャーのカラム定義
@@ -43,23 +40,43 @@ columns = [
     "失点", "自責点", "WHIP", "DIPS"
 ]
 
-# 各チームのデータ取得処理
-for team_key, url in teams.items():
-    try:
-        log(f"[{team_key}] URL取得開始：{url}")
-        tables = pd.read_html(url)
-        df = tables[0]
+def main():
+    log("=== ピッチャーデータ取得処理 開始 ===")
+
+    # 各チームのデータ取得処理
+    for team_key, url in teams.items():
+        with run_metrics.team(team_key):
+            try:
+                log(f"[{team_key}] URL取得開始：{url}", team=team_key)
+                output_path = os.path.join(output_dir, f"{team_key}.csv")
+                res = fetch(url, commit=False)
+                if res.not_modified and os.path.exists(output_path):
+                    log(f"[{team_key}] 更新なし（304）：保存をスキップ", team=team_key)
+                    run_metrics.skipped()
+                    continue
+
+                df = read_table(res.content)
 
-        if df.iloc[0].equals(df.iloc[1]):
-            df = df.drop(1).reset_index(drop=True)
+                if df.iloc[0].equals(df.iloc[1]):
+                    df = df.drop(1).reset_index(drop=True)
 
-        df.columns = columns
-        output_path = os.path.join(output_dir, f"{team_key}.csv")
-        df.to_csv(output_path, index=False, encoding="utf-8-sig")
-        log(f"[{team_key}] データ保存成功：{output_path}")
+                df.columns = columns
+                df.insert(0, "player_id", pd.array(player_ids.ids_for(team_key, df["背番号"], df["選手名"]), dtype="Int64"))
+                if csv_writer.write_csv(df, output_path):
+                    log(f"[{team_key}] データ保存成功：{output_path}", team=team_key)
+                else:
+                    log(f"[{team_key}] 内容変更なし：{output_path}", team=team_key)
+                pq_path = parquet_output.write("pitcher", df, league=parquet_output.league_of(team_key), team=team_key)
+                if pq_path:
+                    log(f"[{team_key}] Parquet保存：{pq_path}", team=team_key)
+                res.commit()   # 書き出しまで済んだ回だけ、次回 304 で飛ばせるようにする
 
-    except Exception as e:
-        log(f"[{team_key}] エラー発生：{e}")
+            except Exception as e:
+                log.error(f"[{team_key}] エラー発生：{e}", team=team_key)
 
-log("=== ピッチャーデータ取得処理 完了 ===")
+    log(stats_summary())
+    log("=== ピッチャーデータ取得処理 完了 ===")
 
+if __name__ == "__main__":
+    apply_replay_arg()
+    main()
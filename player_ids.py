@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+player_ids.py
+- 選手の整数 ID（player_id）を払い出す選手ディメンション（シーズンごと）
+- baseball-data.com（背番号/選手名、球団キー giants など）と nf3（背番/名前、球団 Giants/Softbank など）の
+  行を同じキー（球団 + 背番号 + 正規化した名前）で照合し、同じ選手には同じ ID を付ける
+- 名前の正規化: NFKC（全角英数・半角カナ）→ 空白除去 → 異体字・カナの表記ゆれを統一（NAME_VARIANTS）
+- 背番号が変わった選手は、同じ球団・同じ名前の ID が 1 つだけならそれを引き継ぐ（別名キーとして登録）
+- ID は season * 100000 + 連番。一度払い出した ID は変えない（STORE_PATH の JSON に保存）
+- 新しい ID はファイルロック（STORE_PATH.lock）の中で最新のストアを読み直してから払い出し、その場で保存する
+  （並列に動く別ジョブと同じ ID を重複して払い出さない）
+- 使い方:
+    df.insert(0, "player_id", player_ids.ids_for("giants", df["背番号"], df["選手名"]))
+"""
+
+import fcntl
+import json
+import os
+import threading
+import unicodedata
+from contextlib import contextmanager
+from datetime import date
+
+import batch_paths
+import http_client
+
+# ====== 設定 ======
+STORE_PATH = os.path.join(batch_paths.CACHE_DIR, "player_ids.json")
+ID_BASE = 100000              # player_id = season * ID_BASE + 連番
+# ====== 設定ここまで ======
+
+# nf3 の球団名 → baseball-data.com の球団キー
+TEAM_ALIASES = {
+    "Fighters": "fighters", "Softbank": "hawks", "Lotte": "marines",
+    "Rakuten": "eagles", "Orix": "buffaloes", "Seibu": "lions",
+    "Giants": "giants", "Tigers": "tigers", "BayStars": "baystars",
+    "Carp": "carp", "Dragons": "dragons", "Swallows": "swallows",
+}
+
+# 異体字・旧字（サイトによって表記が分かれるもの）とカナの表記ゆれ
+NAME_VARIANTS = str.maketrans({
+    "髙": "高", "﨑": "崎", "嵜": "崎", "德": "徳", "瀨": "瀬", "濵": "浜", "濱": "浜",
+    "邉": "辺", "邊": "辺", "澤": "沢", "櫻": "桜", "齋": "斎", "齊": "斉", "廣": "広",
+    "黑": "黒", "槇": "槙", "ヶ": "ケ", "ヵ": "カ", "ゑ": "え", "ヱ": "エ",
+    "・": None,
+})
+
+_lock = threading.Lock()
+_store = None           # {"<season>": {"next": 連番, "keys": {キー: ID}}}
+_index = {}             # {"<season>": {(球団, 正規化名): {ID, ...}}}  背番号変更の引き継ぎ判定用
+
+
+def normalize_name(name) -> str:
+    """照合用の名前（NFKC → 空白除去 → 表記ゆれ統一）。"""
+    s = unicodedata.normalize("NFKC", str(name))
+    s = "".join(s.split())
+    return s.translate(NAME_VARIANTS)
+
+
+def canonical_team(team) -> str:
+    team = str(team)
+    return TEAM_ALIASES.get(team, team.lower())
+
+
+def normalize_number(number) -> str:
+    """背番号の表記（数値で読まれた 25.0 / "25.0" → "25"、"00" はそのまま）。"""
+    if number is None or (isinstance(number, float) and number != number):
+        return ""
+    if isinstance(number, float) and number.is_integer():
+        return str(int(number))
+    s = unicodedata.normalize("NFKC", str(number)).strip()
+    if s.endswith(".0") and s[:-2].isdigit():
+        s = s[:-2]
+    return "" if s.lower() == "nan" else s
+
+
+def _read_file() -> dict:
+    try:
+        with open(STORE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_file(store: dict):
+    tmp = f"{STORE_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, STORE_PATH)
+
+
+@contextmanager
+def _file_lock():
+    """ストアをプロセス間で排他する（別ジョブが同時に同じ連番を払い出さないように）。"""
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    with open(STORE_PATH + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _book(season: str) -> dict:
+    global _store
+    if _store is None:
+        _store = _read_file()
+    return _store.setdefault(season, {"next": 1, "keys": {}})
+
+
+def _name_index(season: str) -> dict:
+    index = _index.get(season)
+    if index is None:
+        index = {}
+        for key, pid in _book(season)["keys"].items():
+            team, _, norm = key.split("|", 2)
+            index.setdefault((team, norm), set()).add(pid)
+        _index[season] = index
+    return index
+
+
+def _assign(season: str, missing: list):
+    """
+    未登録キーに ID を付けて保存する（_lock を持った状態で呼ぶ）。
+    ファイルロックの中で最新のストアを読み直してから払い出すので、他プロセスの払い出しと衝突しない。
+    """
+    global _store
+    with _file_lock():
+        _store = _read_file()
+        _index.clear()
+        book = _book(season)
+        keys = book["keys"]
+        index = _name_index(season)
+        for key in missing:
+            if key in keys:
+                continue   # 他プロセスが先に登録済み
+            team, _, norm = key.split("|", 2)
+            # 背番号が変わった場合: 同じ球団・同じ名前の ID が 1 つだけなら引き継ぐ
+            same = index.setdefault((team, norm), set())
+            if len(same) == 1:
+                pid = next(iter(same))
+            else:
+                pid = int(season) * ID_BASE + book["next"]
+                book["next"] += 1
+            keys[key] = pid
+            same.add(pid)
+        _write_file(_store)
+
+
+def _season() -> int:
+    day = http_client.replay_day()
+    return int(str(day)[:4]) if day else date.today().year
+
+
+def _row_key(team: str, number, name):
+    norm = normalize_name(name)
+    if not norm or norm.lower() == "nan":
+        return None
+    return f"{team}|{normalize_number(number)}|{norm}"
+
+
+def ids_for(team, numbers, names, season: int = None) -> list:
+    """背番号・名前の列（同じ長さ）から player_id のリスト。名前が空の行は None。"""
+    season = str(season or _season())
+    team = canonical_team(team)
+    row_keys = [_row_key(team, n, m) for n, m in zip(list(numbers), list(names))]
+    with _lock:
+        keys = _book(season)["keys"]
+        missing = list(dict.fromkeys(k for k in row_keys if k and k not in keys))
+        if missing:
+            _assign(season, missing)
+            keys = _book(season)["keys"]
+        return [keys[k] if k else None for k in row_keys]
+
+
+def player_id(team, number, name, season: int = None):
+    """1 人分の player_id。名前が空なら None。"""
+    return ids_for(team, [number], [name], season)[0]
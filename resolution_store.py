@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+resolution_store.py
+- 「どの URL 候補（チーム記号・leg など）で取得できたか」をキーごとに覚えておく永続ストア
+- 次回は覚えている候補を先頭にして試す → 失敗したときだけ他の候補を再探索
+- ヒット率と、探索を省けたリクエスト数を summary() でログに出せる
+- 再試行（2 番目以降の候補で成功）の回数は run_metrics の fetch 段階の retries にも入れる
+- 保存先は JSON（STORE_PATH）。キー例: "schedule:DB:04", "fp_all_data_vsT.htm:Central:BayStars"
+"""
+
+import json
+import os
+import threading
+
+import batch_paths
+import run_metrics
+
+# ====== 設定 ======
+STORE_PATH = os.path.join(batch_paths.CACHE_DIR, "url_variants.json")
+# ====== 設定ここまで ======
+
+_lock = threading.Lock()
+_learned = None          # key -> 最後に成功した候補
+_dirty = set()           # 今回更新したキー（save 時にファイル側へマージ）
+_stats = {}              # key -> {"lookups", "hits", "avoided", "probes"}
+
+
+def _load():
+    global _learned
+    if _learned is None:
+        try:
+            with open(STORE_PATH, "r", encoding="utf-8") as f:
+                _learned = json.load(f)
+        except (OSError, ValueError):
+            _learned = {}
+    return _learned
+
+
+def ordered(key: str, candidates) -> list:
+    """学習済みの候補を先頭に並べ替えた候補リストを返す（候補外の学習値は無視）。"""
+    candidates = list(candidates)
+    with _lock:
+        learned = _load().get(key)
+    if learned in candidates:
+        return [learned] + [c for c in candidates if c != learned]
+    return candidates
+
+
+def learned(key: str):
+    with _lock:
+        return _load().get(key)
+
+
+def record(key: str, candidates, used, attempts: int, avoided: int = None):
+    """
+    取得成功を記録する。
+    candidates: 元の（学習前の）候補順, used: 成功した候補, attempts: 成功までのリクエスト数
+    avoided: 省けたリクエスト数を呼び出し側で分かっている場合に指定（既定は候補順から算出）
+    """
+    candidates = list(candidates)
+    if attempts > 1:
+        run_metrics.add("fetch", calls=0, retries=attempts - 1)
+    with _lock:
+        store = _load()
+        st = _stats.setdefault(key, {"lookups": 0, "hits": 0, "avoided": 0, "probes": 0})
+        st["lookups"] += 1
+        st["probes"] += attempts - 1
+        if attempts == 1 and store.get(key) == used:
+            st["hits"] += 1
+            # 学習なしなら used に辿り着くまでに失敗していたはずのリクエスト数
+            if avoided is not None:
+                st["avoided"] += avoided
+            elif used in candidates:
+                st["avoided"] += candidates.index(used)
+        if store.get(key) != used:
+            store[key] = used
+            _dirty.add(key)
+
+
+def save():
+    """今回更新したキーを、ファイル上の最新内容にマージして保存する。"""
+    with _lock:
+        if not _dirty:
+            return
+        try:
+            with open(STORE_PATH, "r", encoding="utf-8") as f:
+                on_disk = json.load(f)
+        except (OSError, ValueError):
+            on_disk = {}
+        for key in _dirty:
+            on_disk[key] = _learned[key]
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        tmp = f"{STORE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(on_disk, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, STORE_PATH)
+        _dirty.clear()
+
+
+def summary(prefix: str = "") -> str:
+    """prefix で始まるキーの集計（ヒット率・省けたリクエスト数・再探索リクエスト数）。"""
+    with _lock:
+        rows = [st for key, st in _stats.items() if key.startswith(prefix)]
+    lookups = sum(st["lookups"] for st in rows)
+    hits = sum(st["hits"] for st in rows)
+    avoided = sum(st["avoided"] for st in rows)
+    probes = sum(st["probes"] for st in rows)
+    rate = (hits / lookups * 100) if lookups else 0.0
+    return (f"URL候補学習: ヒット {hits}/{lookups}（{rate:.0f}%） "
+            f"省略できたリクエスト {avoided}件 / 再探索リクエスト {probes}件")
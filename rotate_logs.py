@@ -1,23 +1,52 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-
-import os
-import time
+"""
+rotate_logs.py
+- LOG_DIR 配下（サブディレクトリも含む）のログを、最終更新日時にもとづいて圧縮・削除する
+- LOG_DIR を 1 回だけ走査して stat のスナップショットを作り、以降の判定・容量計算はすべてそこから行う
+    1) UNCOMPRESSED_KEEP_DAYS より古い未圧縮ログを gzip（MAX_WORKERS 並列。.gz は元ファイルの mtime を引き継ぐ）
+    2) COMPRESSED_KEEP_DAYS より古い .gz を削除
+    3) 合計が MAX_TOTAL_MB を超えていれば、古い .gz → 古い未圧縮ログの順に上限まで削除
+  直近 ACTIVE_GRACE_MINUTES 分以内に更新されたファイル（書き込み中のログ）には触らない
+- 拡張子では選ばない（*.jsonl / *.log のほか、旧スクリプトが追記していた <スクリプト名>.py もログとして扱う）。
+  名前が固定の追記型ログで同名の .gz が既にあるときは、<名前>.<mtime>.gz にして上書きしない
+- 使い方:
+    python3 rotate_logs.py              # 実行
+    python3 rotate_logs.py --dry-run    # 圧縮・削除の予定と容量の見込みを表示するだけ
+"""
+
+import argparse
 import gzip
+import heapq
+import os
 import shutil
-from pathlib import Path
-from datetime import datetime, timedelta
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("rotate_logs")
 
 # ===== 設定 =====
-LOG_DIR = Path("/home/ec2-user/batch/logs")
+LOG_DIR = batch_paths.LOG_DIR
 
 # 基本ポリシー
 UNCOMPRESSED_KEEP_DAYS = 2     # 2日より古い未圧縮ログは圧縮
 COMPRESSED_KEEP_DAYS   = 45    # 45日より古い圧縮済みログは削除
 ACTIVE_GRACE_MINUTES   = 10    # 直近10分内に更新のファイルは触らない
 MAX_TOTAL_MB           = 500   # ログ全体の上限MB（超えたら古い圧縮ログから削除）
+MAX_WORKERS            = 4     # 同時に圧縮するファイル数
+COMPRESS_LEVEL         = 6
 # ===== ここまで設定 =====
 
+LogFile = namedtuple("LogFile", "path rel size mtime")
+
+
 def human(n):
     for unit in ["B","KB","MB","GB","TB"]:
         if n < 1024.0:
@@ -25,99 +54,188 @@ def human(n):
         n /= 1024.0
     return f"{n:.1f}PB"
 
-def iter_log_files(root: Path):
-    # 隠しファイルを除く、ファイルのみ
-    for p in root.iterdir():
-        if p.is_file() and not p.name.startswith("."):
-            yield p
 
-def is_recently_modified(path: Path, minutes: int) -> bool:
-    mtime = path.stat().st_mtime
-    return (time.time() - mtime) < (minutes * 60)
+def scan(root: str) -> list:
+    """root 以下のファイル（隠しファイル・隠しディレクトリを除く）を 1 回の走査で stat する。"""
+    files = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError as e:
+            log.warning(f"走査できません: {current} ({e})")
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append(LogFile(entry.path, os.path.relpath(entry.path, root), st.st_size, st.st_mtime))
+            except FileNotFoundError:
+                continue          # 走査中に消えた
+    return files
+
+
+def gz_path_for(f: LogFile, taken: set) -> str:
+    """圧縮先。同名の .gz がある（固定名の追記型ログ）なら mtime を付けた名前にする。"""
+    path = f.path + ".gz"
+    if path in taken:
+        base = f"{f.path}.{datetime.fromtimestamp(f.mtime):%Y%m%d_%H%M%S}"
+        path, n = base + ".gz", 1
+        while path in taken:
+            path, n = f"{base}_{n}.gz", n + 1
+    taken.add(path)
+    return path
+
+
+def plan(files: list, now: float = None) -> dict:
+    """スナップショットから、圧縮するもの [(LogFile, 圧縮先)] と期限切れで消すもの [LogFile] を決める。"""
+    now = now or time.time()
+    grace = now - ACTIVE_GRACE_MINUTES * 60
+    uncompressed_cutoff = now - UNCOMPRESSED_KEEP_DAYS * 86400
+    compressed_cutoff = now - COMPRESSED_KEEP_DAYS * 86400
+    taken = {f.path for f in files}
+    compress, expire = [], []
+    for f in sorted(files, key=lambda f: f.path):
+        if f.mtime >= grace:
+            continue
+        if f.path.endswith(".gz"):
+            if f.mtime < compressed_cutoff:
+                expire.append(f)
+        elif f.mtime < uncompressed_cutoff:
+            compress.append((f, gz_path_for(f, taken)))
+    return {"compress": compress, "expire": expire}
 
-def compress_file(path: Path):
-    gz_path = path.with_suffix(path.suffix + ".gz") if path.suffix != ".gz" else path
-    if gz_path.suffix == ".gz":
-        # すでに .gz は圧縮不要
-        return False
-    try:
-        with open(path, "rb") as fin, gzip.open(gz_path, "wb") as fout:
-            shutil.copyfileobj(fin, fout)
-        orig_size = path.stat().st_size
-        os.remove(path)
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] COMPRESS  {path.name} -> {gz_path.name} ({human(orig_size)})")
-        return True
-    except Exception as e:
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] WARN      圧縮失敗: {path.name} ({e})")
-        return False
 
-def delete_file(path: Path, reason: str):
+def compress_file(f: LogFile, gz_path: str) -> int:
+    """f を gz_path へ圧縮して元を消す。圧縮後のサイズを返す。"""
+    tmp = os.path.join(os.path.dirname(gz_path), f".{os.path.basename(gz_path)}.tmp")   # 走査対象外の名前
     try:
-        size = path.stat().st_size
-        os.remove(path)
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] DELETE    {path.name} ({human(size)}) reason={reason}")
-        return size
-    except Exception as e:
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] WARN      削除失敗: {path.name} ({e})")
-        return 0
-
-def total_size_bytes(root: Path) -> int:
-    return sum(p.stat().st_size for p in iter_log_files(root))
-
-def main():
-    if not LOG_DIR.exists():
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] INFO      作成: {LOG_DIR}")
-        LOG_DIR.mkdir(parents=True, exist_ok=True)
-
-    now = datetime.now()
-    compressed_cutoff  = now - timedelta(days=COMPRESSED_KEEP_DAYS)
-    uncompressed_cutoff = now - timedelta(days=UNCOMPRESSED_KEEP_DAYS)
-
-    # 1) 未圧縮の古いログを圧縮
-    for p in iter_log_files(LOG_DIR):
-        if p.suffix == ".gz":
-            continue
-        if is_recently_modified(p, ACTIVE_GRACE_MINUTES):
-            continue
+        with open(f.path, "rb") as fin, open(tmp, "wb") as raw:
+            with gzip.GzipFile(os.path.basename(f.path), "wb", COMPRESS_LEVEL, raw, f.mtime) as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+        os.utime(tmp, (f.mtime, f.mtime))        # 保持期間・容量制限の古さは元ログの日時で数える
+        os.replace(tmp, gz_path)
+    except BaseException:
         try:
-            mtime = datetime.fromtimestamp(p.stat().st_mtime)
-        except FileNotFoundError:
-            continue
-        if mtime < uncompressed_cutoff:
-            compress_file(p)
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    os.remove(f.path)
+    return os.stat(gz_path).st_size
 
-    # 2) 圧縮済みで古すぎるログ（期限切れ）を削除
-    for p in iter_log_files(LOG_DIR):
-        if p.suffix != ".gz":
-            continue
-        if is_recently_modified(p, ACTIVE_GRACE_MINUTES):
-            continue
-        try:
-            mtime = datetime.fromtimestamp(p.stat().st_mtime)
-        except FileNotFoundError:
-            continue
-        if mtime < compressed_cutoff:
-            delete_file(p, reason=f"older_than_{COMPRESSED_KEEP_DAYS}d")
-
-    # 3) 容量制限（MAX_TOTAL_MB）を超える場合、古い圧縮ログから削除
-    max_total_bytes = MAX_TOTAL_MB * 1024 * 1024
-    cur_total = total_size_bytes(LOG_DIR)
-    if cur_total > max_total_bytes:
-        # 古い順（圧縮済みを優先的に削除、足りなければ未圧縮も）
-        files = sorted(iter_log_files(LOG_DIR), key=lambda x: x.stat().st_mtime)
-        # 圧縮ファイルを先に、未圧縮を後に並べ替え
-        files.sort(key=lambda x: (0 if x.suffix == ".gz" else 1, x.stat().st_mtime))
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] INFO      容量超過 {human(cur_total)} > {MAX_TOTAL_MB}MB。古いものから削除します。")
-        for p in files:
-            if cur_total <= max_total_bytes:
-                break
-            if is_recently_modified(p, ACTIVE_GRACE_MINUTES):
-                continue
-            freed = delete_file(p, reason="disk_cap")
-            cur_total -= freed
 
-    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] DONE      現在の総容量: {human(total_size_bytes(LOG_DIR))}")
+def delete_file(f: LogFile, reason: str, dry_run: bool = False) -> bool:
+    if dry_run:
+        log(f"DELETE    {f.rel} ({human(f.size)}) reason={reason}（dry-run）", action="delete", path=f.rel)
+        return True
+    try:
+        os.remove(f.path)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        log.warning(f"削除失敗: {f.rel} ({e})", action="delete", path=f.rel)
+        return False
+    log(f"DELETE    {f.rel} ({human(f.size)}) reason={reason}", action="delete", path=f.rel, bytes=f.size)
+    return True
+
+
+def enforce_cap(files: list, total: int, max_total_bytes: int, now: float, dry_run: bool = False) -> tuple:
+    """total が上限を超えていれば、古い .gz → 古い未圧縮ログの順に消す。(消したもの, 消した後の合計)"""
+    if total <= max_total_bytes:
+        return [], total
+    log(f"容量超過 {human(total)} > {MAX_TOTAL_MB}MB。古いものから削除します。")
+    grace = now - ACTIVE_GRACE_MINUTES * 60
+    heap = [(0 if f.path.endswith(".gz") else 1, f.mtime, f.path, f) for f in files if f.mtime < grace]
+    heapq.heapify(heap)
+    deleted = []
+    while heap and total > max_total_bytes:
+        f = heapq.heappop(heap)[-1]
+        if delete_file(f, "disk_cap", dry_run):
+            deleted.append(f)
+            total -= f.size
+    return deleted, total
+
+
+def rotate(root: str = None, dry_run: bool = False, max_workers: int = MAX_WORKERS) -> dict:
+    """圧縮・削除を行い、集計（dict）を返す。dry_run なら何も変えずに予定だけを集計する。"""
+    root = root or LOG_DIR
+    start = time.monotonic()
+    os.makedirs(root, exist_ok=True)
+    now = time.time()
+    files = scan(root)
+    total_before = sum(f.size for f in files)
+    todo = plan(files, now)
+    live = {f.path: f for f in files}          # 以降の容量計算はこの表を更新して行う（再走査しない）
+    summary = {
+        "dry_run": dry_run, "files": len(files), "bytes_before": total_before,
+        "compressed": 0, "compressed_bytes_in": 0, "compressed_bytes_out": 0,
+        "expired": 0, "capped": 0, "deleted_bytes": 0, "failed": [],
+    }
+
+    # 1) 圧縮（並列）。dry-run では圧縮後のサイズが分からないので元のサイズのまま見積もる
+    if dry_run:
+        for f, gz_path in todo["compress"]:
+            log(f"COMPRESS  {f.rel} -> {os.path.relpath(gz_path, root)} ({human(f.size)})（dry-run）")
+            summary["compressed"] += 1
+            summary["compressed_bytes_in"] += f.size
+            summary["compressed_bytes_out"] += f.size
+    elif todo["compress"]:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(todo["compress"])))) as pool:
+            futures = {pool.submit(compress_file, f, gz_path): (f, gz_path) for f, gz_path in todo["compress"]}
+            for fut in as_completed(futures):
+                f, gz_path = futures[fut]
+                try:
+                    out_size = fut.result()
+                except Exception as e:
+                    log.warning(f"圧縮失敗: {f.rel} ({e})", action="compress", path=f.rel)
+                    summary["failed"].append(f.rel)
+                    continue
+                del live[f.path]
+                live[gz_path] = LogFile(gz_path, os.path.relpath(gz_path, root), out_size, f.mtime)
+                summary["compressed"] += 1
+                summary["compressed_bytes_in"] += f.size
+                summary["compressed_bytes_out"] += out_size
+                log(f"COMPRESS  {f.rel} -> {live[gz_path].rel} ({human(f.size)} -> {human(out_size)})",
+                    action="compress", path=f.rel, bytes=f.size)
+
+    # 2) 期限切れの .gz を削除
+    for f in todo["expire"]:
+        if delete_file(f, f"older_than_{COMPRESSED_KEEP_DAYS}d", dry_run):
+            live.pop(f.path, None)
+            summary["expired"] += 1
+            summary["deleted_bytes"] += f.size
+
+    # 3) 容量制限（MAX_TOTAL_MB）
+    total = sum(f.size for f in live.values())
+    capped, total = enforce_cap(list(live.values()), total, MAX_TOTAL_MB * 1024 * 1024, now, dry_run)
+    summary["capped"] = len(capped)
+    summary["deleted_bytes"] += sum(f.size for f in capped)
+    summary["bytes_after"] = total
+    summary["seconds"] = round(time.monotonic() - start, 2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ログの圧縮・期限切れ削除・容量制限")
+    parser.add_argument("--dry-run", action="store_true", help="圧縮・削除の予定を表示するだけ")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--root", default=LOG_DIR, help="対象ディレクトリ")
+    args = parser.parse_args(argv)
+
+    s = rotate(args.root, dry_run=args.dry_run, max_workers=args.max_workers)
+    mark = "（dry-run、圧縮後サイズは未圧縮のまま見積もり）" if s["dry_run"] else ""
+    log(f"DONE      {s['files']}ファイル {human(s['bytes_before'])} -> {human(s['bytes_after'])} / "
+        f"圧縮 {s['compressed']}件 ({human(s['compressed_bytes_in'])} -> {human(s['compressed_bytes_out'])}) / "
+        f"期限切れ削除 {s['expired']}件 / 容量超過削除 {s['capped']}件 / 失敗 {len(s['failed'])}件 "
+        f"({s['seconds']:.1f}秒){mark}")
+    return 1 if s["failed"] else 0
 
-if __name__ == "__main__":
-    main()
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_batch.py
+- 毎朝の全ジョブを 1 プロセス（pandas 等の import は 1 回だけ）で実行するオーケストレーター
+- 各ジョブを依存関係つきのタスクとして登録し、並列数を制限して実行
+- S3 アップロード（upload_to_s3.py、変更分のみ）は全取得ジョブの終了直後に開始、その後ログローテーション
+- 日ごとのスナップショット記録（snapshot_store.py）と SQLite への取り込み（warehouse_loader.py）も全取得ジョブの終了後に実行
+- ログは batch_log（全タスク共通のラン ID、書き込みは専用スレッド）
+- 段階別の時間・量（run_metrics）を終了時に JSON レポートと Prometheus textfile に書き出す
+- 実行台帳（run_ledger）に記録し、直近の回と比べて遅くなった・量が減ったジョブ / 球団を警告
+- 使い方:
+    python3 run_batch.py                       # 全タスク
+    python3 run_batch.py --only batter_scraping,pitcher_scraping
+    python3 run_batch.py --max-parallel 2
+    python3 run_batch.py --list                # 登録タスクと依存関係を表示
+    python3 run_batch.py --replay 2025-06-01   # アーカイブ済みページから全取得ジョブを再解析
+    python3 run_batch.py --replay 2025-03-28:2025-10-05   # 期間内のアーカイブ日を順に再解析
+  ※ リプレイ時は取得ジョブのみ（S3 アップロード・ログローテーションは行わない）
+"""
+
+import argparse
+import importlib
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import batch_log
+import run_ledger
+import run_metrics
+
+# ===== ログ設定 =====
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+log = batch_log.get_logger("run_batch")
+
+# ===== 設定 =====
+MAX_PARALLEL = 4   # 同時に走らせるタスク数（サイト別の負荷は fetch_engine.HOST_LIMITS で制御）
+
+# 取得ジョブ：タスク名 → (モジュール名, 実行関数名)
+PRODUCERS = {
+    "batter_scraping":                 ("batter_scraping", "main"),
+    "pitcher_scraping":                ("pitcher_scraping", "main"),
+    "games_scraping":                  ("games_scraping", "main"),
+    "scrape_nf3_schedule_all_teams":   ("scrape_nf3_schedule_all_teams", "main"),
+    "team_batting":                    ("team_batting", "main"),
+    "team_pitcher":                    ("team_pitcher", "main"),
+    "fielding_central":                ("fielding_central", "main"),
+    "fielding_pacific":                ("fielding_pacific", "main"),
+    "scrape_hitters_vs_team_all":      ("scrape_hitters_vs_team_all", "scrape_all"),
+    "scrape_pitchers_vs_team_all":     ("scrape_pitchers_vs_team_all", "scrape_all"),
+    "scrape_hitters_vs_stadium_all":   ("scrape_hitters_vs_stadium_all", "scrape_all"),
+    "scrape_pitchers_vs_stadium_all":  ("scrape_pitchers_vs_stadium_all", "scrape_all"),
+}
+
+
+def module_task(module_name: str, func_name: str):
+    def run():
+        module = importlib.import_module(module_name)
+        getattr(module, func_name)()
+    return run
+
+
+def upload_task():
+    import upload_to_s3
+    if upload_to_s3.main([]) != 0:
+        raise RuntimeError("S3 アップロードに失敗したオブジェクトがあります")
+
+
+def build_tasks() -> dict:
+    """タスク名 → {"run": 実行関数, "deps": [先行タスク名]}"""
+    tasks = {name: {"run": module_task(*target), "deps": []} for name, target in PRODUCERS.items()}
+    tasks["upload_to_s3"] = {"run": upload_task, "deps": list(PRODUCERS)}
+    tasks["snapshot_store"] = {"run": module_task("snapshot_store", "record_all"), "deps": list(PRODUCERS)}
+    tasks["warehouse_loader"] = {"run": module_task("warehouse_loader", "load_all"), "deps": list(PRODUCERS)}
+    tasks["rotate_logs"] = {"run": module_task("rotate_logs", "rotate"), "deps": ["upload_to_s3"]}
+    tasks["log_index"] = {"run": module_task("log_index", "update"), "deps": ["rotate_logs"]}
+    return tasks
+
+
+def select_tasks(tasks: dict, only) -> dict:
+    """--only 指定時は指定タスクだけに絞る（選ばれなかった先行タスクへの依存は外す）。"""
+    if not only:
+        return tasks
+    unknown = [n for n in only if n not in tasks]
+    if unknown:
+        raise SystemExit(f"未知のタスク: {', '.join(unknown)}")
+    return {
+        n: {"run": tasks[n]["run"], "deps": [d for d in tasks[n]["deps"] if d in only]}
+        for n in only
+    }
+
+
+def check_acyclic(tasks: dict):
+    state = {}
+
+    def visit(n, path):
+        if state.get(n) == "done":
+            return
+        if state.get(n) == "visiting":
+            raise SystemExit(f"依存関係が循環しています: {' -> '.join(path + [n])}")
+        state[n] = "visiting"
+        for d in tasks[n]["deps"]:
+            visit(d, path + [n])
+        state[n] = "done"
+
+    for n in tasks:
+        visit(n, [])
+
+
+def run_graph(tasks: dict, max_parallel: int = MAX_PARALLEL) -> dict:
+    """
+    依存関係を満たしたタスクから順に並列実行する。
+    先行タスクが失敗しても後続は実行する（取得できた分はアップロードする）。
+    戻り値：タスク名 → (成否, 秒数)
+    """
+    check_acyclic(tasks)
+    pending = dict(tasks)
+    results = {}
+    running = {}
+
+    def timed(name, func):
+        start = time.monotonic()
+        ok = False
+        try:
+            with run_metrics.job(name):
+                func()
+            ok = True
+        except BaseException as e:   # SystemExit も含めて 1 タスクの失敗として扱う
+            log.error(f"[{name}] 失敗: {e!r}", task=name)
+        sec = time.monotonic() - start
+        run_metrics.finish_job(name, ok, sec)
+        return ok, sec
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        while pending or running:
+            ready = [n for n, t in pending.items() if all(d in results for d in t["deps"])]
+            for name in ready:
+                log(f"[{name}] 開始")
+                running[pool.submit(timed, name, pending.pop(name)["run"])] = name
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                ok, sec = fut.result()
+                results[name] = (ok, sec)
+                log(f"[{name}] {'完了' if ok else '異常終了'} ({sec:.1f}秒)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="毎朝のスクレイピング一式を 1 プロセスで実行")
+    parser.add_argument("--only", help="実行するタスク名（カンマ区切り）")
+    parser.add_argument("--max-parallel", type=int, default=MAX_PARALLEL)
+    parser.add_argument("--list", action="store_true", help="タスクと依存関係を表示して終了")
+    parser.add_argument("--replay", metavar="YYYY-MM-DD[:YYYY-MM-DD]",
+                        help="アーカイブ済みページから再解析（期間指定可）")
+    args = parser.parse_args(argv)
+
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+
+    only = [n.strip() for n in args.only.split(",") if n.strip()] if args.only else None
+    if args.replay and not only:
+        only = list(PRODUCERS)
+    tasks = select_tasks(build_tasks(), only)
+
+    if args.list:
+        for name, t in tasks.items():
+            print(f"{name}: deps={t['deps']}")
+        return 0
+
+    batch_log.run_id()              # 全タスク（と子プロセス）で同じラン ID を使う
+    batch_log.set_background(True)  # 並列タスクのログ書き込みは専用スレッドで行う
+    if args.replay:
+        return replay(tasks, args.replay, args.max_parallel)
+
+    log(f"=== バッチ開始: {len(tasks)}タスク 並列数 {args.max_parallel} ラン {batch_log.run_id()} ===")
+    start = time.monotonic()
+    results = run_graph(tasks, args.max_parallel)
+    failed = [n for n, (ok, _) in results.items() if not ok]
+    import csv_writer
+    log(csv_writer.summary())
+    log(run_metrics.summary())
+    rep = run_metrics.report()
+    try:
+        paths = run_metrics.write_report(rep=rep)
+        log(f"実行レポート: {paths['report']} / textfile: {paths['textfile'] or '書き込みなし'}")
+    except OSError as e:
+        log.warning(f"実行レポートの書き出しに失敗: {e!r}")
+    try:
+        run_ledger.record(rep)
+        for flag in run_ledger.check(rep["run"]):
+            log.warning(f"劣化: {run_ledger.describe(flag)}", job_name=flag["job"], team=flag["team"],
+                        metric=flag["metric"])
+    except (OSError, sqlite3.Error) as e:
+        log.warning(f"実行台帳の更新に失敗: {e!r}")
+    log(f"=== バッチ終了: {time.monotonic() - start:.1f}秒 失敗 {len(failed)}件 {failed if failed else ''}===")
+    return 1 if failed else 0
+
+
+def replay(tasks: dict, spec: str, max_parallel: int) -> int:
+    """アーカイブの日付（単日 or 期間）ごとにタスクをリプレイモードで実行する。"""
+    import html_archive
+    import http_client
+
+    first, _, last = spec.partition(":")
+    last = last or first
+    days = [d for d in html_archive.days() if first <= d <= last]
+    if not days:
+        log(f"リプレイ対象のアーカイブがありません: {spec}")
+        return 1
+
+    failed_total = 0
+    start = time.monotonic()
+    for day in days:
+        http_client.set_replay(day)
+        log(f"=== リプレイ開始: {day} {len(tasks)}タスク ===")
+        results = run_graph(tasks, max_parallel)
+        failed = [n for n, (ok, _) in results.items() if not ok]
+        failed_total += len(failed)
+        log(f"=== リプレイ終了: {day} 失敗 {len(failed)}件 {failed if failed else ''}===")
+    http_client.set_replay(None)
+    log(f"=== リプレイ全体: {len(days)}日分 {time.monotonic() - start:.1f}秒 ===")
+    return 1 if failed_total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
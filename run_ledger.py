@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+run_ledger.py
+- 毎回の実行結果（run_metrics のレポート）を SQLite（LEDGER_PATH）に積み上げる実行台帳
+- ジョブごと・球団ごとに 所要時間 / リクエスト数 / 再試行数 / 行数 / 出力バイト数 / ファイル数 を記録
+- 直近 BASELINE_RUNS 回（同じジョブ・球団が正常に終わった回）を基準に、今回の値を
+  ロバストな z 値（中央値と MAD）で比べ、遅くなった・リクエストや再試行が増えた・行数や出力が減ったものを検出する
+  （基準が MIN_SAMPLES 回に満たないものは判定しない。小さな揺れは ABS_FLOOR と MIN_CHANGE で無視）
+- 304（更新なし）で解析・書き出しを飛ばした球団（run_metrics.skipped）の行数・出力バイト数・ファイル数は NULL として記録し、比較しない。
+  ジョブ全体の量は、飛ばした球団があれば書き出した球団だけの合計を記録し（skipped 列に飛ばした数）、
+  基準も過去の回の同じ球団の合計で作る（一部の球団が 304 でもジョブ全体の量の比較は続ける）
+- run_batch.py が毎回の終了時に record() → check() を呼んでログに出す
+- 使い方:
+    python3 run_ledger.py record                        # metrics/ のレポートのうち未登録のものを取り込む
+    python3 run_ledger.py check                         # 最新の回を基準と比べる（検出ありなら終了コード 1）
+    python3 run_ledger.py check --run 20250601-080000-1234 --window 30
+    python3 run_ledger.py history scrape_nf3_schedule_all_teams --team BayStars
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import statistics
+import sys
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("run_ledger")
+
+# ===== 設定 =====
+LEDGER_PATH = os.path.join(batch_paths.DATA_DIR, "run_ledger.sqlite")
+REPORT_DIR = batch_paths.METRICS_DIR
+BASELINE_RUNS = 14            # 基準にする直近の回数
+MIN_SAMPLES = 5               # 基準がこれ未満なら判定しない
+Z_THRESHOLD = 3.5             # ロバスト z 値のしきい値
+
+# 指標 → 悪化の向き（+1: 増えたら悪い / -1: 減ったら悪い）
+METRICS = {
+    "seconds": +1,
+    "requests": +1,
+    "retries": +1,
+    "rows": -1,
+    "bytes": -1,
+}
+VOLUME_METRICS = ("rows", "bytes")   # 304 で飛ばした分があると測れない量の指標
+# 指標ごとの「ばらつき」の下限（基準が毎回ほぼ同じ値でも、この程度の差は検出しない）
+ABS_FLOOR = {"seconds": 1.0, "requests": 1.0, "retries": 0.5, "rows": 1.0, "bytes": 1024.0}
+# 基準の中央値からの変化率がこれ未満なら検出しない（増加は +50%、減少は -20%）
+MIN_CHANGE = {+1: 0.5, -1: 0.2}
+# ===== 設定ここまで =====
+
+ALL_TEAMS = ""      # ジョブ全体の行の team 列
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    path = path or LEDGER_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""CREATE TABLE IF NOT EXISTS runs (
+        run TEXT PRIMARY KEY, started TEXT, finished TEXT, seconds REAL, jobs INTEGER, failed INTEGER)""")
+    con.execute("""CREATE TABLE IF NOT EXISTS job_runs (
+        run TEXT NOT NULL, job TEXT NOT NULL, team TEXT NOT NULL, started TEXT, ok INTEGER,
+        seconds REAL, requests INTEGER, retries INTEGER, rows INTEGER, bytes INTEGER, files INTEGER,
+        skipped INTEGER, PRIMARY KEY (run, job, team))""")
+    if "skipped" not in {row[1] for row in con.execute("PRAGMA table_info(job_runs)")}:
+        con.execute("ALTER TABLE job_runs ADD COLUMN skipped INTEGER")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_job_runs_job ON job_runs (job, team, started)")
+    return con
+
+
+def _values(stages: dict, seconds: float = None) -> dict:
+    """
+    run_metrics の段階別の値 → 台帳の 1 行分。
+    304 で解析・書き出しを飛ばした分（skipped）があれば、既存の出力のままなので
+    rows / bytes / files は None（量の比較をしない）にする。
+    skipped を持たない古いレポートは、304 が 1 件でもあれば飛ばしたものとみなす。
+    """
+    fetch, parse, write = (stages.get(s, {}) for s in ("fetch", "parse", "write"))
+    if seconds is None:
+        seconds = sum(v.get("seconds", 0) for v in stages.values())
+    skipped = write.get("skipped", fetch.get("not_modified", 0))
+    return {
+        "seconds": round(seconds, 3),
+        "requests": fetch.get("calls", 0),
+        "retries": fetch.get("retries", 0),
+        "rows": None if skipped else parse.get("rows", 0),
+        "bytes": None if skipped else write.get("bytes", 0),
+        "files": None if skipped else write.get("files", 0) + write.get("unchanged", 0),
+        "skipped": skipped,
+    }
+
+
+def record(rep: dict, path: str = None) -> int:
+    """run_metrics.report() の内容を 1 回分として登録する（同じラン ID は置き換え）。登録した行数を返す。"""
+    rows = []
+    for job, data in rep["jobs"].items():
+        ok = data.get("ok")
+        ok = None if ok is None else int(ok)
+        teams = [(team, _values(stages)) for team, stages in data.get("teams", {}).items()]
+        total = _values(data["stages"], data.get("seconds"))
+        if total["skipped"]:
+            # 飛ばした球団があれば、ジョブ全体の量は書き出した球団だけの合計（球団別が無ければ None）
+            written = [v for _, v in teams if v["rows"] is not None]
+            for name in ("rows", "bytes", "files"):
+                total[name] = sum(v[name] for v in written) if written else None
+        rows.append((job, ALL_TEAMS, ok, total))
+        rows += [(job, team, ok, v) for team, v in teams]
+    failed = sum(1 for data in rep["jobs"].values() if data.get("ok") is False)
+
+    con = connect(path)
+    try:
+        with con:
+            con.execute("DELETE FROM job_runs WHERE run = ?", (rep["run"],))
+            con.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                        (rep["run"], rep["started"], rep["finished"], rep["seconds"], len(rep["jobs"]), failed))
+            con.executemany(
+                "INSERT INTO job_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(rep["run"], job, team, rep["started"], ok, v["seconds"], v["requests"], v["retries"],
+                  v["rows"], v["bytes"], v["files"], v["skipped"]) for job, team, ok, v in rows])
+    finally:
+        con.close()
+    return len(rows)
+
+
+def record_reports(report_dir: str = None, path: str = None) -> int:
+    """report_dir のレポートのうち、まだ台帳に無いものを取り込む。取り込んだ回数を返す。"""
+    con = connect(path)
+    try:
+        known = {row[0] for row in con.execute("SELECT run FROM runs")}
+    finally:
+        con.close()
+    count = 0
+    for report_path in sorted(glob.glob(os.path.join(report_dir or REPORT_DIR, "run_*.json"))):
+        with open(report_path, "r", encoding="utf-8") as f:
+            rep = json.load(f)
+        if rep.get("run") in known:
+            continue
+        record(rep, path)
+        count += 1
+    return count
+
+
+def _latest_run(con) -> str:
+    row = con.execute("SELECT run FROM runs ORDER BY started DESC, run DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def robust_z(value: float, baseline: list, floor: float):
+    """(z 値, 中央値)。ばらつきは 1.4826 * MAD（正規分布の標準偏差相当）と floor の大きい方。"""
+    median = statistics.median(baseline)
+    mad = statistics.median(abs(b - median) for b in baseline)
+    scale = max(1.4826 * mad, floor)
+    return (value - median) / scale, median
+
+
+def _written_baseline(con, job: str, teams: list, started: str, window: int) -> list:
+    """
+    過去の直近 window 回それぞれで、teams（今回書き出した球団）の (rows, bytes) を合計したもの。
+    どれかの球団の量が無い（その回は 304 で飛ばした）回は使わない。
+    """
+    if not teams:
+        return []
+    marks = ", ".join("?" * len(teams))
+    found = con.execute(
+        "SELECT t.run, t.rows, t.bytes FROM job_runs t JOIN ("
+        "  SELECT run FROM job_runs WHERE job = ? AND team = ? AND started < ? AND ok IS NOT 0 "
+        "  ORDER BY started DESC LIMIT ?) r ON r.run = t.run "
+        f"WHERE t.job = ? AND t.team IN ({marks})",
+        (job, ALL_TEAMS, started, window, job, *teams)).fetchall()
+    per_run = {}
+    for run, rows, size in found:
+        per_run.setdefault(run, []).append((rows, size))
+    return [(sum(r for r, _ in v), sum(b for _, b in v)) for v in per_run.values()
+            if len(v) == len(teams) and all(r is not None and b is not None for r, b in v)]
+
+
+def check(run: str = None, window: int = BASELINE_RUNS, path: str = None) -> list:
+    """
+    run（既定は最新の回）の各ジョブ・球団・指標を、それより前の直近 window 回と比べる。
+    検出したものを [{job, team, metric, value, median, z, change}] で返す（悪い順）。
+    """
+    con = connect(path)
+    try:
+        run = run or _latest_run(con)
+        if run is None:
+            return []
+        current = con.execute(
+            "SELECT job, team, started, seconds, requests, retries, rows, bytes, skipped FROM job_runs "
+            "WHERE run = ?", (run,)).fetchall()
+        written = {}      # job -> 今回書き出した（量を測った）球団
+        for job, team, *_, rows, _, _ in current:
+            if team != ALL_TEAMS and rows is not None:
+                written.setdefault(job, []).append(team)
+        found = []
+        for job, team, started, *values, skipped in current:
+            history = con.execute(
+                "SELECT seconds, requests, retries, rows, bytes, skipped FROM job_runs "
+                "WHERE job = ? AND team = ? AND started < ? AND ok IS NOT 0 "
+                "ORDER BY started DESC LIMIT ?", (job, team, started, window)).fetchall()
+            partial = None
+            if team == ALL_TEAMS and skipped:
+                # 今回のジョブ全体の量は書き出した球団だけの合計 → 基準も同じ球団の合計で作る
+                partial = _written_baseline(con, job, written.get(job, []), started, window)
+            for i, (metric, direction) in enumerate(METRICS.items()):
+                value = values[i]
+                if metric not in VOLUME_METRICS:
+                    baseline = [h[i] for h in history]
+                elif partial is not None:
+                    baseline = [p[VOLUME_METRICS.index(metric)] for p in partial]
+                else:
+                    # None は 304 で量を測っていない回、skipped のある回は一部の球団だけの合計
+                    baseline = [h[i] for h in history if h[i] is not None and not h[-1]]
+                if value is None or len(baseline) < MIN_SAMPLES:
+                    continue
+                z, median = robust_z(value, baseline, ABS_FLOOR[metric])
+                change = (value - median) / median if median else float("inf") if value else 0.0
+                if z * direction >= Z_THRESHOLD and change * direction >= MIN_CHANGE[direction]:
+                    found.append({"job": job, "team": team or None, "metric": metric, "value": value,
+                                  "median": median, "z": round(z, 1), "change": round(change, 3)})
+    finally:
+        con.close()
+    found.sort(key=lambda f: -abs(f["z"]))
+    return found
+
+
+def describe(flag: dict) -> str:
+    where = f"{flag['job']} / {flag['team']}" if flag["team"] else flag["job"]
+    change = "新規" if flag["change"] == float("inf") else f"{flag['change'] * 100:+.0f}%"
+    return (f"{where}: {flag['metric']} {flag['value']:g}（基準の中央値 {flag['median']:g}, "
+            f"{change}, z={flag['z']:+.1f}）")
+
+
+def history(job: str, team: str = None, limit: int = 30, path: str = None) -> list:
+    con = connect(path)
+    try:
+        return con.execute(
+            "SELECT run, ok, seconds, requests, retries, rows, bytes, files FROM job_runs "
+            "WHERE job = ? AND team = ? ORDER BY started DESC LIMIT ?",
+            (job, team or ALL_TEAMS, limit)).fetchall()
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="実行台帳（ジョブ・球団ごとの時間と量の推移、劣化の検出）")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("record", help="metrics/ のレポートを取り込む")
+    p.add_argument("reports", nargs="*", help="取り込むレポート（省略時は未登録のものすべて）")
+    p = sub.add_parser("check", help="基準と比べて劣化を検出")
+    p.add_argument("--run", help="対象のラン ID（既定は最新）")
+    p.add_argument("--window", type=int, default=BASELINE_RUNS, help="基準にする直近の回数")
+    p = sub.add_parser("history", help="ジョブ（・球団）の推移")
+    p.add_argument("job")
+    p.add_argument("--team")
+    p.add_argument("--limit", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "record":
+        if args.reports:
+            for report_path in args.reports:
+                with open(report_path, "r", encoding="utf-8") as f:
+                    record(json.load(f))
+            log(f"取り込み: {len(args.reports)}回分")
+        else:
+            log(f"取り込み: {record_reports()}回分")
+        return 0
+
+    if args.cmd == "check":
+        flags = check(args.run, args.window)
+        for flag in flags:
+            log.warning(f"劣化: {describe(flag)}", job_name=flag["job"], team=flag["team"], metric=flag["metric"])
+        if not flags:
+            log("劣化の検出なし")
+        return 1 if flags else 0
+
+    print("run\tok\tseconds\trequests\tretries\trows\tbytes\tfiles")
+    for row in history(args.job, args.team, args.limit):
+        print("\t".join("" if v is None else str(v) for v in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+run_metrics.py
+- ジョブごと・段階ごと（fetch / decode / parse / transform / write）の所要時間と量（バイト・行・ファイル）を集計する
+- 計測点:
+    fetch      http_client.fetch（本文バイト数、304 の件数）
+    decode     charset.detect（文字コード判定、lxml に encoding を渡す表は parse に含まれる）
+    parse      table_extract.read_tables / pd.read_html（行数）
+    transform  対戦成績の save_one_team、日程の normalize_columns、試合数の add_english_team_name
+    write      csv_writer.write_bytes（出力バイト数・書いたファイル数、変更なしの件数）
+               skipped()（304 で解析・書き出しを飛ばし、既存の出力をそのまま使った件数）
+  候補の再試行（別の leg / チーム記号へのフォールバック）は resolution_store から fetch の retries に入る
+- team() のブロック内の計測は球団別にも集計する（report() の jobs[job]["teams"][team][stage]）
+- 段階の時間は入れ子を除いた正味（save_one_team の中の write は transform に含めない）
+- どのジョブの計測かは contextvars で持つ（run_batch がタスクごとに job() で設定。
+  fetch_engine.map_concurrent のワーカーにも引き継ぐ）。未設定なら実行中のスクリプト名
+- write_report() でランの JSON レポート（REPORT_DIR/run_<ラン ID>.json）と
+  node_exporter の textfile collector 用ファイル（TEXTFILE_PATH）を書き出す
+- 使い方:
+    with run_metrics.stage("parse", bytes=len(content)) as m:
+        tables = pd.read_html(...)
+        m["rows"] = sum(len(t) for t in tables)
+
+    @run_metrics.timed("transform")
+    def save_one_team(...): ...
+"""
+
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import batch_log
+import batch_paths
+
+# ====== 設定 ======
+REPORT_DIR = batch_paths.METRICS_DIR
+TEXTFILE_PATH = "/var/lib/node_exporter/textfile_collector/baseball_batch.prom"
+STAGES = ("fetch", "decode", "parse", "transform", "write")
+COUNTERS = ("calls", "seconds", "bytes", "rows", "files", "not_modified", "unchanged", "skipped", "retries", "errors")
+# ====== 設定ここまで ======
+
+_job = contextvars.ContextVar("run_metrics_job", default=None)
+_team = contextvars.ContextVar("run_metrics_team", default=None)
+_frame = contextvars.ContextVar("run_metrics_frame", default=None)   # 実行中の段階の [子の秒数]
+_lock = threading.Lock()
+_stages = {}        # (job, stage) -> {counter: 値}
+_teams = {}         # (job, team, stage) -> {counter: 値}
+_jobs = {}          # job -> {"ok": bool, "seconds": float}
+_started = time.time()
+
+
+def current_job() -> str:
+    return _job.get() or Path(sys.argv[0]).stem or "python"
+
+
+@contextmanager
+def job(name: str):
+    """このブロック（とそこから map_concurrent で呼ぶ処理）の計測を name のジョブに付ける。"""
+    token = _job.set(name)
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+@contextmanager
+def team(name: str):
+    """このブロックの計測を球団 name の分としても集計する。"""
+    token = _team.set(name)
+    try:
+        yield
+    finally:
+        _team.reset(token)
+
+
+def add(stage: str, seconds: float = 0.0, calls: int = 1, **counts):
+    job_name, team_name = current_job(), _team.get()
+    keys = [(_stages, (job_name, stage))]
+    if team_name is not None:
+        keys.append((_teams, (job_name, team_name, stage)))
+    with _lock:
+        for table, key in keys:
+            entry = table.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            for name, value in counts.items():
+                entry[name] = entry.get(name, 0) + (value or 0)
+
+
+def skipped(count: int = 1):
+    """304 で解析・書き出しを飛ばした（既存の出力をそのまま使う）ことを write 段階に記録する。"""
+    add("write", calls=0, skipped=count)
+
+
+@contextmanager
+def stage(name: str, **counts):
+    """ブロックの所要時間を name の段階に足す。yield した dict に入れた量も一緒に記録する。"""
+    counts = dict(counts)
+    parent = _frame.get()
+    frame = [0.0]
+    token = _frame.set(frame)
+    start = time.perf_counter()
+    try:
+        yield counts
+    except BaseException:
+        counts["errors"] = counts.get("errors", 0) + 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _frame.reset(token)
+        if parent is not None:
+            parent[0] += elapsed
+        add(name, max(0.0, elapsed - frame[0]), **counts)
+
+
+def timed(name: str):
+    """関数の所要時間を name の段階に足すデコレータ。"""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def finish_job(name: str, ok: bool, seconds: float):
+    with _lock:
+        _jobs[name] = {"ok": bool(ok), "seconds": round(seconds, 3)}
+
+
+def report() -> dict:
+    """ここまでの計測をジョブ → 段階 → 値の形で返す。"""
+    with _lock:
+        stages = {k: dict(v) for k, v in _stages.items()}
+        teams = {k: dict(v) for k, v in _teams.items()}
+        jobs = {k: dict(v) for k, v in _jobs.items()}
+    out = {}
+    for (job_name, stage_name), values in sorted(stages.items()):
+        values["seconds"] = round(values["seconds"], 3)
+        out.setdefault(job_name, {"stages": {}})["stages"][stage_name] = values
+    for (job_name, team_name, stage_name), values in sorted(teams.items()):
+        values["seconds"] = round(values["seconds"], 3)
+        job_out = out.setdefault(job_name, {"stages": {}})
+        job_out.setdefault("teams", {}).setdefault(team_name, {})[stage_name] = values
+    for job_name, result in jobs.items():
+        out.setdefault(job_name, {"stages": {}}).update(result)
+    totals = {}
+    for (_, stage_name), values in stages.items():
+        t = totals.setdefault(stage_name, dict.fromkeys(COUNTERS, 0))
+        for name, value in values.items():
+            t[name] = t.get(name, 0) + value
+    for t in totals.values():
+        t["seconds"] = round(t["seconds"], 3)
+    return {
+        "run": batch_log.run_id(),
+        "started": datetime.fromtimestamp(_started).isoformat(timespec="seconds"),
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.time() - _started, 1),
+        "jobs": out,
+        "totals": totals,
+    }
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus(rep: dict) -> str:
+    """レポートを Prometheus の text exposition 形式にする（値はすべてこのランのゲージ）。"""
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    stage_rows = [(j, s, v) for j, data in rep["jobs"].items() for s, v in data["stages"].items()]
+    for counter in COUNTERS:
+        name = "batch_stage_duration_seconds" if counter == "seconds" else f"batch_stage_{counter}"
+        metric(name, f"段階ごとの {counter}（直近のラン）",
+               [({"job": j, "stage": s}, v.get(counter, 0)) for j, s, v in stage_rows])
+    metric("batch_job_duration_seconds", "ジョブの所要時間（直近のラン）",
+           [({"job": j}, d["seconds"]) for j, d in rep["jobs"].items() if "seconds" in d])
+    metric("batch_job_success", "ジョブが正常終了したら 1（直近のラン）",
+           [({"job": j}, int(d["ok"])) for j, d in rep["jobs"].items() if "ok" in d])
+    metric("batch_run_duration_seconds", "ラン全体の所要時間", [({}, rep["seconds"])])
+    metric("batch_run_finished_timestamp_seconds", "ランの終了時刻（UNIX 秒）", [({}, int(time.time()))])
+    return "\n".join(lines) + "\n"
+
+
+def _replace(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)       # textfile collector が書きかけを読まないように置き換える
+
+
+def write_report(report_dir: str = None, textfile_path: str = None, rep: dict = None) -> dict:
+    """JSON レポートと Prometheus textfile を書き出す。書いたパスを返す（書けなかったものは None）。"""
+    rep = rep or report()
+    paths = {"report": os.path.join(report_dir or REPORT_DIR, f"run_{rep['run']}.json"),
+             "textfile": textfile_path or TEXTFILE_PATH}
+    _replace(paths["report"], json.dumps(rep, ensure_ascii=False, indent=1))
+    try:
+        _replace(paths["textfile"], prometheus(rep))
+    except OSError:
+        paths["textfile"] = None     # collector のディレクトリが無い / 書けない環境
+    return paths
+
+
+def summary() -> str:
+    totals = report()["totals"]
+    parts = [f"{s} {totals[s]['seconds']:.1f}秒" for s in STAGES if s in totals]
+    return "段階別時間: " + (" / ".join(parts) if parts else "計測なし")
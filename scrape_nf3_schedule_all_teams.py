@@ -4,28 +4,44 @@ scrape_nf3_schedule_all_teams.py
 - nf3.sakura.ne.jp から試合日程（指定カラム）を取得
 - セ・パ全12球団、月3〜11
 - チームごとに CSV を保存（UTF-8 BOM）
-- ログは /home/ec2-user/batch/logs/scrape_nf3_schedule_all_teams.log に追記
+- ログは batch_log（logs/scrape_nf3_schedule_all_teams_<日時>.jsonl とコンソール）
 - 列は MultiIndex 対応（下段優先）
 - 月ごとに空データはスキップ
+- 過去月は月別データ（cache/schedule）を再利用し、当月以降だけ取得（--full で全月取得）
+  取得した月も全列文字列にそろえてから保存・結合するので、差分モードと全月取得の出力は同じになる
+- --replay YYYY-MM-DD でアーカイブ済みページから再解析（ネットワークなし・全月対象）
 - leg は優先値で試行、ダメなら 0/1/2 をフォールバックで自動再試行
+- 成功した leg はチーム・月ごとに resolution_store に記録し、次回はその leg から試す
+  （ポストシーズンの月だけ別の leg で配信されても、他の月の学習値は変わらない）
 """
 
 import os
 import time
-import logging
+import json
+import hashlib
+import argparse
+from datetime import date
+from io import StringIO
 from urllib.parse import urlencode
 import pandas as pd
 
+import batch_log
+import batch_paths
+import charset
+import csv_writer
+from http_client import fetch, replay_day, set_replay, stats_summary
+import resolution_store
+import run_metrics
+from table_extract import read_table as extract_table
+
 # ====== 設定 ======
 BASE_URL = "https://nf3.sakura.ne.jp/php/stat_disp/stat_disp.php"
 
 # 保存先
-SAVE_DIR = "/home/ec2-user/batch/data/matches"
-LOG_DIR  = "/home/ec2-user/batch/logs"
-LOG_FILE = os.path.join(LOG_DIR, "scrape_nf3_schedule_all_teams.log")
+SAVE_DIR = os.path.join(batch_paths.DATA_DIR, "matches")
 
-# コンソールにもログを出したい場合は True
-CONSOLE_LOG = True
+# 月別データ（過去月の確定データ）の保存先
+MONTH_CACHE_DIR = os.path.join(batch_paths.CACHE_DIR, "schedule")
 
 # 対象チーム（tm はサイトのクエリ、leg は優先的に使いたい値）
 TEAMS = {
@@ -56,22 +72,7 @@ REQUEST_INTERVAL = 1.0
 # ====== 設定ここまで ======
 
 
-def setup_logging():
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    os.makedirs(LOG_DIR,  exist_ok=True)
-
-    logging.basicConfig(
-        filename=LOG_FILE,
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    if CONSOLE_LOG:
-        console = logging.StreamHandler()
-        console.setLevel(logging.INFO)
-        console.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-        logging.getLogger("").addHandler(console)
+log = batch_log.get_logger("scrape_nf3_schedule_all_teams")
 
 
 def build_url(params: dict) -> str:
@@ -80,18 +81,14 @@ def build_url(params: dict) -> str:
 
 def read_table(url: str):
     """
-    HTMLの最初のテーブルを返す。文字コードは cp932 を優先し、失敗時はデフォルト。
-    見つからなければ None。
+    HTMLの最初のテーブルを返す。文字コードはヘッダ/meta から判定（本文は再取得しない）。
+    最初の表を読んだ時点で解析を打ち切る。見つからなければ ValueError。
     """
-    try:
-        tables = pd.read_html(url, encoding="cp932")
-    except Exception:
-        tables = pd.read_html(url)
-    if not tables:
-        return None
-    return tables[0]
+    res = fetch(url)
+    return extract_table(res.content, encoding=charset.detect(res).encoding)
 
 
+@run_metrics.timed("transform")
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
     複数行ヘッダ(MultiIndex) → 下段優先でフラット化。単一行なら strip のみ。
@@ -109,15 +106,23 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+class EmptyMonthError(ValueError):
+    """表は取れたがデータ行が 0 件（その月は試合なし or 掲載なし）。"""
+
+
 def fetch_table_any_leg(team_code: str, mon: int, leg_preferred: int) -> pd.DataFrame:
     """
-    指定 leg で取得を試み、ダメなら他の leg(0/1/2)も順に再試行。
+    学習済みの leg（無ければ指定 leg）で取得を試み、ダメなら他の leg(0/1/2)も順に再試行。
     取得できた最初の DataFrame を返す。空表はエラー扱い。
+    学習済み leg（その月に前回データが取れた leg）で「表はあるが 0 件」なら空月と確定し、他の leg は試さない。
     """
-    legs_to_try = [leg_preferred] + [l for l in (0, 1, 2) if l != leg_preferred]
+    legs_default = [leg_preferred] + [l for l in (0, 1, 2) if l != leg_preferred]
+    key = f"schedule:{team_code}:{mon:02d}"
+    learned_leg = resolution_store.learned(key)
+    legs_to_try = resolution_store.ordered(key, legs_default)
     last_err = None
 
-    for leg in legs_to_try:
+    for attempt, leg in enumerate(legs_to_try, start=1):
         params = {"y": 0, "leg": leg, "tm": team_code, "mon": mon, "vst": "all"}
         url = build_url(params)
         try:
@@ -139,7 +144,7 @@ def fetch_table_any_leg(team_code: str, mon: int, leg_preferred: int) -> pd.Data
 
             # 行が0ならスキップ（空月）
             if df.empty:
-                raise ValueError("データ行が0件（その月は試合なしor掲載なし）")
+                raise EmptyMonthError("データ行が0件（その月は試合なしor掲載なし）")
 
             # メタ情報
             df["month"] = mon
@@ -147,59 +152,187 @@ def fetch_table_any_leg(team_code: str, mon: int, leg_preferred: int) -> pd.Data
             df["leg_used"] = leg
             df["source_url"] = url
 
-            return df.reset_index(drop=True)
+            df = df.reset_index(drop=True)
+            resolution_store.record(key, legs_default, leg, attempt)
+            return df
 
+        except EmptyMonthError as e:
+            last_err = e
+            if leg == learned_leg:
+                # 学習済み leg のページ自体は正常 → 他の leg を叩いても無駄
+                resolution_store.record(key, legs_default, leg, attempt,
+                                        avoided=len(legs_to_try) - attempt)
+                break
+            continue
         except Exception as e:
             last_err = e
             continue
 
+    if isinstance(last_err, EmptyMonthError):
+        raise EmptyMonthError(f"tm={team_code} mon={mon}: {last_err}")
     raise RuntimeError(f"取得失敗 tm={team_code} mon={mon}: {last_err}")
 
 
-def main():
-    setup_logging()
-    logging.info("=== スクレイピング開始 ===")
+def month_cache_dir(team_name: str) -> str:
+    return os.path.join(MONTH_CACHE_DIR, team_name)
 
-    for team_name, meta in TEAMS.items():
-        team_code = meta["tm"]
-        leg_pref  = meta["leg"]
-        all_months = []
 
-        for mon in MONTHS:
-            logging.info(f"Fetching {team_name} (tm={team_code}) mon={mon} pref_leg={leg_pref}")
-            try:
-                df = fetch_table_any_leg(team_code, mon, leg_pref)
+def load_month_manifest(team_name: str, season: int) -> dict:
+    """月別データの管理情報 {"season": 年, "months": {"3": {"hash", "rows"} or {"empty": True}}}。"""
+    path = os.path.join(month_cache_dir(team_name), "manifest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("season") != season:
+        # シーズンが変わったら過去の確定データは使わない
+        manifest = {"season": season, "months": {}}
+    return manifest
 
-                # 安全なログ（空対策：uniqueを使う）
-                leg_vals = sorted(set(df.get("leg_used", [])))
-                logging.info(f" -> rows={len(df)} leg_used={leg_vals}")
 
-                all_months.append(df)
-            except Exception as e:
-                logging.warning(f"取得失敗: team={team_name} mon={mon} reason={e}")
+def save_month_manifest(team_name: str, manifest: dict):
+    os.makedirs(month_cache_dir(team_name), exist_ok=True)
+    path = os.path.join(month_cache_dir(team_name), "manifest.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
 
-            time.sleep(REQUEST_INTERVAL)  # アクセス間隔
 
-        if all_months:
-            try:
-                result = pd.concat(all_months, ignore_index=True)
+def frame_hash(df: pd.DataFrame) -> str:
+    return hashlib.sha1(df.to_csv(index=False).encode("utf-8")).hexdigest()
 
-                # 列順整える（リスト結合で列選択。DataFrameの「+」はNG）
-                ordered = [c for c in NEEDED_COLS if c in result.columns]
-                extra   = [c for c in ["month", "team_code", "leg_used", "source_url"] if c in result.columns]
-                result  = result[ordered + extra]
 
-                out_csv = os.path.join(SAVE_DIR, f"{team_name}.csv")
-                result.to_csv(out_csv, index=False, encoding="utf-8-sig")
-                logging.info(f"[DONE] {team_name}: {len(result)} rows saved -> {out_csv}")
-            except Exception as e:
-                logging.error(f"[ERROR] 保存処理で失敗: team={team_name} reason={e}")
-        else:
-            logging.warning(f"データなし: {team_name}")
+def as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    CSV に書いて全列文字列で読み直したのと同じ表（load_month_frame の再利用分と同じ形）。
+    月ごとに推定された dtype のまま結合すると、int の月と float の月が混ざって "18" が "18.0" になるため。
+    """
+    return pd.read_csv(StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
 
-    logging.info("=== スクレイピング終了 ===")
 
+def load_month_frame(team_name: str, mon: int):
+    """保存済みの月別データ。CSV の文字列をそのまま再出力できるよう全列文字列で読む。"""
+    path = os.path.join(month_cache_dir(team_name), f"{mon:02d}.csv")
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8")
+
+
+def store_month_frame(team_name: str, mon: int, df: pd.DataFrame, manifest: dict) -> bool:
+    """月別データを保存し、前回から内容が変わったかを返す。"""
+    h = frame_hash(df)
+    entry = manifest["months"].get(str(mon), {})
+    if entry.get("hash") == h:
+        return False
+    os.makedirs(month_cache_dir(team_name), exist_ok=True)
+    csv_writer.write_csv(df, os.path.join(month_cache_dir(team_name), f"{mon:02d}.csv"), encoding="utf-8")
+    manifest["months"][str(mon)] = {"hash": h, "rows": len(df)}
+    return True
 
-if __name__ == "__main__":
-    main()
 
+def main(full: bool = False):
+    """
+    full=False（既定）: 過去月は保存済みの月別データを再利用し、当月以降だけ取得する。
+    full=True: 全月を取得し直す（月別データも更新）。
+    リプレイモードでは常に全月をアーカイブから再解析する。
+    """
+    replaying = replay_day() is not None
+    full = full or replaying
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    log(f"=== スクレイピング開始（{'全月' if full else '差分'}モード） ===")
+
+    today = date.fromisoformat(replay_day()) if replaying else date.today()
+    fetched = reused = 0
+
+    for team_name, meta in TEAMS.items():
+        with run_metrics.team(team_name):
+            team_code = meta["tm"]
+            leg_pref  = meta["leg"]
+            all_months = []
+            manifest = load_month_manifest(team_name, today.year)
+            changed = False
+
+            for mon in MONTHS:
+                entry = manifest["months"].get(str(mon))
+                frozen = (not full) and mon < today.month and entry is not None
+
+                if frozen and entry.get("empty"):
+                    reused += 1
+                    continue
+                if frozen:
+                    df = load_month_frame(team_name, mon)
+                    if df is not None:
+                        all_months.append(df)
+                        reused += 1
+                        continue
+
+                log(f"Fetching {team_name} (tm={team_code}) mon={mon} pref_leg={leg_pref}", team=team_name)
+                fetched += 1
+                try:
+                    df = as_text(fetch_table_any_leg(team_code, mon, leg_pref))
+
+                    # 安全なログ（空対策：uniqueを使う）
+                    leg_vals = sorted(set(df.get("leg_used", [])))
+                    log(f" -> rows={len(df)} leg_used={leg_vals}")
+
+                    all_months.append(df)
+                    if replaying:
+                        changed = True   # リプレイ結果で月別データ（差分モード用）を上書きしない
+                    else:
+                        changed = store_month_frame(team_name, mon, df, manifest) or changed
+                except EmptyMonthError as e:
+                    log(f" -> 空月: team={team_name} mon={mon} ({e})", team=team_name)
+                    if not (entry or {}).get("empty"):
+                        manifest["months"][str(mon)] = {"empty": True}
+                        changed = True
+                except Exception as e:
+                    log.warning(f"取得失敗: team={team_name} mon={mon} reason={e}", team=team_name)
+                    # 前回取得分があればそれで補う（失敗で月が欠けないように）
+                    df = load_month_frame(team_name, mon) if entry and not entry.get("empty") else None
+                    if df is not None:
+                        log(f" -> 前回取得分を使用: team={team_name} mon={mon} rows={len(df)}", team=team_name)
+                        all_months.append(df)
+
+                if not replaying:
+                    time.sleep(REQUEST_INTERVAL)  # アクセス間隔
+
+            if not replaying:
+                save_month_manifest(team_name, manifest)
+
+            out_csv = os.path.join(SAVE_DIR, f"{team_name}.csv")
+            if all_months and not changed and os.path.exists(out_csv):
+                log(f"[SKIP] {team_name}: 全月とも変更なし", team=team_name)
+            elif all_months:
+                try:
+                    result = pd.concat(all_months, ignore_index=True)
+
+                    # 列順整える（リスト結合で列選択。DataFrameの「+」はNG）
+                    ordered = [c for c in NEEDED_COLS if c in result.columns]
+                    extra   = [c for c in ["month", "team_code", "leg_used", "source_url"] if c in result.columns]
+                    result  = result[ordered + extra]
+
+                    if csv_writer.write_csv(result, out_csv):
+                        log(f"[DONE] {team_name}: {len(result)} rows saved -> {out_csv}", team=team_name)
+                    else:
+                        log(f"[SKIP] {team_name}: 内容変更なし -> {out_csv}", team=team_name)
+                except Exception as e:
+                    log.error(f"[ERROR] 保存処理で失敗: team={team_name} reason={e}", team=team_name)
+            else:
+                log.warning(f"データなし: {team_name}", team=team_name)
+
+    log(f"月別取得 {fetched}件 / 確定済み月の再利用 {reused}件")
+    resolution_store.save()
+    log(resolution_store.summary("schedule:"))
+    log(stats_summary())
+    log(charset.summary())
+    log("=== スクレイピング終了 ===")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="nf3 の試合日程を全12球団分取得")
+    parser.add_argument("--full", action="store_true", help="過去月も含めて全月を取得し直す")
+    parser.add_argument("--replay", metavar="YYYY-MM-DD", help="アーカイブ済みページから再解析")
+    args = parser.parse_args()
+    if args.replay:
+        set_replay(args.replay)
+    main(full=args.full)
@@ -1,31 +1,29 @@
 # -*- coding: utf-8 -*-
 import os
-import re
-import time
 import unicodedata
-import hashlib
 import pandas as pd
-from datetime import datetime
-from pathlib import Path
 
-# ===== ログ設定 =====
-LOG_DIR = "/home/ec2-user/batch/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-SCRIPT_NAME = Path(__file__).name
-LOG_FILE_PATH = os.path.join(LOG_DIR, SCRIPT_NAME)  # .py のまま保存（必要なら .log に変更可）
+from fetch_engine import map_concurrent
+import batch_log
+import batch_paths
+import csv_writer
+from http_client import apply_replay_arg, fetch, stats_summary
+import parquet_output
+import player_ids
+import resolution_store
+import run_metrics
+from name_resolver import NameResolver, compact_name
+from split_store import SplitTable
+from split_tables import split_by_target
+from table_extract import read_table
 
-def log(msg: str):
-    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    line = f"[{ts}] {msg}"
-    print(line)
-    with open(LOG_FILE_PATH, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+# ===== ログ設定 =====
+log = batch_log.get_logger("scrape_pitchers_vs_stadium_all")
 
 # ===== 設定 =====
-OUTPUT_ROOT = "/home/ec2-user/batch/data/team_splits/pitchers/vs_stadium"
+OUTPUT_ROOT = os.path.join(batch_paths.DATA_DIR, "team_splits", "pitchers", "vs_stadium")
 CSV_ENCODING = "utf-8-sig"
-SLEEP_SEC = 1.0
+MAX_WORKERS = 4   # 並列取得数（ホスト別上限は fetch_engine.HOST_LIMITS）
 TOTAL_LABEL = "通算"
 
 # リーグ → {英字チーム名: [サイト内チーム記号候補]}
@@ -73,46 +71,19 @@ STADIUM_NAME_MAP = {
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
-def ascii_slug(s: str) -> str:
-    n = re.sub(r'[\\/:*?"<>|]+', '_', str(s))
-    n = re.sub(r'[^0-9A-Za-z_.-]+', '_', n)
-    n = n.strip("._")
-    return n or "unknown"
+STADIUM_RESOLVER = NameResolver(STADIUM_NAME_MAP, normalize=compact_name, label="stadium", log=log)
+LONG_TABLE = SplitTable(f"{OUTPUT_ROOT}.csv", ["player_id", "背番", "名前", "腕"], compat_root=OUTPUT_ROOT)
 
 def stadium_ascii(name: str) -> str:
     """
-    球場名を英字スラッグ化：辞書（キーも正規化して比較）→ ASCII 整形 → ハッシュ。
+    球場名を英字スラッグ化：辞書（キーも正規化して最長一致）→ ASCII 整形 → ハッシュ。
     全角/半角スペース・全角英字も吸収。『エスコンＦ』『エスコンF』なども同一扱い。
     """
-    def norm(s: str) -> str:
-        s = unicodedata.normalize("NFKC", str(s))
-        return s.replace(" ", "").replace("\u3000", "")
-
-    s_norm = norm(name)
-
-    # ★ キー側も正規化して部分一致で比較
-    for jp, slug in STADIUM_NAME_MAP.items():
-        if norm(jp) in s_norm:
-            return slug
-
-    # 英数字が含まれるならASCII整形
-    slug = ascii_slug(s_norm)
-    if re.search(r'[A-Za-z0-9]', slug):
-        if len(slug) <= 2:
-            log(f"[WARN] stadium slug suspicious: original='{name}', slug='{slug}'")
-        return slug
-
-    # それ以外はハッシュ化（unknown回避）
-    h = "u" + hashlib.md5(s_norm.encode("utf-8")).hexdigest()[:8]
-    log(f"[WARN] stadium fallback to hash: original='{name}', slug='{h}'")
-    return h
-
-def read_pitchers_vs_stadium_table(url: str) -> pd.DataFrame:
+    return STADIUM_RESOLVER.resolve(name)
+
+def read_pitchers_vs_stadium_table(content: bytes) -> pd.DataFrame:
     """3段ヘッダの表を取得（cp932）。"""
-    tables = pd.read_html(url, flavor="lxml", encoding="cp932", header=[0, 1, 2])
-    if not tables:
-        raise RuntimeError("テーブルが見つかりませんでした")
-    df = tables[0]
+    df = read_table(content, encoding="cp932", header=[0, 1, 2])
 
     # ヘッダ正規化：前後空白・全角→半角、球場名の空白除去
     def norm3(col):
@@ -136,76 +107,100 @@ def extract_id_cols(df: pd.DataFrame):
         id_cols = [df.columns[i] for i in range(min(3, len(df.columns)))]
     return id_cols
 
+@run_metrics.timed("transform")
 def save_one_team(df: pd.DataFrame, league: str, team_en: str):
     """1球団分を球場ごとにCSV保存。"""
     id_cols = extract_id_cols(df)
 
-    # 第1階層（通算/各球場）
-    level0_vals = list(dict.fromkeys([col[0] for col in df.columns]))
-    id_level0 = set([c[0] for c in id_cols])
-    targets = [v for v in level0_vals if v not in id_level0]  # '通算' と各球場
-
     base_out_dir = os.path.join(OUTPUT_ROOT, league, team_en)
     ensure_dir(base_out_dir)
 
+    # 第1階層（通算/各球場）ごとに分割
+    # 列は IDが『背番・名前・腕』、球場側は第2階層（先/リ/防/勝/敗/H/S）、ID以外は数値化済み
     saved = 0
-    for tgt in targets:
-        tgt_cols = [col for col in df.columns if col[0] == tgt]
-        if not tgt_cols:
-            continue
-
-        sub = df[id_cols + tgt_cols].copy()
-
-        # 列フラット化：IDは『背番・名前・腕』、球場側は第2階層（先/リ/防/勝/敗/H/S）
-        new_cols = []
-        for a, b, c in sub.columns:
-            if (a, b, c) in id_cols:
-                new_cols.append(a)
-            else:
-                new_cols.append(b)
-        sub.columns = new_cols
-
-        # 数値化
-        for col in sub.columns:
-            if col in ("背番", "名前", "腕"):
-                continue
-            sub[col] = pd.to_numeric(sub[col], errors="coerce")
-
+    parts = []
+    ids = None   # 選手の並びはどの対象でも同じなので 1 回だけ引く
+    for tgt, sub in split_by_target(df, id_cols, ("背番", "名前", "腕")):
+        if ids is None:
+            ids = pd.array(player_ids.ids_for(team_en, sub["背番"], sub["名前"]), dtype="Int64")
+        sub.insert(0, "player_id", ids)
         # 保存：通算は Total.csv、それ以外は球場スラッグ
-        fname = "Total.csv" if tgt == TOTAL_LABEL else f"{stadium_ascii(tgt)}.csv"
-        out_path = os.path.join(base_out_dir, fname)
-        sub.to_csv(out_path, index=False, encoding=CSV_ENCODING)
+        target = "Total" if tgt == TOTAL_LABEL else stadium_ascii(tgt)
+        out_path = os.path.join(base_out_dir, f"{target}.csv")
+        changed = csv_writer.write_csv(sub, out_path, encoding=CSV_ENCODING)
+        parts.append((target, sub))
         saved += 1
-        log(f"保存: {out_path} ({len(sub)}行)")
+        log(f"{'保存' if changed else '変更なし'}: {out_path} ({len(sub)}行)", team=team_en, target=target, rows=len(sub))
+
+    pq_path = parquet_output.write_splits("pitchers_vs_stadium", parts, league, team_en)
+    if pq_path:
+        log(f"Parquet保存: {pq_path}")
+    LONG_TABLE.add(league, team_en, parts)
     return saved
 
+def fetch_team_table(job):
+    """
+    1球団分の表を取得（コード候補を順に試す）。全候補失敗なら最後の例外を送出。
+    (取得結果, 表) を返す。前回から更新なし（304）で出力済みなら表は None。
+    検証子は保存を遅らせているので、書き出しが済んだら呼び出し側で res.commit() する。
+    """
+    league, team_en, code_candidates = job
+    with run_metrics.team(team_en):
+        # 前回成功したチーム記号から試す（失敗時のみ他の候補を再探索）
+        key = f"pc_all_data_vsS.htm:{league}:{team_en}"
+        last_err = None
+        for attempt, code in enumerate(resolution_store.ordered(key, code_candidates), start=1):
+            url = f"https://nf3.sakura.ne.jp/{league}/{code}/t/pc_all_data_vsS.htm"
+            try:
+                log(f"取得: {league} / {team_en} -> {url}", team=team_en, url=url)
+                res = fetch(url, commit=False)
+                df = None
+                if res.not_modified and os.path.isdir(os.path.join(OUTPUT_ROOT, league, team_en)):
+                    run_metrics.skipped()
+                else:
+                    df = read_pitchers_vs_stadium_table(res.content)
+                resolution_store.record(key, code_candidates, code, attempt)
+                return res, df
+            except Exception as e:
+                last_err = e
+                log.warning(f"失敗: {url} ({e})", team=team_en, url=url)
+        raise last_err
+
 def scrape_all():
     ensure_dir(OUTPUT_ROOT)
     grand_total = 0
-    for league, team_map in TEAM_CODE_CANDIDATES.items():
-        log(f"=== {league}（投手×球場）===")
-        for team_en, code_candidates in team_map.items():
-            df = None
-            last_err = None
-            for code in code_candidates:
-                url = f"https://nf3.sakura.ne.jp/{league}/{code}/t/pc_all_data_vsS.htm"
-                try:
-                    log(f"取得: {league} / {team_en} -> {url}")
-                    df = read_pitchers_vs_stadium_table(url)
-                    break
-                except Exception as e:
-                    last_err = e
-                    log(f"失敗: {url} ({e})")
-                    time.sleep(0.3)
-            if df is None:
-                log(f"× 断念: {league} / {team_en}（全候補失敗）: {last_err}")
-                continue
+    jobs = [
+        (league, team_en, code_candidates)
+        for league, team_map in TEAM_CODE_CANDIDATES.items()
+        for team_en, code_candidates in team_map.items()
+    ]
+    # 取得は並列（ホスト別の同時数・間隔は fetch_engine 側で制御）、保存は取得順に逐次
+    current_league = None
+    for (league, team_en, _), fetched, err in map_concurrent(fetch_team_table, jobs, MAX_WORKERS):
+        if league != current_league:
+            current_league = league
+            log(f"=== {league}（投手×球場）===")
+        if err is not None:
+            log.error(f"× 断念: {league} / {team_en}（全候補失敗）: {err}", team=team_en)
+            continue
+        res, df = fetched
+        if df is None:
+            log(f"更新なし（304）: {league} / {team_en} 保存をスキップ", team=team_en)
+            continue
 
+        with run_metrics.team(team_en):
             saved = save_one_team(df, league, team_en)
-            grand_total += saved
-            time.sleep(SLEEP_SEC)
+        res.commit()   # 全対象の書き出しが済んだ球団だけ、次回 304 で飛ばせるようにする
+        grand_total += saved
+    path, slices, rows = LONG_TABLE.write()
+    log(f"統合表保存: {path}（{slices}スライス / {rows}行）")
+    resolution_store.save()
+    log(resolution_store.summary("pc_all_data_vsS.htm"))
+    log(stats_summary())
+    log(csv_writer.summary())
     log(f"=== 完了: 総ファイル数 {grand_total} ===")
 
 if __name__ == "__main__":
+    apply_replay_arg()
     scrape_all()
 
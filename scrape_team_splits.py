@@ -2,12 +2,18 @@
 import os
 import re
 import time
+from io import BytesIO
+
 import pandas as pd
 
+import batch_paths
+import csv_writer
+from http_client import apply_replay_arg, fetch, stats_summary
+
 URL = "https://nf3.sakura.ne.jp/Pacific/F/t/pc_all_data_vsT.htm"
 
 # ===== 設定 =====
-OUTPUT_DIR = "/home/ec2-user/batch/data/team_splits/pitchers/vs_team"
+OUTPUT_DIR = os.path.join(batch_paths.DATA_DIR, "team_splits", "pitchers", "vs_team")
 CSV_ENCODING = "utf-8-sig"   # Excel互換。端末表示だけ重視なら "utf-8"
 USE_ASCII_FILENAME = True    # 文字化け防止のため英字ファイル名を推奨
 TEAM_NAME_MAP = {
@@ -38,7 +44,8 @@ def scrape_pitchers_vs_team(url: str, out_dir: str):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 取得開始: {url}")
 
     # ★ ここがポイント：encoding="cp932" を read_html に直接渡す
-    tables = pd.read_html(url, flavor="lxml", encoding="cp932", header=[0,1,2])
+    res = fetch(url, use_cache=False)
+    tables = pd.read_html(BytesIO(res.content), flavor="lxml", encoding="cp932", header=[0,1,2])
     if not tables:
         raise RuntimeError("テーブルが見つかりませんでした。")
     df = tables[0]
@@ -96,13 +103,15 @@ def scrape_pitchers_vs_team(url: str, out_dir: str):
         # 保存（中身は UTF-8-SIG）
         fname = sanitize_filename(tgt) + ".csv"
         path = os.path.join(out_dir, fname)
-        sub.to_csv(path, index=False, encoding=CSV_ENCODING)
+        csv_writer.write_csv(sub, path, encoding=CSV_ENCODING)
         print(f"  - 保存: {path} ({len(sub)}行, enc={CSV_ENCODING})")
         saved += 1
 
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {stats_summary()}")
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 完了: {saved}ファイル")
     return saved
 
 if __name__ == "__main__":
+    apply_replay_arg()
     scrape_pitchers_vs_team(URL, OUTPUT_DIR)
 
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snapshot_store.py
+- 毎日上書きされる出力 CSV（data/batter/{team}.csv など）の日ごとの状態を残す追記専用ストア
+- 前回の状態との行単位の差分（追加・変更行は行全体、消えた行はキーだけ）を日ごとに保存し、
+  CHECKPOINT_EVERY 回ごと（または列が変わったとき・差分が大きいとき）に全行のチェックポイントを置く
+  → 容量は実際に変わった行の量に比例（変化の無い日はファイルを作らない）
+- 行のキー: (ファイル名 = 球団, キー列…)。キー列は SOURCES で指定（同じキーが重なる行は出現順で区別）
+- 値は CSV の文字列のまま持つので、復元した表は元の CSV と同じ値になる（行の並びはキー順）
+- 保存先: SNAPSHOT_ROOT/<dataset>/<YYYY-MM-DD>.full.jsonl.gz / .delta.jsonl.gz
+- 使い方:
+    python3 snapshot_store.py record                       # 今日（リプレイ中はリプレイ日）の状態を記録
+    python3 snapshot_store.py table batter 2025-06-01      # その日の表を復元して表示
+    python3 snapshot_store.py series batter --team giants --match 選手名=岡本和真
+    df = snapshot_store.table("batter", "2025-06-01")
+    df = snapshot_store.series("batter", team="giants", 選手名="岡本和真")   # 日ごとの推移
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("snapshot_store")
+
+# ===== 設定 =====
+DATA_ROOT = batch_paths.DATA_DIR
+SNAPSHOT_ROOT = os.path.join(batch_paths.DATA_DIR, "snapshots")
+CHECKPOINT_EVERY = 7          # 差分がこの回数続いたら全行のチェックポイント
+CHECKPOINT_RATIO = 0.5        # 差分の行数が全体のこの割合を超えたらチェックポイント
+CSV_ENCODING = "utf-8-sig"
+
+# データセット → 対象ファイル（DATA_ROOT からの glob）、ファイル名を入れる列、キー列の候補
+# キー列の候補が表に 1 つも無いときは先頭列をキーにする
+SOURCES = {
+    "batter":        {"files": "batter/*.csv", "part": "team", "key": ["背番号", "選手名"]},
+    "pitcher":       {"files": "pitcher/*.csv", "part": "team", "key": ["背番号", "選手名"]},
+    "team_batting":  {"files": "team_batting/*.csv", "part": "file", "key": ["チーム", "球団"]},
+    "team_pitcher":  {"files": "team_pitcher/*.csv", "part": "file", "key": ["チーム", "球団"]},
+    "team_defense":  {"files": "team_defense/*.csv", "part": "file", "key": ["チーム", "球団"]},
+    "team_games":    {"files": "matches/team_games.csv", "part": "file", "key": ["team"]},
+}
+# ===== 設定ここまで =====
+
+
+def dataset_dir(dataset: str) -> str:
+    return os.path.join(SNAPSHOT_ROOT, dataset)
+
+
+def entries(dataset: str) -> list:
+    """記録済みの [(日付, "full" | "delta", パス)]（日付順）。"""
+    out = []
+    for path in glob.glob(os.path.join(dataset_dir(dataset), "*.jsonl.gz")):
+        day, kind = os.path.basename(path).split(".")[:2]
+        out.append((day, kind, path))
+    return sorted(out)
+
+
+def _read(path: str):
+    """(ヘッダ, [操作]) を読む。操作は ["put", キー, 行] / ["del", キー]。"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        ops = [json.loads(line) for line in f if line.strip()]
+    return header, ops
+
+
+def _write(path: str, header: dict, ops: list):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for op in ops:
+            f.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+
+
+def _key_cols(df: pd.DataFrame, candidates: list) -> list:
+    cols = [c for c in candidates if c in df.columns]
+    return cols or [df.columns[0]]
+
+
+def current_state(dataset: str):
+    """
+    出力ファイルの今の内容を (列, キー列, {キー: {列: 値}}) にする。
+    キーは [ファイル名, キー列の値…, 重複番号]（JSON に入れるのでリスト→タプル）。
+    """
+    spec = SOURCES[dataset]
+    columns, key_cols, rows = [], None, {}
+    for path in sorted(glob.glob(os.path.join(DATA_ROOT, spec["files"]))):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding=CSV_ENCODING)
+        if df.empty:
+            continue
+        file_keys = _key_cols(df, spec["key"])
+        key_cols = key_cols or file_keys
+        for c in df.columns:
+            if c not in columns:
+                columns.append(c)
+        part = Path(path).stem
+        seen = {}
+        for rec in df.to_dict("records"):
+            base = (part,) + tuple(rec.get(c, "") for c in key_cols)
+            n = seen.get(base, 0)
+            seen[base] = n + 1
+            rows[base + (n,)] = rec
+    return columns, key_cols or [], rows
+
+
+def _apply(rows: dict, columns: list, ops: list):
+    for op in ops:
+        key = tuple(op[1])
+        if op[0] == "put":
+            rows[key] = dict(zip(columns, op[2]))
+        else:
+            rows.pop(key, None)
+
+
+def state_at(dataset: str, day: str):
+    """day 時点（day 以前で最後に記録された状態）の (列, キー列, 行)。記録が無ければ None。"""
+    chain = []
+    for entry in entries(dataset):
+        if entry[0] > day:
+            break
+        if entry[1] == "full":
+            chain = [entry]
+        elif chain:
+            chain.append(entry)
+    if not chain:
+        return None
+    rows, columns, key_cols = {}, [], []
+    for _, _, path in chain:
+        header, ops = _read(path)
+        columns, key_cols = header["columns"], header["key"]
+        _apply(rows, columns, ops)
+    return columns, key_cols, rows
+
+
+def record(dataset: str, day: str = None) -> dict:
+    """
+    今の出力を day の状態として記録する。結果 {"kind", "puts", "dels", "rows"} を返す。
+    記録済みの最終日より前の日は記録できない（同じ日なら記録し直す）。
+    """
+    day = day or today()
+    history = entries(dataset)
+    if history and history[-1][0] > day:
+        raise ValueError(f"{dataset}: {history[-1][0]} まで記録済みのため {day} は追記できません")
+    columns, key_cols, rows = current_state(dataset)
+    if not rows:
+        return {"kind": None, "puts": 0, "dels": 0, "rows": 0}
+    if history and history[-1][0] == day:
+        os.remove(history[-1][2])
+        history = history[:-1]
+    prev = state_at(dataset, day)
+    since_full = 0
+    for entry in reversed(history):
+        if entry[1] == "full":
+            break
+        since_full += 1
+
+    # 前回と列が同じなら差分、違えば（または初回なら）チェックポイント
+    if prev is not None and prev[0] == columns:
+        prev_rows = prev[2]
+        ops = [["put", list(key), [rec.get(c, "") for c in columns]]
+               for key, rec in rows.items() if prev_rows.get(key) != rec]
+        puts = len(ops)
+        ops += [["del", list(key)] for key in prev_rows if key not in rows]
+        dels = len(ops) - puts
+        if not ops:
+            return {"kind": None, "puts": 0, "dels": 0, "rows": len(rows)}
+        full = since_full + 1 >= CHECKPOINT_EVERY or len(ops) > len(rows) * CHECKPOINT_RATIO
+    else:
+        puts, dels, full = len(rows), 0, True
+    kind = "full" if full else "delta"
+    if full:
+        ops = [["put", list(key), [rec.get(c, "") for c in columns]] for key, rec in rows.items()]
+
+    os.makedirs(dataset_dir(dataset), exist_ok=True)
+    header = {"day": day, "kind": kind, "columns": columns, "key": key_cols, "part": SOURCES[dataset]["part"]}
+    _write(os.path.join(dataset_dir(dataset), f"{day}.{kind}.jsonl.gz"), header, ops)
+    return {"kind": kind, "puts": puts, "dels": dels, "rows": len(rows)}
+
+
+def _frame(part_col: str, columns: list, records: list, extra: dict = None) -> pd.DataFrame:
+    """文字列のままの行を CSV を読んだときと同じ型の DataFrame にする。"""
+    head = list(extra or {}) + [part_col] + columns
+    raw = pd.DataFrame(records, columns=head, dtype=str)
+    return pd.read_csv(StringIO(raw.to_csv(index=False)))
+
+
+def table(dataset: str, day: str) -> pd.DataFrame:
+    """day 時点の表（先頭に球団/ファイル名の列、行はキー順）。記録が無ければ空の表。"""
+    state = state_at(dataset, day)
+    part_col = SOURCES[dataset]["part"]
+    if state is None:
+        return pd.DataFrame(columns=[part_col])
+    columns, _, rows = state
+    records = [[key[0]] + [rec.get(c, "") for c in columns] for key, rec in sorted(rows.items())]
+    return _frame(part_col, columns, records)
+
+
+def series(dataset: str, team: str = None, since: str = None, until: str = None, **match) -> pd.DataFrame:
+    """
+    条件（team=ファイル名、列名=値）に合う行の推移（先頭に day 列、記録のある日ごとに 1 行）。
+    表全体は組み立てず、差分のうち条件に合う行だけを追う。
+    途中で列が増減・並び替えされた場合は最後の日の列順に揃える（その日に無い列は空、消えた列は末尾）。
+    """
+    part_col = SOURCES[dataset]["part"]
+    tracked, columns, seen_cols, out = {}, [], [], []
+
+    def hit(key, rec):
+        if team is not None and key[0] != team:
+            return False
+        return all(str(rec.get(c, "")) == str(v) for c, v in match.items())
+
+    history = entries(dataset)
+    start = 0
+    for i, (day, kind, _) in enumerate(history if since else []):
+        # since 以前で最後のチェックポイントから読む
+        if day > since:
+            break
+        if kind == "full":
+            start = i
+    for day, kind, path in history[start:]:
+        if until and day > until:
+            break
+        header, ops = _read(path)
+        columns = header["columns"]
+        seen_cols += [c for c in columns if c not in seen_cols]
+        if kind == "full":
+            tracked = {}
+        for op in ops:
+            key = tuple(op[1])
+            rec = dict(zip(columns, op[2])) if op[0] == "put" else None
+            if rec is not None and hit(key, rec):
+                tracked[key] = rec
+            else:
+                tracked.pop(key, None)
+        if since and day < since:
+            continue
+        for key, rec in sorted(tracked.items()):
+            out.append((day, key[0], rec))
+    columns = columns + [c for c in seen_cols if c not in columns]
+    records = [[day, part] + [rec.get(c, "") for c in columns] for day, part, rec in out]
+    return _frame(part_col, columns, records, extra={"day": None})
+
+
+def today() -> str:
+    from http_client import replay_day
+    return str(replay_day() or date.today())
+
+
+def record_all(day: str = None):
+    """
+    全データセットを記録する（run_batch から呼ぶ）。
+    1 つが失敗しても残りは記録し、最後に失敗したデータセットをまとめて例外にする。
+    """
+    day = day or today()
+    failed = []
+    for dataset in SOURCES:
+        try:
+            r = record(dataset, day)
+        except Exception as e:
+            log.error(f"[{dataset}] 記録失敗: {e!r}")
+            failed.append(dataset)
+            continue
+        if r["kind"] is None:
+            log(f"[{dataset}] {day}: 変更なし（{r['rows']}行）")
+        else:
+            log(f"[{dataset}] {day}: {r['kind']} 追加/変更 {r['puts']}行 削除 {r['dels']}行 / 全 {r['rows']}行")
+    if failed:
+        raise RuntimeError(f"スナップショットの記録に失敗したデータセットがあります: {', '.join(failed)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="出力 CSV の日ごとのスナップショット（行単位の差分）")
+    sub = parser.add_subparsers(dest="cmd")
+    p = sub.add_parser("record", help="今の出力を記録")
+    p.add_argument("--day", help="記録する日付（既定: 今日、リプレイ中はリプレイ日）")
+    p = sub.add_parser("table", help="指定日の表を復元")
+    p.add_argument("dataset", choices=list(SOURCES))
+    p.add_argument("day")
+    p = sub.add_parser("series", help="行の日ごとの推移")
+    p.add_argument("dataset", choices=list(SOURCES))
+    p.add_argument("--team")
+    p.add_argument("--match", action="append", default=[], metavar="列=値")
+    p.add_argument("--since")
+    p.add_argument("--until")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "table":
+        print(table(args.dataset, args.day).to_string(index=False))
+    elif args.cmd == "series":
+        match = dict(m.split("=", 1) for m in args.match)
+        print(series(args.dataset, team=args.team, since=args.since, until=args.until, **match).to_string(index=False))
+    else:
+        record_all(getattr(args, "day", None))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+split_store.py
+- 対戦成績（split）を種類ごとに 1 本の縦持ち CSV（統合表）にまとめる出力先
+    列: league, team, target（対戦相手/球場のスラッグ、通算は Total）+ ID 列 + 指標列
+- 行は (league, team, target) の順に並べ、各スライスのバイト位置を索引（<表>.idx.json）に持つ
+  → 球団ごと・対象ごとの読み出しは seek だけで済む（全体を読まない）
+- 従来の 1 ファイル 1 対象の CSV（team_splits/.../<league>/<team>/<target>.csv）もそのまま出力する
+- 今回更新の無い球団（304）は前回の統合表のスライスを再利用（無ければ従来 CSV から作る）
+- 使い方:
+    LONG_TABLE = SplitTable(f"{OUTPUT_ROOT}.csv", ["背番", "名前", "席"], compat_root=OUTPUT_ROOT)
+    LONG_TABLE.add(league, team_en, parts)        # parts: [(target, 表)]
+    path, slices, rows = LONG_TABLE.write()
+    df = read_slices(path, team="Giants")          # target="Tigers" / league="Central" でも可
+"""
+
+import io
+import json
+import os
+
+import pandas as pd
+
+import csv_writer
+from split_tables import with_unique_columns
+
+# ====== 設定 ======
+CSV_ENCODING = "utf-8-sig"   # 先頭に BOM（Excel 用）。本体は UTF-8 なのでバイト位置は素直に数えられる
+INDEX_SUFFIX = ".idx.json"
+KEY_COLS = ["league", "team", "target"]
+# ====== 設定ここまで ======
+
+def index_path(path: str) -> str:
+    return f"{path}{INDEX_SUFFIX}"
+
+
+def load_index(path: str):
+    """索引を読む。無い、または本体のサイズと合わないときは None。"""
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if os.path.getsize(path) != index["size"]:
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return index
+
+
+class SplitTable:
+    """1 種類の対戦成績の統合表。add() で球団分を受け取り、write() で書き出す。"""
+
+    def __init__(self, path: str, id_cols: list, compat_root: str = None):
+        self.path = path
+        self.id_cols = list(id_cols)
+        self.compat_root = compat_root
+        self._teams = {}          # (league, team) -> [(target, 表)]
+
+    def add(self, league: str, team: str, parts: list):
+        """
+        1 球団分の [(target, 表)] を登録する（同じ球団は置き換え）。
+        重複する列名は ".1" などを付けて別の列にする（従来 CSV を read_csv で読み直したときと同じ列名）。
+        """
+        self._teams[(league, team)] = [(t, with_unique_columns(sub)) for t, sub in parts]
+
+    def _stat_cols(self, prev, frames) -> list:
+        cols = [c for c in prev["columns"][len(KEY_COLS):] if c not in self.id_cols] if prev else []
+        seen = set(self.id_cols) | set(KEY_COLS) | set(cols)
+        for sub in frames:
+            for col in sub.columns:
+                if col in seen:
+                    continue
+                cols.append(col)
+                seen.add(col)
+        return cols
+
+    def _compat_parts(self, covered: set) -> dict:
+        """前回分が無い球団を従来の <league>/<team>/<target>.csv から集める。"""
+        found = {}
+        if not self.compat_root or not os.path.isdir(self.compat_root):
+            return found
+        for league in sorted(os.listdir(self.compat_root)):
+            league_dir = os.path.join(self.compat_root, league)
+            if not os.path.isdir(league_dir):
+                continue
+            for team in sorted(os.listdir(league_dir)):
+                team_dir = os.path.join(league_dir, team)
+                if (league, team) in covered or not os.path.isdir(team_dir):
+                    continue
+                parts = []
+                for name in sorted(os.listdir(team_dir)):
+                    if name.endswith(".csv"):
+                        sub = pd.read_csv(os.path.join(team_dir, name), encoding=CSV_ENCODING)
+                        parts.append((name[:-len(".csv")], sub))
+                if parts:
+                    found[(league, team)] = parts
+        return found
+
+    def _encode(self, league: str, team: str, target: str, sub: pd.DataFrame, columns: list) -> bytes:
+        body = sub.reindex(columns=columns[len(KEY_COLS):])
+        body.insert(0, "target", target)
+        body.insert(0, "team", team)
+        body.insert(0, "league", league)
+        return body.to_csv(index=False, header=False).encode("utf-8")
+
+    def write(self):
+        """統合表と索引を書き出す（置き換え）。(パス, スライス数, 行数) を返す。"""
+        prev = load_index(self.path)
+        fresh = self._teams
+        self._teams = {}
+
+        # 前回の統合表から、今回更新の無い球団のスライスを取り出す
+        kept = []
+        if prev:
+            with open(self.path, "rb") as f:
+                for league, team, target, offset, length, rows in prev["slices"]:
+                    if (league, team) in fresh:
+                        continue
+                    f.seek(offset)
+                    kept.append((league, team, target, f.read(length), rows))
+        covered = set(fresh) | {(s[0], s[1]) for s in kept}
+        compat = {} if prev else self._compat_parts(covered)
+
+        frames = [sub for parts in list(fresh.values()) + list(compat.values()) for _, sub in parts]
+        columns = KEY_COLS + self.id_cols + self._stat_cols(prev, frames)
+
+        slices = {}
+        for (league, team), parts in list(fresh.items()) + list(compat.items()):
+            for target, sub in parts:
+                slices[(league, team, target)] = (self._encode(league, team, target, sub, columns), len(sub))
+        for league, team, target, data, rows in kept:
+            if prev["columns"] != columns:
+                # 指標列が増えたときは読み直して列を揃える
+                sub = pd.read_csv(io.BytesIO(data), header=None, names=prev["columns"])
+                data = self._encode(league, team, target, sub.iloc[:, len(KEY_COLS):], columns)
+            slices[(league, team, target)] = (data, rows)
+
+        header = pd.DataFrame(columns=columns).to_csv(index=False).encode(CSV_ENCODING)
+        chunks = [header]
+        offset = len(header)
+        entries = []
+        for key in sorted(slices):
+            data, rows = slices[key]
+            entries.append([*key, offset, len(data), rows])
+            chunks.append(data)
+            offset += len(data)
+
+        csv_writer.write_bytes(self.path, b"".join(chunks))
+        index = {"columns": columns, "size": offset, "slices": entries}
+        csv_writer.write_bytes(index_path(self.path),
+                               json.dumps(index, ensure_ascii=False, indent=1).encode("utf-8"))
+        return self.path, len(entries), sum(e[5] for e in entries)
+
+
+def read_slices(path: str, league: str = None, team: str = None, target: str = None) -> pd.DataFrame:
+    """
+    統合表から条件に合うスライスだけを読む（索引のバイト位置へ seek、隣り合う範囲はまとめて読む）。
+    索引が無い/古いときは全体を読んで絞り込む。
+    """
+    index = load_index(path)
+    if index is None:
+        df = pd.read_csv(path, encoding=CSV_ENCODING)
+        for col, value in (("league", league), ("team", team), ("target", target)):
+            if value is not None:
+                df = df[df[col] == value]
+        return df.reset_index(drop=True)
+
+    ranges = []
+    for lg, tm, tg, offset, length, _ in index["slices"]:
+        if (league is None or lg == league) and (team is None or tm == team) \
+                and (target is None or tg == target):
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = offset + length
+            else:
+                ranges.append([offset, offset + length])
+
+    chunks = []
+    with open(path, "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            chunks.append(f.read(end - start))
+    if not chunks:
+        return pd.DataFrame(columns=index["columns"])
+    return pd.read_csv(io.BytesIO(b"".join(chunks)), header=None, names=index["columns"])
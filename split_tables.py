@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+split_tables.py
+- nf3 の 3 段ヘッダ表（ID 列 + 対戦相手/球場ごとの列グループ）を対象ごとの表に分ける共通処理
+- 数値化は表全体で 1 回だけ、対象ごとの列の振り分けも列を 1 回なめるだけで行う
+- 出力（列の並び・列名・dtype）は従来の save_one_team のループと同じ
+"""
+
+import pandas as pd
+
+
+def split_by_target(df: pd.DataFrame, id_cols: list, text_cols=()):
+    """
+    (対象名, 表) を第1階層の出現順に返す。
+    表の列は ID 列（第1階層の名前）+ その対象の列（第2階層の名前）。
+    text_cols に含まれる列名以外は pd.to_numeric(errors="coerce") で数値化する。
+    """
+    id_set = set(id_cols)
+    id_level0 = {c[0] for c in id_cols}
+    names = [col[0] if col in id_set else col[1] for col in df.columns]
+
+    position = {}
+    groups = {}      # 対象名 -> 列位置（dict なので出現順を保つ）
+    for i, col in enumerate(df.columns):
+        position.setdefault(col, i)
+        if col[0] not in id_level0:
+            groups.setdefault(col[0], []).append(i)
+    id_pos = [position[c] for c in id_cols]
+
+    # Series を介さず配列のまま数値化する（dtype の決まり方は Series と同じ）
+    used = set(id_pos).union(*groups.values())
+    data = {}
+    for i, (_, col) in enumerate(df.items()):
+        if i not in used:
+            continue
+        if names[i] in text_cols or col.dtype.kind in "iufb":
+            data[i] = col
+        else:
+            data[i] = pd.to_numeric(col.to_numpy(), errors="coerce")
+    wide = pd.DataFrame(data, index=df.index)
+
+    for tgt, pos in groups.items():
+        cols = id_pos + pos
+        sub = wide[cols]
+        sub.columns = [names[i] for i in cols]
+        yield tgt, sub
+
+
+def unique_columns(columns) -> list:
+    """重複する列名に ".1" ".2" … を付けて一意にする（pd.read_csv / read_html が付けるのと同じ名前）。"""
+    seen = set()
+    counts = {}
+    out = []
+    for col in columns:
+        name, n = col, counts.get(col, 0)
+        while name in seen:
+            n += 1
+            name = f"{col}.{n}"
+        counts[col] = n
+        seen.add(name)
+        out.append(name)
+    return out
+
+
+def with_unique_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """列名が重複していれば unique_columns で付け直した表（重複が無ければそのまま）。"""
+    if not df.columns.has_duplicates:
+        return df
+    return df.set_axis(unique_columns(df.columns), axis=1)
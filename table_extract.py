@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+table_extract.py
+- ページ中の「必要な表だけ」を取り出す軽量版 read_html（lxml iterparse ベース）
+  ・指定した番号の表まで読んだら以降の HTML は解析しない
+  ・columns を指定すると、その列だけを型推定して DataFrame にする
+  ・header=[0, 1, 2]（nf3 の 3 段ヘッダ）も pd.read_html と同じ列名になる
+- 結果は pd.read_html(...)[i] と同一（セル文字列の整形・colspan/rowspan 展開・
+  ヘッダ推定・型推定の規則を pandas と揃えている）
+- 使い方:
+    df = read_table(res.content)                                  # tables[0] 相当
+    df = read_table(res.content, encoding="cp932", header=[0, 1, 2])
+    central, pacific = read_tables(res.content, [0, 1], columns=["チーム", "試 合"])
+"""
+
+import re
+from io import BytesIO
+
+from lxml import etree
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+import run_metrics
+
+# pd.read_html と同じセル文字列の整形（改行・連続空白 → 半角スペース1つ）
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+_RE_MATCH = re.compile(".+")
+
+# pd.read_html が TextParser に渡す既定値
+_PARSER_KWARGS = {
+    "index_col": None,
+    "skiprows": 0,
+    "parse_dates": False,
+    "thousands": ",",
+    "decimal": ".",
+    "converters": None,
+    "na_values": None,
+    "keep_default_na": True,
+}
+
+
+def _text(node) -> str:
+    return _RE_WHITESPACE.sub(" ", "".join(node.itertext()).strip())
+
+
+def _hidden(node) -> bool:
+    return "display:none" in (node.get("style") or "").replace(" ", "")
+
+
+def _drop_tree(node):
+    """lxml.html の drop_tree と同じ（子孫ごと削除し、tail は直前に繋ぐ）。"""
+    parent = node.getparent()
+    if parent is None:
+        return
+    if node.tail:
+        prev = node.getprevious()
+        if prev is not None:
+            prev.tail = (prev.tail or "") + node.tail
+        else:
+            parent.text = (parent.text or "") + node.tail
+    parent.remove(node)
+
+
+def _cells(row) -> list:
+    return [c for c in row if c.tag == "td" or c.tag == "th"]
+
+
+def _rows(table):
+    """(thead 行, tbody 行, tfoot 行)。thead が無ければ先頭の th だけの行をヘッダにする。"""
+    head = []
+    for thead in table.xpath(".//thead"):
+        head.extend(thead.xpath("./tr"))
+        if _cells(thead):
+            head.append(thead)
+    body = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    foot = table.xpath(".//tfoot//tr")
+    if not head:
+        while body and all(c.tag == "th" for c in _cells(body[0])):
+            head.append(body.pop(0))
+    return head, body, foot
+
+
+def _expand(rows, remainder=None, overflow=True):
+    """colspan / rowspan を展開して文字列の行リストにする（pandas と同じ手順）。"""
+    out = []
+    remainder = remainder or []
+    for tr in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in _cells(tr):
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_text, prev_span = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_span > 1:
+                    next_remainder.append((prev_i, prev_text, prev_span - 1))
+                index += 1
+            text = _text(td)
+            rowspan = int(td.get("rowspan") or 1)
+            colspan = int(td.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        for prev_i, prev_text, prev_span in remainder:
+            texts.append(prev_text)
+            if prev_span > 1:
+                next_remainder.append((prev_i, prev_text, prev_span - 1))
+        out.append(texts)
+        remainder = next_remainder
+
+    if not overflow:
+        while remainder:
+            next_remainder = []
+            texts = []
+            for prev_i, prev_text, prev_span in remainder:
+                texts.append(prev_text)
+                if prev_span > 1:
+                    next_remainder.append((prev_i, prev_text, prev_span - 1))
+            out.append(texts)
+            remainder = next_remainder
+    return out, remainder
+
+
+def _parse(rows, header):
+    with TextParser(rows, header=header, **_PARSER_KWARGS) as tp:
+        return tp.read()
+
+
+def _to_frame(table, header=None, columns=None):
+    """1 つの <table> 要素を DataFrame にする。空の表は EmptyDataError。"""
+    head_rows, body_rows, foot_rows = _rows(table)
+    head, rem = _expand(head_rows)
+    body, rem = _expand(body_rows, rem, overflow=len(foot_rows) > 0)
+    foot, _ = _expand(foot_rows, rem, overflow=False)
+
+    if head:
+        if header is None:
+            header = 0 if len(head) == 1 else [i for i, r in enumerate(head) if any(r)]
+    rows = head + body + foot
+
+    # 行の長さを最長に揃える
+    width = max((len(r) for r in rows), default=0)
+    for r in rows:
+        if len(r) < width:
+            r.extend([""] * (width - len(r)))
+
+    if columns is None:
+        return _parse(rows, header)
+
+    # 列名だけ先に決める（ヘッダ行 + 1 行で十分）→ 必要な列だけ型推定
+    n_head = 0 if header is None else (header + 1 if isinstance(header, int) else max(header) + 1)
+    if len(rows) <= n_head or not any(any(r) for r in rows):
+        return _parse(rows, header)[list(columns)]
+    labels = _parse(rows[:n_head + 1], header).columns
+    try:
+        positions = [list(labels).index(c) for c in columns]
+    except ValueError:
+        missing = [c for c in columns if c not in labels]
+        raise KeyError(f"{missing} not in columns")
+    projected = [[r[i] for i in positions] for r in rows]
+    # 列を絞ると空行になる行があると、空行の読み飛ばしで結果がずれるので全列で処理
+    if any(not any(p) and any(r) for p, r in zip(projected, rows)):
+        return _parse(rows, header)[list(columns)]
+    df = _parse(projected, header)
+    df.columns = labels[positions]
+    return df
+
+
+def _candidates(top):
+    """最上位の <table> とその入れ子の表（pd.read_html と同じ文書順・同じ絞り込み）。"""
+    for br in top.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+    tables = [
+        t for t in top.iter("table")
+        if any(_RE_MATCH.search(s) for s in t.xpath(".//text()")) and not _hidden(t)
+    ]
+    for t in tables:
+        for node in t.xpath(".//style"):
+            _drop_tree(node)
+        for node in t.xpath(".//*[@style]"):
+            if _hidden(node):
+                _drop_tree(node)
+    return tables
+
+
+def read_tables(content: bytes, indices=(0,), encoding: str = None, header=None, columns=None) -> list:
+    """
+    pd.read_html(content)[i] を indices の各 i について返す（並びも indices の順）。
+    最大の番号の表を読み終えた時点で解析を打ち切る。足りなければ ValueError。
+    columns を指定すると、その列だけの DataFrame を返す（全表に同じ指定を適用）。
+    """
+    with run_metrics.stage("parse", bytes=len(content)) as m:
+        tables = _read_tables(content, indices, encoding, header, columns)
+        m["rows"] = sum(len(df) for df in tables)
+    return tables
+
+
+def _read_tables(content: bytes, indices, encoding: str, header, columns) -> list:
+    wanted = sorted(set(indices))
+    if not wanted:
+        return []
+    found = {}
+    count = 0
+    depth = 0
+    parser = etree.iterparse(BytesIO(content), events=("start", "end"), html=True,
+                             recover=True, encoding=encoding)
+    for event, elem in parser:
+        if elem.tag == "table":
+            depth += 1 if event == "start" else -1
+        if event != "end" or depth > 0:
+            continue
+
+        if elem.tag == "table":
+            for t in _candidates(elem):
+                try:
+                    df = _to_frame(t, header, columns if count in wanted else None)
+                except EmptyDataError:
+                    continue     # 空の表は pd.read_html でも数えない
+                if count in wanted:
+                    found[count] = df
+                count += 1
+                if count > wanted[-1]:
+                    break
+        if count > wanted[-1]:
+            break
+
+        # 読み終えた要素は捨ててメモリを抑える
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    if count <= wanted[-1]:
+        raise ValueError(f"表が見つかりません（{count}個中 {wanted[-1]}番目を要求）")
+    return [found[i] for i in indices]
+
+
+def read_table(content: bytes, index: int = 0, encoding: str = None, header=None, columns=None):
+    """pd.read_html(content, ...)[index] 相当。"""
+    return read_tables(content, [index], encoding=encoding, header=header, columns=columns)[0]
@@ -1,47 +1,63 @@
 import pandas as pd
 import os
-from datetime import datetime
+from io import BytesIO
 
-# ログ出力設定
-log_dir = "/home/ec2-user/batch/logs"
-os.makedirs(log_dir, exist_ok=True)
-log_file_path = os.path.join(log_dir, f"team_batting_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-def log(msg):
-    timestamped_msg = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
-    print(timestamped_msg)  # コンソール出力
-    with open(log_file_path, "a", encoding="utf-8") as f:
-        f.write(timestamped_msg + "\n")  # ファイル出力
+import batch_log
+import batch_paths
+import csv_writer
+import run_metrics
+from http_client import apply_replay_arg, fetch, stats_summary
 
-log("=== チーム打撃成績の取得処理 開始 ===")
+# ログ出力設定
+log = batch_log.get_logger("team_batting")
 
 # URL
 url = "https://baseball-data.com/team/hitter.html"
 
-try:
-    # pandasでテーブルを一括取得
-    tables = pd.read_html(url)
-    log(f"取得テーブル数: {len(tables)}")
-
-    # 通常、セリーグ・パリーグの順番で取得される
-    central_df = tables[0].copy()
-    pacific_df = tables[1].copy()
-
-    # データ整形
-    central_df["リーグ"] = "セ・リーグ"
-    pacific_df["リーグ"] = "パ・リーグ"
-    df = pd.concat([central_df, pacific_df], ignore_index=True)
-
-    # 保存先ディレクトリとファイル名
-    output_dir = "/home/ec2-user/batch/data/team_batting"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, "team_batting_stats_2025.csv")
-
-    df.to_csv(output_path, index=False, encoding="utf-8-sig")
-    log(f"打撃成績をCSVとして保存しました：{output_path}")
-
-except Exception as e:
-    log(f"エラー発生：{e}")
-
-log("=== チーム打撃成績の取得処理 完了 ===")
-
+# 保存先ディレクトリとファイル名
+output_dir = os.path.join(batch_paths.DATA_DIR, "team_batting")
+output_path = os.path.join(output_dir, "team_batting_stats_2025.csv")
+
+def main():
+    log("=== チーム打撃成績の取得処理 開始 ===")
+
+    try:
+        res = fetch(url, commit=False)
+        if res.not_modified and os.path.exists(output_path):
+            log("更新なし（304）：保存をスキップ")
+            run_metrics.skipped()
+            log("=== チーム打撃成績の取得処理 完了 ===")
+            return
+
+        # pandasでテーブルを一括取得
+        with run_metrics.stage("parse", bytes=len(res.content)) as m:
+            tables = pd.read_html(BytesIO(res.content))
+            m["rows"] = sum(len(t) for t in tables)
+        log(f"取得テーブル数: {len(tables)}")
+
+        # 通常、セリーグ・パリーグの順番で取得される
+        central_df = tables[0].copy()
+        pacific_df = tables[1].copy()
+
+        # データ整形
+        central_df["リーグ"] = "セ・リーグ"
+        pacific_df["リーグ"] = "パ・リーグ"
+        df = pd.concat([central_df, pacific_df], ignore_index=True)
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        if csv_writer.write_csv(df, output_path):
+            log(f"打撃成績をCSVとして保存しました：{output_path}")
+        else:
+            log(f"打撃成績に変更なし：{output_path}")
+        res.commit()   # 書き出しまで済んだ回だけ、次回 304 で飛ばせるようにする
+
+    except Exception as e:
+        log.error(f"エラー発生：{e}")
+
+    log(stats_summary())
+    log("=== チーム打撃成績の取得処理 完了 ===")
+
+if __name__ == "__main__":
+    apply_replay_arg()
+    main()
@@ -1,52 +1,63 @@
 import os
 import pandas as pd
-import requests
-from datetime import datetime
 from io import StringIO
 
+import batch_log
+import batch_paths
+import charset
+import csv_writer
+import run_metrics
+from http_client import apply_replay_arg, fetch, stats_summary
+
 # === 保存先の設定 ===
 url = "https://baseball-data.com/team/pitcher.html"
-save_dir = "/home/ec2-user/batch/data/team_pitcher"
+save_dir = os.path.join(batch_paths.DATA_DIR, "team_pitcher")
 os.makedirs(save_dir, exist_ok=True)
 save_path = os.path.join(save_dir, "team_pitcher_stats_2025.csv")
 
 # ✅ ログ保存先（修正箇所）
-log_dir = "/home/ec2-user/batch/logs"
-os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, f"log_team_pitcher_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-# === ログ関数 ===
-def log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
-    print(f"[{timestamp}] {message}")
+log = batch_log.get_logger("team_pitcher")
 
 # === 実行処理 ===
-try:
-    log("チーム投手成績の取得開始")
-
-    headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
-    res = requests.get(url, headers=headers)
-    res.encoding = res.apparent_encoding
-
-    # ⛳ HTMLのテーブル読み込み（pandas推奨形式）
-    tables = pd.read_html(StringIO(res.text))
-
-    df_central = tables[0].copy()
-    df_pacific = tables[1].copy()
-
-    df_central["リーグ"] = "セ・リーグ"
-    df_pacific["リーグ"] = "パ・リーグ"
-
-    df_all = pd.concat([df_central, df_pacific], ignore_index=True)
-
-    df_all.to_csv(save_path, index=False, encoding="utf-8-sig")
-    log(f"保存完了: {save_path}")
-    log("処理正常終了")
-
-except Exception as e:
-    log(f"エラー発生: {e}")
-
+def main():
+    try:
+        log("チーム投手成績の取得開始")
+
+        headers = {
+            "User-Agent": "Mozilla/5.0"
+        }
+        res = fetch(url, headers=headers, commit=False)
+        if res.not_modified and os.path.exists(save_path):
+            log("更新なし（304）：保存をスキップ")
+            run_metrics.skipped()
+            return
+        text = charset.decode(res)
+
+        # ⛳ HTMLのテーブル読み込み（pandas推奨形式）
+        with run_metrics.stage("parse", bytes=len(res.content)) as m:
+            tables = pd.read_html(StringIO(text))
+            m["rows"] = sum(len(t) for t in tables)
+
+        df_central = tables[0].copy()
+        df_pacific = tables[1].copy()
+
+        df_central["リーグ"] = "セ・リーグ"
+        df_pacific["リーグ"] = "パ・リーグ"
+
+        df_all = pd.concat([df_central, df_pacific], ignore_index=True)
+
+        if csv_writer.write_csv(df_all, save_path):
+            log(f"保存完了: {save_path}")
+        else:
+            log(f"内容変更なし: {save_path}")
+        res.commit()   # 書き出しまで済んだ回だけ、次回 304 で飛ばせるようにする
+        log(stats_summary())
+        log(charset.summary())
+        log("処理正常終了")
+
+    except Exception as e:
+        log.error(f"エラー発生: {e}")
+
+if __name__ == "__main__":
+    apply_replay_arg()
+    main()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""スクリプトはリポジトリ直下の平置きなので、直下を import パスに入れる。ログは一時ディレクトリへ。"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _batch_log_dir(tmp_path, monkeypatch):
+    import batch_log
+    monkeypatch.setattr(batch_log, "LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setattr(batch_log, "CONSOLE", False)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""charset: BOM → ヘッダ → meta → 覚えた文字コード → 推定 の順に判定する。"""
+
+from collections import namedtuple
+
+import pytest
+
+import charset
+
+Page = namedtuple("Page", "url headers content")
+TEXT = "<html><body><table><tr><td>岡本和真 髙橋</td></tr></table></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(charset, "STORE_PATH", str(tmp_path / "encodings.json"))
+    monkeypatch.setattr(charset, "_learned", None)
+    monkeypatch.setattr(charset, "_stats", {"pages": 0, "ms": 0.0, "slowest_ms": 0.0,
+                                            "slowest_url": None, "sources": {}})
+
+
+def test_header_charset_is_normalized_to_cp932():
+    page = Page("https://nf3.sakura.ne.jp/Central/G/t/kiroku.htm",
+                {"Content-Type": 'text/html; charset="Shift_JIS"'}, TEXT.encode("cp932"))
+    d = charset.detect(page)
+    assert (d.encoding, d.source) == ("cp932", "header")
+    assert charset.decode(page) == TEXT
+
+
+def test_meta_then_learned_pattern():
+    html = '<html><head><meta http-equiv="Content-Type" content="text/html; charset=x-sjis"></head>' + TEXT
+    page = Page("https://npb.jp/bis/2025/stats/tmf_c.html", {"Content-Type": "text/html"}, html.encode("cp932"))
+    assert charset.detect(page)[:2] == ("cp932", "meta")
+
+    # 同じパターン（数字は #）の meta の無いページは、覚えた文字コードを使う
+    bare = Page("https://npb.jp/bis/2024/stats/tmf_p.html", {}, TEXT.encode("cp932"))
+    assert charset.pattern(bare.url) == "npb.jp/bis/#/stats/tmf_p.html"
+    learned = Page("https://npb.jp/bis/2024/stats/tmf_c.html", {}, TEXT.encode("cp932"))
+    assert charset.detect(learned)[:2] == ("cp932", "cache")
+
+
+def test_bom_wins_and_unknown_header_falls_through():
+    page = Page("https://example.test/a", {"Content-Type": "text/html; charset=utf-8"},
+                b"\xef\xbb\xbf" + TEXT.encode("utf-8"))
+    assert charset.detect(page)[:2] == ("utf-8-sig", "bom")
+    page = Page("https://example.test/b", {"Content-Type": "text/html; charset=bogus"},
+                '<meta charset="utf-8">'.encode() + TEXT.encode("utf-8"))
+    assert charset.detect(page)[:2] == ("utf-8", "meta")
+    assert charset.stats()["sources"] == {"bom": 1, "meta": 1}
+
+
+def test_learned_encoding_is_skipped_when_it_cannot_decode():
+    charset.detect(Page("https://example.test/p/1", {"Content-Type": "text/html; charset=utf-8"},
+                        TEXT.encode("utf-8")))
+    d = charset.detect(Page("https://example.test/p/2", {}, TEXT.encode("cp932") * 20))
+    assert d.source == "detect" and d.encoding != "utf-8"
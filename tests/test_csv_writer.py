@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""csv_writer: 内容が同じなら触らない、変わったら一時ファイル経由で置き換える。"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import csv_writer
+
+DF = pd.DataFrame({"背番号": [25, 6], "選手名": ["岡本和真", "坂本勇人"], "打率": [0.281, 0.255]})
+
+
+def test_same_bytes_as_to_csv_and_unchanged_file_is_untouched(tmp_path):
+    path = tmp_path / "batter" / "giants.csv"
+    assert csv_writer.write_csv(DF, str(path)) is True
+    expected = tmp_path / "expected.csv"
+    DF.to_csv(expected, index=False, encoding="utf-8-sig")
+    assert path.read_bytes() == expected.read_bytes()
+
+    before = os.stat(path)
+    os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns - 10**9))
+    before = os.stat(path)
+    assert csv_writer.write_csv(DF.copy(), str(path)) is False
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_changed_content_is_replaced_atomically(tmp_path):
+    path = tmp_path / "giants.csv"
+    csv_writer.write_csv(DF, str(path))
+    inode = os.stat(path).st_ino
+    changed = DF.assign(打率=[0.290, 0.255])
+    assert csv_writer.write_csv(changed, str(path)) is True
+    assert os.stat(path).st_ino != inode                # 新しいファイルに置き換え（書きかけを見せない）
+    assert pd.read_csv(path, encoding="utf-8-sig")["打率"].tolist() == [0.290, 0.255]
+    assert os.listdir(tmp_path) == ["giants.csv"]       # 一時ファイルは残らない
+
+
+def test_failed_replace_keeps_old_file_and_removes_tmp(tmp_path, monkeypatch):
+    path = tmp_path / "giants.csv"
+    csv_writer.write_csv(DF, str(path))
+    old = path.read_bytes()
+
+    def broken(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(csv_writer.os, "replace", broken)
+    with pytest.raises(OSError):
+        csv_writer.write_csv(DF.assign(打率=[0.3, 0.3]), str(path))
+    assert path.read_bytes() == old
+    assert os.listdir(tmp_path) == ["giants.csv"]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""http_client: ローカルの http.server スタンドイン相手に条件付き GET（ETag → 304）を確認する。"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_cache
+import http_client
+
+BODY = "<html><body>試合結果</body></html>".encode("cp932")
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    seen = []
+
+    def do_GET(self):
+        _Handler.seen.append((self.path, dict(self.headers)))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "text/html; charset=Shift_JIS")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _Handler.seen = []
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setattr(http_client, "UPSTREAM_OVERRIDE", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(http_client, "HTTP_CACHE_ENABLED", True)
+    monkeypatch.setattr(http_client, "ARCHIVE_ENABLED", False)
+    monkeypatch.setattr(http_client, "_evicted", True)
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "http"))
+    yield _Handler.seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_second_fetch_is_conditional_and_reuses_cached_body(upstream):
+    url = "https://nf3.sakura.ne.jp/Central/DB/t/kiroku.htm"
+
+    first = http_client.fetch(url)
+    assert first.status == 200 and not first.not_modified
+    assert first.content == BODY
+    assert upstream[0][0] == "/nf3.sakura.ne.jp/Central/DB/t/kiroku.htm"
+    assert "If-None-Match" not in upstream[0][1]
+
+    body_path, _ = http_cache._paths(url)
+    before = os.stat(body_path)
+
+    second = http_client.fetch(url)
+    assert upstream[1][1].get("If-None-Match") == ETAG
+    assert second.status == 304 and second.not_modified
+    assert second.content == BODY
+
+    # 304 では本文を書き直さない（置き換えなら inode が変わる）
+    after = os.stat(body_path)
+    assert after.st_ino == before.st_ino and after.st_size == before.st_size
+    with open(body_path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_deferred_validators_are_sent_only_after_commit(upstream):
+    url = "https://baseball-data.com/stats/hitter-g/"
+
+    first = http_client.fetch(url, commit=False)
+    assert first.status == 200
+    # 書き出し前に落ちた回: 検証子が無いので次も 200 で取り直す
+    second = http_client.fetch(url, commit=False)
+    assert "If-None-Match" not in upstream[1][1]
+    assert second.status == 200 and not second.not_modified
+
+    second.commit()
+    third = http_client.fetch(url, commit=False)
+    assert upstream[2][1].get("If-None-Match") == ETAG
+    assert third.not_modified and third.content == BODY
+
+
+def test_eviction_runs_once_across_threads(upstream, monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_client, "_evicted", False)
+    monkeypatch.setattr(http_cache, "evict", lambda: calls.append(threading.get_ident()))
+    threads = [threading.Thread(target=http_client.fetch, args=(f"https://nf3.sakura.ne.jp/p{i}.htm",))
+               for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(upstream) == 8
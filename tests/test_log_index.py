@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""log_index: 追記分だけの差分索引、rotate_logs で圧縮されたログのパス付け替え、切り詰め・作り直しを確認する。"""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+import log_index
+import rotate_logs
+
+DAY = 86400
+
+
+def _line(n):
+    return f"[2025-06-0{n} 08:00:00] 失敗: https://nf3.sakura.ne.jp/p{n}.htm (404 Client Error)\n".encode("utf-8")
+
+
+def _write(path, data, mtime=None, mode="wb"):
+    with open(path, mode) as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def env(tmp_path):
+    root = tmp_path / "logs"
+    root.mkdir()
+    return str(root), str(tmp_path / "log_index.sqlite")
+
+
+def _files(db):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute("SELECT id, path, gz, offset FROM files ORDER BY path").fetchall()
+    finally:
+        con.close()
+
+
+def _events(db):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute("SELECT file_id, pos, url, error FROM events ORDER BY file_id, pos").fetchall()
+    finally:
+        con.close()
+
+
+def test_appended_lines_are_read_from_last_offset(env):
+    root, db = env
+    path = os.path.join(root, "batter_scraping_20250601_080000.log")
+    _write(path, _line(1) + _line(2))
+
+    assert log_index.update(root, db)["events"] == 2
+    # 書きかけの最終行（改行なし）はまだ読まない
+    _write(path, _line(3) + _line(4)[:20], mode="ab")
+    assert log_index.update(root, db)["events"] == 1
+    _write(path, _line(4)[20:], mode="ab")
+    assert log_index.update(root, db)["events"] == 1
+    assert log_index.update(root, db)["events"] == 0
+
+    events = _events(db)
+    assert [e[2] for e in events] == [f"https://nf3.sakura.ne.jp/p{n}.htm" for n in (1, 2, 3, 4)]
+    assert {e[3] for e in events} == {"http_404"}
+    assert _files(db)[0][1] == "batter_scraping_20250601_080000.log"
+
+
+def test_rotated_gz_is_repointed_without_reindexing(env):
+    root, db = env
+    path = os.path.join(root, "games_scraping.log")
+    _write(path, _line(1) + _line(2), mtime=time.time() - 5 * DAY)
+    log_index.update(root, db)
+    before_files, before_events = _files(db), _events(db)
+
+    assert rotate_logs.rotate(root)["compressed"] == 1
+    s = log_index.update(root, db)
+
+    assert s["events"] == 0 and s["removed"] == 0 and not s["failed"]
+    file_id, rel, gz, offset = _files(db)[0]
+    assert (file_id, rel, gz, offset) == (before_files[0][0], "games_scraping.log.gz", 1, before_files[0][3])
+    assert _events(db) == before_events
+    assert log_index.update(root, db)["events"] == 0
+
+
+def test_stamped_gz_reads_only_the_unindexed_tail(env):
+    root, db = env
+    path = os.path.join(root, "batter_scraping.py")
+    _write(path, _line(1))
+    log_index.update(root, db)
+    # 索引した後に追記され、そのまま <名前>.<mtime>.gz に圧縮された
+    _write(path, _line(2), mode="ab")
+    f = rotate_logs.scan(root)[0]
+    gz_path = path + ".20250602_080000.gz"
+    rotate_logs.compress_file(f, gz_path)
+
+    s = log_index.update(root, db)
+
+    assert s["events"] == 1 and s["removed"] == 0
+    rows = _files(db)
+    assert len(rows) == 1 and rows[0][1] == os.path.basename(gz_path) and rows[0][2] == 1
+    assert [e[2] for e in _events(db)] == ["https://nf3.sakura.ne.jp/p1.htm", "https://nf3.sakura.ne.jp/p2.htm"]
+    assert log_index.job_of(rows[0][1]) == "batter_scraping"
+
+
+def test_truncated_file_is_reindexed_from_start(env):
+    root, db = env
+    path = os.path.join(root, "team_batting.log")
+    _write(path, _line(1) + _line(2) + _line(3))
+    log_index.update(root, db)
+
+    # 先頭は同じまま短くなった → 位置が合わないので読み直す
+    _write(path, _line(1))
+    assert log_index.update(root, db)["events"] == 1
+    rows = _files(db)
+    assert len(rows) == 1 and rows[0][3] == len(_line(1))
+    assert [e[2] for e in _events(db)] == ["https://nf3.sakura.ne.jp/p1.htm"]
+
+
+def test_recreated_file_with_new_head_drops_old_events(env):
+    root, db = env
+    path = os.path.join(root, "team_pitcher.log")
+    _write(path, _line(1) + _line(2), mtime=time.time() - 60)
+    log_index.update(root, db)
+
+    # 同じ名前で作り直され、前より長くなった（サイズだけでは気づけない）
+    _write(path, _line(3) + _line(4) + _line(5))
+    assert log_index.update(root, db)["events"] == 3
+    assert [e[2] for e in _events(db)] == [f"https://nf3.sakura.ne.jp/p{n}.htm" for n in (3, 4, 5)]
+    assert len(_files(db)) == 1
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""name_resolver: 辞書キーの最長一致・表記ゆれの吸収・辞書に無い名前のスラッグ。"""
+
+from name_resolver import NameResolver, compact_name, fallback_slug, strip_name
+from scrape_hitters_vs_team_all import OPPONENT_NAME_MAP
+from scrape_pitchers_vs_stadium_all import STADIUM_NAME_MAP
+
+
+def test_longest_key_wins_regardless_of_dict_order():
+    stadium = NameResolver(STADIUM_NAME_MAP, normalize=compact_name, label="stadium")
+    assert stadium.resolve("みずほPayPayドーム") == "mizuhopaypay_dome"
+    assert stadium.resolve("PayPayドーム") == "paypay_dome"
+    # 短いキーを先に並べても結果は同じ
+    reordered = NameResolver(dict(reversed(list(STADIUM_NAME_MAP.items()))), normalize=compact_name)
+    assert reordered.resolve("みずほPayPayドーム") == "mizuhopaypay_dome"
+
+
+def test_width_and_space_variants():
+    stadium = NameResolver(STADIUM_NAME_MAP, normalize=compact_name)
+    assert stadium.resolve("エスコンＦ") == stadium.resolve("エスコンF") == "escon_field_hokkaido"
+    assert stadium.resolve("エスコン Ｆ") == "escon_field_hokkaido"
+    assert stadium.resolve("ＺＯＺＯマリン") == "zozo_marine"
+
+    opponent = NameResolver(OPPONENT_NAME_MAP, normalize=strip_name)
+    assert opponent.resolve(" ＤｅＮＡ ") == "BayStars"
+    assert opponent.resolve("横浜DeNA") == "BayStars"
+    assert opponent.resolve("読売巨人") == "Giants"
+
+
+def test_unknown_names_fall_back_and_are_logged_once():
+    logged = []
+    resolver = NameResolver({"東京ドーム": "tokyo_dome"}, normalize=compact_name, label="stadium",
+                            log=logged.append)
+    assert resolver.resolve("Escon F") == "EsconF"
+    assert resolver.resolve("倉敷") == fallback_slug("倉敷")
+    assert fallback_slug("倉敷").startswith("u") and len(fallback_slug("倉敷")) == 9
+    resolver.resolve("倉敷")
+    assert len(logged) == 2 and resolver.unknown() == ["Escon F", "倉敷"]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""player_ids: 表記ゆれの照合・背番号変更の引き継ぎ・プロセス間で ID が重複しないこと。"""
+
+import multiprocessing
+
+import pytest
+
+import player_ids
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "player_ids.json")
+    monkeypatch.setattr(player_ids, "STORE_PATH", path)
+    monkeypatch.setattr(player_ids, "_store", None)
+    monkeypatch.setattr(player_ids, "_index", {})
+    return path
+
+
+def test_same_player_across_sites_and_number_change(store):
+    pid = player_ids.player_id("giants", "25", "岡本 和真", season=2025)
+    assert pid == 2025 * player_ids.ID_BASE + 1
+    assert player_ids.player_id("Giants", 25.0, "岡本和真", season=2025) == pid
+    assert player_ids.player_id("Giants", "7", "岡本和真", season=2025) == pid
+    assert player_ids.player_id("Giants", "25", "坂本勇人", season=2025) == pid + 1
+    assert player_ids.ids_for("giants", ["1", None], ["", "nan"], season=2025) == [None, None]
+
+
+def _allocate(args):
+    path, team, names = args
+    player_ids.STORE_PATH = path
+    player_ids._store = None
+    player_ids._index = {}
+    return player_ids.ids_for(team, [str(i) for i in range(len(names))], names, season=2025)
+
+
+def test_parallel_processes_do_not_share_ids(store):
+    # プロセスごとに別の選手を払い出しても、連番は重複しない
+    jobs = [(store, "giants", [f"選手{p}_{i}" for i in range(20)]) for p in range(4)]
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.map(_allocate, jobs)
+    ids = [pid for ids in results for pid in ids]
+    assert len(set(ids)) == len(ids) == 80
+
+    player_ids._store = None
+    player_ids._index = {}
+    assert _allocate(jobs[2]) == results[2]   # 読み直しても同じ ID
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""rotate_logs: 固定名の追記型ログの圧縮先の衝突回避と、容量上限での削除順を確認する。"""
+
+import gzip
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import rotate_logs
+
+DAY = 86400
+
+
+def _write(path, data, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "logs")
+
+
+def test_fixed_name_log_does_not_overwrite_existing_gz(root):
+    now = time.time()
+    old = now - 5 * DAY
+    log_path = _write(os.path.join(root, "batter_scraping.py"), b"third run\n", old)
+    _write(log_path + ".gz", gzip.compress(b"first run\n"), now - 10 * DAY)
+    stamp = f"{log_path}.{datetime.fromtimestamp(old):%Y%m%d_%H%M%S}"
+    _write(stamp + ".gz", gzip.compress(b"second run\n"), now - 7 * DAY)
+
+    s = rotate_logs.rotate(root)
+
+    assert s["compressed"] == 1 and not s["failed"]
+    assert not os.path.exists(log_path)
+    # 既存の 2 つはそのまま、今回分は連番付きの名前になる
+    with gzip.open(log_path + ".gz") as f:
+        assert f.read() == b"first run\n"
+    with gzip.open(stamp + ".gz") as f:
+        assert f.read() == b"second run\n"
+    with gzip.open(stamp + "_1.gz") as f:
+        assert f.read() == b"third run\n"
+    assert os.stat(stamp + "_1.gz").st_mtime == pytest.approx(old, abs=1)
+
+
+def test_gz_path_for_is_unique_within_one_plan(root):
+    now = time.time()
+    a = rotate_logs.LogFile(os.path.join(root, "a.log"), "a.log", 1, now - 3 * DAY)
+    b = rotate_logs.LogFile(os.path.join(root, "b.log"), "b.log", 1, now - 3 * DAY)
+    taken = {a.path, b.path, a.path + ".gz"}
+    first = rotate_logs.gz_path_for(a, taken)
+    second = rotate_logs.gz_path_for(a, taken)
+    assert first != a.path + ".gz" and second != first
+    assert rotate_logs.gz_path_for(b, taken) == b.path + ".gz"
+
+
+def test_cap_deletes_oldest_gz_first_then_uncompressed(root, monkeypatch):
+    monkeypatch.setattr(rotate_logs, "MAX_TOTAL_MB", 2500 / (1024 * 1024))
+    now = time.time()
+    kb = b"x" * 1000
+    _write(os.path.join(root, "old.jsonl.gz"), kb, now - 20 * DAY)
+    _write(os.path.join(root, "mid.jsonl.gz"), kb, now - 10 * DAY)
+    # 未圧縮でも .gz より後回し（保持期間内なので圧縮もされない）
+    _write(os.path.join(root, "sub", "today.jsonl"), kb, now - 3600)
+    _write(os.path.join(root, "yesterday.jsonl"), kb, now - DAY)
+    # 書き込み中のログは上限を超えていても消さない
+    _write(os.path.join(root, "active.jsonl"), kb, now)
+
+    s = rotate_logs.rotate(root)
+
+    remaining = sorted(os.path.relpath(os.path.join(d, n), root)
+                       for d, _, names in os.walk(root) for n in names)
+    assert remaining == ["active.jsonl", os.path.join("sub", "today.jsonl")]
+    assert s["capped"] == 3 and s["compressed"] == 0
+    assert s["bytes_after"] == 2000 <= rotate_logs.MAX_TOTAL_MB * 1024 * 1024
+
+
+def test_dry_run_changes_nothing(root, monkeypatch):
+    monkeypatch.setattr(rotate_logs, "MAX_TOTAL_MB", 0)
+    now = time.time()
+    paths = [_write(os.path.join(root, "x.log"), b"a" * 100, now - 5 * DAY),
+             _write(os.path.join(root, "y.log.gz"), b"b" * 100, now - 60 * DAY)]
+
+    s = rotate_logs.rotate(root, dry_run=True)
+
+    assert s["compressed"] == 1 and s["expired"] == 1
+    assert all(os.path.exists(p) for p in paths)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""run_ledger: 基準と比べた劣化検出（304 で解析・書き出しを飛ばした回は量を比べない）。"""
+
+import run_ledger
+
+
+def _report(day: int, seconds: float = 12.0, rows: int = 100, not_modified: int = 0) -> dict:
+    fetched = not not_modified
+    stages = {
+        "fetch": {"calls": 12, "seconds": seconds - 2, "retries": 0, "not_modified": not_modified},
+        "parse": {"calls": 12 if fetched else 0, "rows": rows if fetched else 0, "seconds": 1.0},
+        "write": {"calls": 12 if fetched else 0, "bytes": 50000 if fetched else 0,
+                  "files": 12 if fetched else 0, "unchanged": 0, "seconds": 0.5},
+    }
+    team = {
+        "fetch": {"calls": 1, "seconds": 1.0, "not_modified": min(not_modified, 1)},
+        "parse": {"rows": rows // 12 if fetched else 0},
+        "write": {"bytes": 4000 if fetched else 0, "files": 1 if fetched else 0},
+    }
+    return {"run": f"r{day:02d}", "started": f"2025-06-{day:02d}T08:00:00", "finished": "", "seconds": seconds,
+            "jobs": {"batter_scraping": {"stages": stages, "teams": {"baystars": team},
+                                         "ok": True, "seconds": seconds}}}
+
+
+def test_flags_slowdown_and_row_drop(tmp_path):
+    db = str(tmp_path / "ledger.sqlite")
+    for day in range(1, 11):
+        run_ledger.record(_report(day, seconds=12 + day % 3 * 0.2), db)
+    run_ledger.record(_report(11, seconds=36, rows=60), db)
+    flagged = {(f["team"], f["metric"]) for f in run_ledger.check(path=db)}
+    assert (None, "seconds") in flagged
+    assert (None, "rows") in flagged
+
+
+def test_not_modified_run_is_not_a_volume_drop(tmp_path):
+    db = str(tmp_path / "ledger.sqlite")
+    for day in range(1, 11):
+        run_ledger.record(_report(day), db)
+    run_ledger.record(_report(11, seconds=6, not_modified=12), db)
+    assert run_ledger.check(path=db) == []
+    row = run_ledger.history("batter_scraping", limit=1, path=db)[0]
+    assert row[0] == "r11" and row[5:] == (None, None, None)
+
+    # 304 の回は基準にも入れない（次の通常の回は通常の回だけと比べる）
+    run_ledger.record(_report(12, rows=60), db)
+    flagged = {(f["team"], f["metric"]) for f in run_ledger.check(path=db)}
+    assert (None, "rows") in flagged
+
+
+TEAMS = ("giants", "tigers", "carp")
+
+
+def _teams_report(day: int, rows: dict = None, skipped=(), not_modified=()) -> dict:
+    """3 球団のジョブ。skipped は 304 で書き出しを飛ばした球団、not_modified は 304 でも解析した球団。"""
+    rows = rows or {}
+    teams = {}
+    for name in TEAMS:
+        gone = name in skipped
+        teams[name] = {
+            "fetch": {"calls": 1, "seconds": 1.0, "not_modified": int(gone or name in not_modified)},
+            "parse": {"rows": 0 if gone else rows.get(name, 100)},
+            "write": {"bytes": 0 if gone else 4000, "files": 0 if gone else 1, "unchanged": 0,
+                      "skipped": int(gone)},
+        }
+    stages = {s: {} for s in ("fetch", "parse", "write")}
+    for team in teams.values():
+        for s, values in team.items():
+            for k, v in values.items():
+                stages[s][k] = stages[s].get(k, 0) + v
+    return {"run": f"r{day:02d}", "started": f"2025-06-{day:02d}T08:00:00", "finished": "", "seconds": 3.0,
+            "jobs": {"scrape_hitters_vs_team_all": {"stages": stages, "teams": teams, "ok": True, "seconds": 3.0}}}
+
+
+def test_partial_304_compares_only_written_teams(tmp_path):
+    db = str(tmp_path / "ledger.sqlite")
+    for day in range(1, 11):
+        run_ledger.record(_teams_report(day), db)
+    # 1 球団だけ 304: ジョブ全体の量は 2 球団分になるが、基準も同じ 2 球団の合計なので減少ではない
+    run_ledger.record(_teams_report(11, skipped=("carp",)), db)
+    assert run_ledger.check(path=db) == []
+    row = run_ledger.history("scrape_hitters_vs_team_all", limit=1, path=db)[0]
+    assert row[5:] == (200, 8000, 2)
+
+    # 書き出した球団の行数が減った日はジョブ全体でも検出する
+    run_ledger.record(_teams_report(12, rows={"giants": 20}, skipped=("carp",)), db)
+    flagged = {(f["team"], f["metric"]) for f in run_ledger.check(path=db)}
+    assert (None, "rows") in flagged and ("giants", "rows") in flagged
+
+
+def test_not_modified_but_parsed_keeps_volume(tmp_path):
+    # 日程のように 304 でも解析・書き出しをするジョブは量を記録して比べる
+    db = str(tmp_path / "ledger.sqlite")
+    for day in range(1, 11):
+        run_ledger.record(_teams_report(day, not_modified=TEAMS), db)
+    run_ledger.record(_teams_report(11, rows={"tigers": 10}, not_modified=TEAMS), db)
+    flagged = {(f["team"], f["metric"]) for f in run_ledger.check(path=db)}
+    assert (None, "rows") in flagged and ("tigers", "rows") in flagged
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+scrape_nf3_schedule_all_teams: leg の学習は月ごと（ポストシーズンの月が他の月の leg を変えない）、
+差分モードと全月取得で同じ出力になること。
+"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import resolution_store
+import scrape_nf3_schedule_all_teams as schedule
+
+# 月 → データが載っている leg（他の leg は表だけあって 0 件）
+SERVED_ON = {4: 0, 10: 1}
+
+
+def _page(url: str):
+    params = dict(p.split("=") for p in url.split("?", 1)[1].split("&"))
+    if SERVED_ON.get(int(params["mon"])) != int(params["leg"]):
+        return pd.DataFrame(columns=schedule.NEEDED_COLS)
+    return pd.DataFrame([[f"{params['mon']}/1", "火", "阪神", "東京ドーム", "H", "18:00"]],
+                        columns=schedule.NEEDED_COLS)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(resolution_store, "STORE_PATH", str(tmp_path / "url_variants.json"))
+    monkeypatch.setattr(resolution_store, "_learned", None)
+    monkeypatch.setattr(resolution_store, "_dirty", set())
+    monkeypatch.setattr(resolution_store, "_stats", {})
+    monkeypatch.setattr(schedule, "read_table", _page)
+
+
+def test_month_served_on_other_leg_does_not_hide_regular_months(store):
+    assert schedule.fetch_table_any_leg("G", 10, 0)["leg_used"].tolist() == [1]
+    assert schedule.fetch_table_any_leg("G", 4, 0)["leg_used"].tolist() == [0]
+    # 次の回も同じ（月ごとの学習値から 1 回で取れる）
+    resolution_store.save()
+    resolution_store._learned = None
+    assert schedule.fetch_table_any_leg("G", 10, 0)["leg_used"].tolist() == [1]
+    assert schedule.fetch_table_any_leg("G", 4, 0)["leg_used"].tolist() == [0]
+
+
+def test_empty_month_on_learned_leg_stops_probing(store):
+    schedule.fetch_table_any_leg("G", 4, 0)
+    SERVED_ON.pop(4)
+    try:
+        with pytest.raises(schedule.EmptyMonthError):
+            schedule.fetch_table_any_leg("G", 4, 0)
+    finally:
+        SERVED_ON[4] = 0
+    assert resolution_store._stats["schedule:G:04"]["avoided"] == 2
+
+
+class _Today(date):
+    @classmethod
+    def today(cls):
+        return cls(2025, 5, 20)
+
+
+def _month_page(url: str):
+    params = dict(p.split("=") for p in url.split("?", 1)[1].split("&"))
+    mon = int(params["mon"])
+    # 4 月は開始が全部埋まって int、5 月は空きがあって float になる
+    start = [18, 14] if mon == 4 else [18, None]
+    return pd.DataFrame({"日付": [f"{mon}/1", f"{mon}/2"], "曜": ["火", "水"], "対戦T": ["阪神", "広島"],
+                         "球場": ["東京ドーム", "マツダ"], "H/V": ["H", "V"], "開始": start})
+
+
+def test_incremental_run_matches_full_refetch(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(schedule, "read_table", _month_page)
+    monkeypatch.setattr(schedule, "date", _Today)
+    monkeypatch.setattr(schedule, "SAVE_DIR", str(tmp_path / "matches"))
+    monkeypatch.setattr(schedule, "MONTH_CACHE_DIR", str(tmp_path / "schedule"))
+    monkeypatch.setattr(schedule, "TEAMS", {"Giants": {"tm": "G", "leg": 0}})
+    monkeypatch.setattr(schedule, "MONTHS", [4, 5])
+    monkeypatch.setattr(schedule, "REQUEST_INTERVAL", 0)
+    out = tmp_path / "matches" / "Giants.csv"
+
+    schedule.main(full=True)
+    full = out.read_bytes()
+    out.unlink()
+    schedule.main(full=False)     # 4 月は保存済みの月別データから
+    assert out.read_bytes() == full
+    assert "4/1,火,阪神,東京ドーム,H,18,4," in full.decode("utf-8-sig")   # 5 月の float に引きずられない
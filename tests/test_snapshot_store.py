@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""snapshot_store: 列が変わった日をまたぐ推移と、データセット単位の失敗の扱い。"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import snapshot_store
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    os.makedirs(data / "batter")
+    monkeypatch.setattr(snapshot_store, "DATA_ROOT", str(data))
+    monkeypatch.setattr(snapshot_store, "SNAPSHOT_ROOT", str(tmp_path / "snapshots"))
+    return data
+
+
+def _write(data, df):
+    df.to_csv(data / "batter" / "giants.csv", index=False, encoding="utf-8-sig")
+
+
+def test_series_aligns_rows_when_columns_change(roots):
+    _write(roots, pd.DataFrame({"背番号": [25, 6], "選手名": ["岡本和真", "坂本勇人"], "打率": [0.281, 0.255]}))
+    snapshot_store.record("batter", "2025-06-01")
+    # player_id が先頭に入った日（列が変わるのでチェックポイントになる）
+    _write(roots, pd.DataFrame({"player_id": [202500001, 202500002], "背番号": [25, 6],
+                                "選手名": ["岡本和真", "坂本勇人"], "打率": [0.290, 0.250]}))
+    snapshot_store.record("batter", "2025-06-02")
+
+    df = snapshot_store.series("batter", team="giants", 選手名="岡本和真")
+    assert list(df.columns) == ["day", "team", "player_id", "背番号", "選手名", "打率"]
+    assert df["打率"].tolist() == [0.281, 0.290]
+    assert df["背番号"].tolist() == [25, 25]
+    assert df["player_id"].isna().tolist() == [True, False]
+
+
+def test_record_all_continues_after_a_failing_dataset(roots, monkeypatch):
+    _write(roots, pd.DataFrame({"背番号": [25], "選手名": ["岡本和真"], "打率": [0.281]}))
+    real_record = snapshot_store.record
+
+    def record(dataset, day=None):
+        if dataset == "pitcher":
+            raise OSError("disk full")
+        return real_record(dataset, day)
+
+    monkeypatch.setattr(snapshot_store, "record", record)
+    monkeypatch.setattr(snapshot_store, "SOURCES", {k: snapshot_store.SOURCES[k] for k in ("pitcher", "batter")})
+    with pytest.raises(RuntimeError, match="pitcher"):
+        snapshot_store.record_all("2025-06-01")
+    assert [e[:2] for e in snapshot_store.entries("batter")] == [("2025-06-01", "full")]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""split_store / parquet_output: 同じ名前の指標列を落とさずに別の列として残す。"""
+
+import io
+
+import pandas as pd
+
+import parquet_output
+from split_store import SplitTable, read_slices
+from split_tables import unique_columns
+
+
+def _part():
+    sub = pd.DataFrame([[202500001, "25", "岡本和真", "右", 0.281, 0.310],
+                        [202500002, "6", "坂本勇人", "右", 0.255, 0.240]])
+    sub.columns = ["player_id", "背番", "名前", "席", "打率", "打率"]
+    return sub
+
+
+def test_unique_columns_matches_read_csv():
+    header = "打率,本塁,打率,打率\n1,2,3,4\n"
+    assert unique_columns(["打率", "本塁", "打率", "打率"]) == list(pd.read_csv(io.StringIO(header)).columns)
+
+
+def test_long_table_keeps_duplicate_named_stats(tmp_path):
+    table = SplitTable(str(tmp_path / "vs_team.csv"), ["player_id", "背番", "名前", "席"])
+    table.add("Central", "Giants", [("Tigers", _part())])
+    table.write()
+    df = read_slices(str(tmp_path / "vs_team.csv"), team="Giants")
+    assert df["打率"].tolist() == [0.281, 0.255]
+    assert df["打率.1"].tolist() == [0.310, 0.240]
+
+
+def test_parquet_splits_keep_duplicate_named_stats(tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_output, "PARQUET_ROOT", str(tmp_path))
+    monkeypatch.setattr(parquet_output, "ENABLED", True)
+    parquet_output.write_splits("hitters_vs_team", [("Tigers", _part())], "Central", "Giants")
+    df = parquet_output.read("hitters_vs_team", year=parquet_output.season())
+    assert df["打率"].tolist() == [0.281, 0.255]
+    assert df["打率.1"].tolist() == [0.310, 0.240]
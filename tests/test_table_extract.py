@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""table_extract: iterparse で読んだ表が pd.read_html(...)[i] と同じになること。"""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from table_extract import read_table, read_tables
+
+# nf3 の対戦成績と同じ 3 段ヘッダ（ID 列は rowspan、対象ごとに colspan）
+NF3 = """<html><head><meta charset="Shift_JIS"></head><body>
+<table border=1>
+<tr><th rowspan=3>背番</th><th rowspan=3>名前</th><th rowspan=3>席</th><th colspan=3>通算</th><th colspan=3>阪神</th></tr>
+<tr><th>打率</th><th>本塁</th><th>ＯＰＳ</th><th>打率</th><th>本塁</th><th>ＯＰＳ</th></tr>
+<tr><th>合計</th><th>合計</th><th>合計</th><th>合計</th><th>合計</th><th>合計</th></tr>
+<tr><td>25</td><td>岡本　和真</td><td>右</td><td>.281</td><td>27</td><td>.901</td><td>.310</td><td>5</td><td>1.002</td></tr>
+<tr><td>6</td><td>坂本 勇人</td><td>右</td><td>.255</td><td>12</td><td>.700</td><td>-</td><td>0</td><td>.650</td></tr>
+</table></body></html>"""
+
+STANDINGS = """<html><body>
+<p>前置き</p>
+<table style="display: none"><tr><td>隠し</td></tr></table>
+<table><tr><td></td></tr></table>
+<table>
+<thead><tr><th>チーム</th><th>試 合</th><th>勝利</th><th>観客</th></tr></thead>
+<tbody>
+<tr><td>阪神</td><td>143</td><td>85</td><td>3,012,345</td></tr>
+<tr><td>DeNA<br>ベイスターズ</td><td>143</td><td>71</td><td>2,301,000</td></tr>
+</tbody></table>
+<table>
+<tr><th>チーム</th><th>試 合</th><th>勝利</th></tr>
+<tr><td>ソフトバンク</td><td>143</td><td>87</td></tr>
+<tr><td>日本ハム</td><td>143</td><td>83</td></tr>
+</table>
+<table><tr><th>後ろ</th></tr><tr><td>読まない</td></tr></table>
+</body></html>"""
+
+
+def _read_html(content: bytes, **kwargs) -> list:
+    return pd.read_html(BytesIO(content), flavor="lxml", **kwargs)
+
+
+def test_three_row_header_matches_read_html():
+    content = NF3.encode("cp932")
+    expected = _read_html(content, encoding="cp932", header=[0, 1, 2])[0]
+    assert_frame_equal(read_table(content, encoding="cp932", header=[0, 1, 2]), expected)
+
+
+def test_indices_columns_and_thousands_match_read_html():
+    content = STANDINGS.encode("utf-8")
+    tables = _read_html(content, encoding="utf-8")
+    central, pacific = read_tables(content, [0, 1], encoding="utf-8")
+    assert_frame_equal(central, tables[0])
+    assert_frame_equal(pacific, tables[1])
+    assert central["観客"].tolist() == [3012345, 2301000]
+
+    picked = read_tables(content, [1, 0], encoding="utf-8", columns=["チーム", "試 合"])
+    assert_frame_equal(picked[0], tables[1][["チーム", "試 合"]])
+    assert_frame_equal(picked[1], tables[0][["チーム", "試 合"]])
+
+
+def test_missing_table_or_column_raises():
+    content = STANDINGS.encode("utf-8")
+    with pytest.raises(ValueError):
+        read_table(content, 5, encoding="utf-8")
+    with pytest.raises(KeyError):
+        read_table(content, 0, encoding="utf-8", columns=["チーム", "敗戦"])
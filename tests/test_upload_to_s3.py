@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""upload_to_s3: マニフェストで変わったファイルだけを送る（S3 は moto のスタンドイン）。"""
+
+import os
+
+import pytest
+
+import upload_to_s3
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_to_s3, "MANIFEST_PATH", str(tmp_path / "s3_manifest.json"))
+    monkeypatch.setattr(upload_to_s3, "RETRY_WAIT_SEC", 0)
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="batch")
+        yield client
+
+
+@pytest.fixture
+def data(tmp_path):
+    root = tmp_path / "data"
+    for rel, text in (("batter/giants.csv", "背番号,選手名\n25,岡本和真\n"),
+                      ("matches/team_games.csv", "team,games\ngiants,143\n"),
+                      ("team_splits/hitters/vs_team/Central/Giants/Total.csv", "背番,名前\n25,岡本和真\n")):
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    return root
+
+
+def _keys(client) -> list:
+    return sorted(o["Key"] for o in client.list_objects_v2(Bucket="batch").get("Contents", []))
+
+
+def test_second_run_skips_unchanged_files(s3, data):
+    first = upload_to_s3.upload(str(data), "batch", "npb", "2025")
+    assert (first["uploaded"], first["skipped"], first["failed"]) == (3, 0, [])
+    assert _keys(s3) == ["npb/batting/2025/giants.csv", "npb/games/team_games.csv",
+                         "npb/team_splits/hitters/vs_team/Central/Giants/Total.csv"]
+
+    assert upload_to_s3.upload(str(data), "batch", "npb", "2025")["skipped"] == 3
+
+    # 同じ内容で書き直し（mtime だけ変化）→ ハッシュが同じなので送らない
+    games = data / "matches" / "team_games.csv"
+    os.utime(games, ns=(0, games.stat().st_mtime_ns + 10**9))
+    r = upload_to_s3.upload(str(data), "batch", "npb", "2025")
+    assert (r["uploaded"], r["skipped"]) == (0, 3)
+
+    games.write_text("team,games\ngiants,144\n", encoding="utf-8")
+    r = upload_to_s3.upload(str(data), "batch", "npb", "2025")
+    assert (r["uploaded"], r["skipped"]) == (1, 2)
+    body = s3.get_object(Bucket="batch", Key="npb/games/team_games.csv")["Body"].read()
+    assert body == b"team,games\ngiants,144\n"
+
+
+def test_failed_objects_are_retried_next_run(s3, data, monkeypatch):
+    real = upload_to_s3.upload_one
+
+    def flaky(client, bucket, path, key, config):
+        if key.endswith("giants.csv"):
+            raise OSError("connection reset")
+        return real(client, bucket, path, key, config)
+
+    monkeypatch.setattr(upload_to_s3, "upload_one", flaky)
+    r = upload_to_s3.upload(str(data), "batch", "npb", "2025")
+    assert r["failed"] == ["npb/batting/2025/giants.csv"] and r["uploaded"] == 2
+
+    monkeypatch.setattr(upload_to_s3, "upload_one", real)
+    r = upload_to_s3.upload(str(data), "batch", "npb", "2025")
+    assert (r["uploaded"], r["skipped"], r["failed"]) == (1, 2, [])
+
+    assert upload_to_s3.upload(str(data), "batch", "npb", "2025", force=True)["uploaded"] == 3
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+upload_to_s3.py
+- data/ 配下の出力を S3 へ送る（前回送った内容から変わったファイルだけ）
+- 送信済みファイルの内容ハッシュ（sha256）・サイズ・mtime を S3 キーごとにマニフェスト（cache/s3_manifest.json）へ記録し、
+  サイズと mtime が同じ、またはハッシュが同じファイルは送らない（S3 側に無いかどうかは見ない）
+- 並列アップロード、大きいファイルはマルチパート（boto3 の TransferConfig）、失敗はオブジェクト単位で再試行
+- 送ったオブジェクト数・バイト数・スキップ数・失敗を集計してログと JSON（logs/upload_s3_*.json）に出す
+- 接続先は S3_ENDPOINT_URL で差し替え可能（MinIO や moto server などのローカル S3 互換で試験できる）
+- 使い方:
+    python3 upload_to_s3.py                  # .env の S3_BUCKET / S3_PREFIX / S3_YEAR / LOCAL_DATA_DIR を使用
+    python3 upload_to_s3.py --dry-run        # 送る予定のファイルを表示するだけ
+    python3 upload_to_s3.py --force          # マニフェストを無視して全部送る
+    S3_ENDPOINT_URL=http://127.0.0.1:9000 python3 upload_to_s3.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+LOG_DIR = batch_paths.LOG_DIR
+SUMMARY_PATH = os.path.join(LOG_DIR, f"upload_s3_{batch_log.STAMP}.json")
+log = batch_log.get_logger("upload_to_s3")
+
+# ===== 設定 =====
+ENV_PATH = "/home/ec2-user/batch/.env"
+MANIFEST_PATH = os.path.join(batch_paths.CACHE_DIR, "s3_manifest.json")
+MAX_WORKERS = 8                       # 同時に送るオブジェクト数
+MAX_ATTEMPTS = 3                      # オブジェクトごとの試行回数
+RETRY_WAIT_SEC = 2.0                  # 再試行までの待ち（試行ごとに倍）
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+EXCLUDE_SUFFIXES = (".tmp",)
+
+# data/ 配下のディレクトリ → S3 プレフィックス（S3_PREFIX の下、{year} は S3_YEAR）
+UPLOADS = [
+    ("batter", "batting/{year}"),
+    ("pitcher", "pitcher/{year}"),
+    ("matches", "games"),
+    ("team_batting", "team_batting"),
+    ("team_pitcher", "team_pitcher"),
+    ("team_defense", "team_defense"),
+    ("team_splits", "team_splits"),
+    ("parquet", "parquet"),
+]
+# ===== 設定ここまで =====
+
+
+def load_env(path: str = None):
+    """.env（KEY=VALUE 形式）を読み、未設定の環境変数だけ補う。"""
+    try:
+        with open(path or ENV_PATH, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.partition("=")
+        key = key.strip()
+        if key.startswith("export "):
+            key = key[len("export "):].strip()
+        os.environ.setdefault(key, value.strip().strip("\"'"))
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(updates: dict):
+    """今回送れた分だけを、ファイル上の最新内容にマージして保存する。"""
+    if not updates:
+        return
+    manifest = load_manifest()
+    manifest.update(updates)
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def collect_files(data_dir: str, prefix: str, year: str) -> list:
+    """[(ローカルパス, S3 キー)]（UPLOADS の順、ディレクトリ内は名前順）。"""
+    files = []
+    for local, remote in UPLOADS:
+        root = os.path.join(data_dir, local)
+        if not os.path.isdir(root):
+            continue
+        base = "/".join(p for p in (prefix.strip("/"), remote.format(year=year)) if p)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.startswith(".") or name.endswith(EXCLUDE_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                files.append((path, f"{base}/{rel}"))
+    return files
+
+
+def make_client(endpoint_url: str = None):
+    import boto3
+    from botocore.config import Config
+
+    config = Config(retries={"max_attempts": MAX_ATTEMPTS, "mode": "standard"},
+                    max_pool_connections=MAX_WORKERS * 2)
+    return boto3.client("s3", endpoint_url=endpoint_url or None, config=config)
+
+
+def upload_one(client, bucket: str, path: str, key: str, transfer_config) -> int:
+    """1 オブジェクトを送る（失敗時は待ってから再試行）。試行回数を返す。"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            client.upload_file(path, bucket, key, Config=transfer_config)
+            return attempt
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            wait = RETRY_WAIT_SEC * (2 ** (attempt - 1))
+            log(f"再試行 {attempt}/{MAX_ATTEMPTS - 1}: {key} ({e!r}) {wait:.0f}秒後")
+            time.sleep(wait)
+
+
+def upload(data_dir: str, bucket: str, prefix: str = "", year: str = "",
+           endpoint_url: str = None, force: bool = False, dry_run: bool = False,
+           max_workers: int = MAX_WORKERS) -> dict:
+    """変わったファイルだけを送り、集計（dict）を返す。"""
+    start = time.monotonic()
+    manifest = {} if force else load_manifest()
+    scope = f"s3://{bucket}/"
+
+    pending = []
+    skipped = 0
+    updates = {}
+    for path, key in collect_files(data_dir, prefix, year):
+        st = os.stat(path)
+        entry = manifest.get(scope + key, {})
+        # 出力側は内容が変わらなければファイルに触らない（csv_writer）ので、サイズと mtime が同じならハッシュも取らない
+        if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            skipped += 1
+            continue
+        digest = file_sha256(path)
+        if entry.get("sha256") == digest:
+            skipped += 1
+            updates[scope + key] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            continue
+        pending.append((path, key, digest, st))
+
+    summary = {
+        "bucket": bucket, "endpoint_url": endpoint_url, "dry_run": dry_run,
+        "files": len(pending) + skipped, "skipped": skipped,
+        "uploaded": 0, "bytes": 0, "retries": 0, "failed": [],
+    }
+    if dry_run:
+        for path, key, _, st in pending:
+            log(f"送信予定: {path} -> {scope}{key} ({st.st_size}B)")
+        summary["pending"] = len(pending)
+        summary["seconds"] = round(time.monotonic() - start, 2)
+        return summary
+
+    if pending:
+        from boto3.s3.transfer import TransferConfig
+
+        client = make_client(endpoint_url)
+        transfer_config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                                         multipart_chunksize=MULTIPART_CHUNKSIZE)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {
+                pool.submit(upload_one, client, bucket, path, key, transfer_config): (path, key, digest, st)
+                for path, key, digest, st in pending
+            }
+            for fut in as_completed(futures):
+                path, key, digest, st = futures[fut]
+                try:
+                    attempts = fut.result()
+                except Exception as e:
+                    log.warning(f"失敗: {path} -> {scope}{key} ({e!r})")
+                    summary["failed"].append(key)
+                    continue
+                summary["uploaded"] += 1
+                summary["bytes"] += st.st_size
+                summary["retries"] += attempts - 1
+                updates[scope + key] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    save_manifest(updates)
+    summary["seconds"] = round(time.monotonic() - start, 2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="data/ 配下の変更分を S3 へ送る")
+    parser.add_argument("--dry-run", action="store_true", help="送る予定のファイルを表示するだけ")
+    parser.add_argument("--force", action="store_true", help="マニフェストを無視して全部送る")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+
+    load_env()
+    data_dir = os.environ.get("LOCAL_DATA_DIR", batch_paths.DATA_DIR)
+    bucket = os.environ.get("S3_BUCKET")
+    if not bucket:
+        log("S3_BUCKET が未設定です")
+        return 1
+    endpoint_url = os.environ.get("S3_ENDPOINT_URL") or None
+
+    log(f"=== S3 アップロード開始: {data_dir} -> s3://{bucket}/{os.environ.get('S3_PREFIX', '')} ===")
+    summary = upload(data_dir, bucket, os.environ.get("S3_PREFIX", ""), os.environ.get("S3_YEAR", ""),
+                     endpoint_url=endpoint_url, force=args.force, dry_run=args.dry_run,
+                     max_workers=args.max_workers)
+    with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=1)
+    if args.dry_run:
+        log(f"=== 送信予定 {summary['pending']}件 / 変更なし {summary['skipped']}件（dry-run）===")
+        return 0
+    log(f"=== S3 アップロード終了: 送信 {summary['uploaded']}件 {summary['bytes']}B / "
+        f"変更なし {summary['skipped']}件 / 失敗 {len(summary['failed'])}件 / "
+        f"再試行 {summary['retries']}回 ({summary['seconds']:.1f}秒) ===")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+warehouse_loader.py
+- data/ 配下の出力 CSV をすべて 1 つの SQLite（WAREHOUSE_PATH）に取り込む分析用ローダー
+  対象: 打者・投手（球団別）、チーム打撃/投手/守備、チーム試合数、残日程、対戦成績 4 種
+- 表ごとに主キー（パス由来の列 + キー列）を持ち、取り込みは upsert。型は CSV を読んだときの dtype から
+  INTEGER / REAL / TEXT を決める（列が増えたら ALTER TABLE で追加）
+- player_id（player_ids.py）・球団・選手名・対戦相手/球場（target）に索引を張る
+- どのファイルをいつ取り込んだか（サイズ・mtime）を _files 表に持ち、変わったファイルだけを取り込み直す
+  （出力側は内容が同じならファイルに触らない＝mtime が変わらない）。消えたファイルの行は削除
+- 使い方:
+    python3 warehouse_loader.py                 # 変わったファイルだけ取り込む
+    python3 warehouse_loader.py --full          # 作り直す
+    python3 warehouse_loader.py query "SELECT b.選手名, b.打率, h.target, h.打率 FROM batter b
+        JOIN hitters_vs_team h ON h.player_id = b.player_id WHERE b.team = 'giants' AND h.target = 'Tigers'"
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import batch_log
+import batch_paths
+
+# ===== ログ設定 =====
+log = batch_log.get_logger("warehouse_loader")
+
+# ===== 設定 =====
+DATA_ROOT = batch_paths.DATA_DIR
+WAREHOUSE_PATH = os.path.join(batch_paths.DATA_DIR, "warehouse.sqlite")
+CSV_ENCODING = "utf-8-sig"
+
+# 表名 → 対象ファイル（DATA_ROOT からの glob）、パスから取る列（末尾のディレクトリ…ファイル名の順）、
+#        キー列の候補（表に無ければ先頭列）、索引
+_SPLIT = {"path_cols": ["league", "team", "target"],
+          "index": [["player_id"], ["名前"], ["target"], ["team", "target"]]}
+TABLES = {
+    "batter":       {"files": "batter/*.csv", "path_cols": ["team"], "key": ["背番号", "選手名"],
+                     "index": [["player_id"], ["選手名"], ["team"]]},
+    "pitcher":      {"files": "pitcher/*.csv", "path_cols": ["team"], "key": ["背番号", "選手名"],
+                     "index": [["player_id"], ["選手名"], ["team"]]},
+    "team_batting": {"files": "team_batting/*.csv", "path_cols": [], "key": ["チーム", "球団"], "index": []},
+    "team_pitcher": {"files": "team_pitcher/*.csv", "path_cols": [], "key": ["チーム", "球団"], "index": []},
+    "team_defense": {"files": "team_defense/*.csv", "path_cols": [], "key": ["チーム", "球団"], "index": []},
+    "team_games":   {"files": "matches/team_games.csv", "path_cols": [], "key": ["team"], "index": []},
+    "schedule":     {"files": "matches/*.csv", "exclude": ["team_games.csv"], "path_cols": ["team"],
+                     "key": ["日付", "対戦T"], "index": [["team", "日付"], ["対戦T"]]},
+    "hitters_vs_team":     dict(_SPLIT, files="team_splits/hitters/vs_team/*/*/*.csv", key=["背番", "名前"]),
+    "pitchers_vs_team":    dict(_SPLIT, files="team_splits/pitchers/vs_team/*/*/*.csv", key=["背番", "名前"]),
+    "hitters_vs_stadium":  dict(_SPLIT, files="team_splits/hitters/vs_stadium/*/*/*.csv", key=["背番", "名前"]),
+    "pitchers_vs_stadium": dict(_SPLIT, files="team_splits/pitchers/vs_stadium/*/*/*.csv", key=["背番", "名前"]),
+}
+# ===== 設定ここまで =====
+
+
+def q(name: str) -> str:
+    """識別子（日本語の列名など）をクオートする。"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_type(dtype) -> str:
+    if dtype.kind in "iub":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    return "TEXT"
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    path = path or WAREHOUSE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("""CREATE TABLE IF NOT EXISTS _files (
+        path TEXT PRIMARY KEY, tbl TEXT NOT NULL, size INTEGER, mtime_ns INTEGER,
+        rows INTEGER, loaded_at TEXT)""")
+    return con
+
+
+def table_columns(con, table: str) -> list:
+    return [row[1] for row in con.execute(f"PRAGMA table_info({q(table)})")]
+
+
+def ensure_table(con, table: str, df: pd.DataFrame, key_cols: list):
+    """表が無ければ作る（主キー = パス由来の列 + キー列）。あれば足りない列を追加する。"""
+    spec = TABLES[table]
+    existing = table_columns(con, table)
+    if not existing:
+        cols = [f"{q(c)} TEXT" for c in spec["path_cols"]]
+        cols += [f"{q(c)} {sql_type(df[c].dtype)}" for c in df.columns]
+        cols.append('"_file" TEXT NOT NULL')
+        pk = ", ".join(q(c) for c in spec["path_cols"] + key_cols)
+        con.execute(f"CREATE TABLE {q(table)} ({', '.join(cols)}, PRIMARY KEY ({pk}))")
+        con.execute(f"CREATE INDEX IF NOT EXISTS {q(f'ix_{table}__file')} ON {q(table)} (\"_file\")")
+        for cols in spec["index"]:
+            if all(c in spec["path_cols"] or c in df.columns for c in cols):
+                name = f"ix_{table}_{'_'.join(cols)}"
+                con.execute(f"CREATE INDEX IF NOT EXISTS {q(name)} ON {q(table)} ({', '.join(q(c) for c in cols)})")
+        return
+    for c in df.columns:
+        if c not in existing:
+            con.execute(f"ALTER TABLE {q(table)} ADD COLUMN {q(c)} {sql_type(df[c].dtype)}")
+
+
+def primary_key(con, table: str) -> list:
+    rows = [r for r in con.execute(f"PRAGMA table_info({q(table)})") if r[5]]
+    return [r[1] for r in sorted(rows, key=lambda r: r[5])]
+
+
+def list_files(table: str) -> list:
+    spec = TABLES[table]
+    exclude = set(spec.get("exclude", []))
+    return [p for p in sorted(glob.glob(os.path.join(DATA_ROOT, spec["files"])))
+            if os.path.basename(p) not in exclude]
+
+
+def path_values(path: str, n: int) -> list:
+    """パス末尾 n 個（最後はファイル名の拡張子なし）。"""
+    if not n:
+        return []
+    parts = Path(path).with_suffix("").parts
+    return list(parts[-n:])
+
+
+def load_file(con, table: str, path: str) -> int:
+    """1 ファイル分を upsert する（そのファイル由来の古い行は先に消す）。取り込んだ行数を返す。"""
+    spec = TABLES[table]
+    df = pd.read_csv(path, encoding=CSV_ENCODING)
+    df = df.loc[:, ~df.columns.duplicated()]
+    rel = os.path.relpath(path, DATA_ROOT)
+    if df.empty:
+        if table_columns(con, table):
+            con.execute(f'DELETE FROM {q(table)} WHERE "_file" = ?', (rel,))
+        return 0
+    key_cols = [c for c in spec["key"] if c in df.columns] or [df.columns[0]]
+    ensure_table(con, table, df, key_cols)
+    con.execute(f'DELETE FROM {q(table)} WHERE "_file" = ?', (rel,))
+
+    pk = set(primary_key(con, table))
+    cols = spec["path_cols"] + list(df.columns) + ["_file"]
+    updates = ", ".join(f"{q(c)} = excluded.{q(c)}" for c in cols if c not in pk)
+    sql = (f"INSERT INTO {q(table)} ({', '.join(q(c) for c in cols)}) "
+           f"VALUES ({', '.join('?' for _ in cols)}) "
+           f"ON CONFLICT ({', '.join(q(c) for c in primary_key(con, table))}) DO UPDATE SET {updates}")
+    prefix = path_values(path, len(spec["path_cols"]))
+    values = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    con.executemany(sql, (prefix + list(row) + [rel] for row in values))
+    return len(df)
+
+
+def load_all(full: bool = False) -> dict:
+    """変わったファイルだけを取り込む（full=True なら作り直す）。集計を返す。"""
+    start = time.monotonic()
+    summary = {"files": 0, "loaded": 0, "skipped": 0, "removed": 0, "rows": 0}
+    con = connect()
+    try:
+        if full:
+            for table in TABLES:
+                con.execute(f"DROP TABLE IF EXISTS {q(table)}")
+            con.execute("DELETE FROM _files")
+            con.commit()
+        known = {row[0]: row[1:] for row in con.execute("SELECT path, size, mtime_ns, tbl FROM _files")}
+        seen = set()
+        for table in TABLES:
+            for path in list_files(table):
+                rel = os.path.relpath(path, DATA_ROOT)
+                seen.add(rel)
+                summary["files"] += 1
+                st = os.stat(path)
+                if known.get(rel) == (st.st_size, st.st_mtime_ns, table):
+                    summary["skipped"] += 1
+                    continue
+                try:
+                    with con:
+                        rows = load_file(con, table, path)
+                        con.execute("INSERT OR REPLACE INTO _files VALUES (?, ?, ?, ?, ?, ?)",
+                                    (rel, table, st.st_size, st.st_mtime_ns, rows,
+                                     datetime.now().isoformat(timespec="seconds")))
+                except Exception as e:
+                    log.warning(f"[{table}] 取り込み失敗: {rel} ({e!r})")
+                    continue
+                summary["loaded"] += 1
+                summary["rows"] += rows
+        # 消えたファイルの行を削除
+        for rel, (_, _, table) in known.items():
+            if rel in seen:
+                continue
+            with con:
+                if table_columns(con, table):
+                    con.execute(f'DELETE FROM {q(table)} WHERE "_file" = ?', (rel,))
+                con.execute("DELETE FROM _files WHERE path = ?", (rel,))
+            summary["removed"] += 1
+        con.execute("PRAGMA optimize")
+    finally:
+        con.close()
+    summary["seconds"] = round(time.monotonic() - start, 2)
+    log(f"取り込み: {summary['loaded']}/{summary['files']}ファイル {summary['rows']}行 / "
+        f"変更なし {summary['skipped']} / 削除 {summary['removed']} ({summary['seconds']:.1f}秒)")
+    return summary
+
+
+def query(sql: str, params=()) -> pd.DataFrame:
+    con = sqlite3.connect(WAREHOUSE_PATH)
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="出力 CSV を SQLite に取り込む")
+    parser.add_argument("--full", action="store_true", help="作り直す")
+    sub = parser.add_subparsers(dest="cmd")
+    p = sub.add_parser("query", help="SQL を実行して表示")
+    p.add_argument("sql")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "query":
+        start = time.perf_counter()
+        df = query(args.sql)
+        print(df.to_string(index=False))
+        print(f"({len(df)}行, {(time.perf_counter() - start) * 1000:.1f}ms)")
+        return 0
+    load_all(full=args.full)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())